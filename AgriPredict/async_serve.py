@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+"""
+Opt-in asyncio server for the single-item prediction API.
+
+Serves POST /api/predict/production, /api/predict/price and
+/api/predict/demand with the same request and response bodies as
+flask_complete.py, plus GET /api/health with batching statistics. Every
+connection is a coroutine on one event loop, and production and price
+predictions go through a MicroBatcher: requests for the same model kind and
+crop that arrive within max-wait are evaluated with one vectorized predict
+call on the current model snapshot. Models are loaded the way the service
+loads them (pipeline.py), and --reload-interval picks up replaced artifacts.
+
+    python async_serve.py --port 5001 --max-batch 64 --max-wait-ms 0
+
+Everything else (pages, batch and scenario APIs, admin) stays on the Flask
+service; run both and route /api/predict/{production,price,demand} here.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+import numpy as np
+
+from micro_batcher import MICRO_BATCH_MAX_SIZE, MICRO_BATCH_MAX_WAIT, MicroBatcher
+from model_bundle import BUNDLE_FILE
+from pipeline import CROP_CONFIGS, DISTRICTS, ESTIMATE_YEAR, create_registry
+
+# Largest request body read, in bytes
+MAX_BODY = 1 << 20
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 413: 'Payload Too Large'}
+
+
+class AsyncPredictionServer:
+    """HTTP/1.1 keep-alive server answering single predictions through a MicroBatcher"""
+
+    def __init__(self, registry, max_batch_size=MICRO_BATCH_MAX_SIZE, max_wait=MICRO_BATCH_MAX_WAIT):
+        self.registry = registry
+        self.batcher = MicroBatcher(self._predict, max_batch_size, max_wait)
+        self.routes = {
+            '/api/predict/production': ('POST', self.predict_production),
+            '/api/predict/price': ('POST', self.predict_price),
+            '/api/predict/demand': ('POST', self.predict_demand),
+            '/api/health': ('GET', self.health)
+        }
+
+    def _predict(self, key, features):
+        # One queue flush: every row is the same kind and crop, on one snapshot
+        kind, crop_id = key
+        models = self.registry.snapshot
+        return models.linear_table.predict(models.rows(np.full(len(features), crop_id)), kind, features)
+
+    async def _linear(self, kind, crop_id, *features):
+        """(prediction, None), or (None, error message) as in flask_complete.cached_prediction"""
+        if crop_id not in CROP_CONFIGS:
+            return None, 'Invalid crop'
+        if CROP_CONFIGS[crop_id]['name'] not in self.registry.snapshot.linear[kind]:
+            return None, f'{kind.capitalize()} model not available'
+        prediction = await self.batcher.submit((kind, crop_id), features)
+        if np.isnan(prediction):
+            return None, f'{kind.capitalize()} model not available'
+        return float(prediction), None
+
+    async def predict_production(self, data):
+        dist = int(data.get('district'))
+        crop_id = int(data.get('crop'))
+        area = int(data.get('area'))
+        area_hectares = int(area / 2.47)
+
+        production, error = await self._linear('production', crop_id, dist, ESTIMATE_YEAR, area_hectares)
+        if error:
+            return {'status': 'error', 'message': error}
+        return {
+            'status': 'success',
+            'crop': CROP_CONFIGS[crop_id]['display'],
+            'district': DISTRICTS.get(dist, 'Unknown'),
+            'area_acres': area,
+            'area_hectares': area_hectares,
+            'production_quintals': int(production)
+        }
+
+    async def predict_price(self, data):
+        crop_id = int(data.get('crop'))
+        area = int(data.get('area'))
+        production = int(data.get('production'))
+        area_hectares = int(area / 2.47)
+
+        price, error = await self._linear('price', crop_id, ESTIMATE_YEAR, area_hectares, production)
+        if error:
+            return {'status': 'error', 'message': error}
+        return {
+            'status': 'success',
+            'crop': CROP_CONFIGS[crop_id]['display'],
+            'price_per_quintal': int(price),
+            'total_revenue': int(price * production)
+        }
+
+    async def predict_demand(self, data):
+        # A demand table lookup - nothing to batch
+        crop_id = int(data.get('crop'))
+        if crop_id not in CROP_CONFIGS:
+            return {'status': 'error', 'message': 'Invalid crop'}
+        models = self.registry.snapshot
+        demand = models.demand_table.get(int(models.rows([crop_id])[0]), ESTIMATE_YEAR)
+        if np.isnan(demand):
+            return {'status': 'error', 'message': 'District model not available'}
+        return {
+            'status': 'success',
+            'crop': CROP_CONFIGS[crop_id]['display'],
+            'expected_demand_quintals': int(demand)
+        }
+
+    async def health(self, data):
+        production_models = len(self.registry.snapshot.linear['production'])
+        return {
+            'status': 'healthy' if production_models > 0 else 'initializing',
+            'models_loaded': production_models,
+            'batching': self.batcher.stats()
+        }
+
+    async def dispatch(self, method, path, body):
+        """(status, JSON payload) for one request; view errors are reported like the Flask views"""
+        route = self.routes.get(path)
+        if route is None:
+            return 404, {'status': 'error', 'message': 'Not found'}
+        if method != route[0]:
+            return 405, {'status': 'error', 'message': 'Method not allowed'}
+        try:
+            data = json.loads(body) if body else None
+            if route[0] == 'POST' and not isinstance(data, dict):
+                return 400, {'status': 'error', 'message': 'Expected a JSON object'}
+            return 200, await route[1](data)
+        except Exception as e:
+            return 200, {'status': 'error', 'message': str(e)}
+
+    async def handle(self, reader, writer):
+        """Answer requests on one connection until the client closes it or asks to"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                    length = int(headers.get('content-length', 0))
+                except ValueError:
+                    await self._respond(writer, 400, {'status': 'error', 'message': 'Bad request'}, False)
+                    break
+                if length > MAX_BODY:
+                    await self._respond(writer, 413, {'status': 'error', 'message': 'Request body too large'}, False)
+                    break
+                body = await reader.readexactly(length) if length > 0 else b''
+                status, payload = await self.dispatch(method, target.split('?', 1)[0], body)
+                connection = headers.get('connection', '').lower()
+                keep_alive = connection == 'keep-alive' or (version == 'HTTP/1.1' and connection != 'close')
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload).encode()
+        writer.write(f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                     f"Content-Type: application/json\r\n"
+                     f"Content-Length: {len(body)}\r\n"
+                     f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + body)
+        await writer.drain()
+
+    async def start(self, host, port, backlog=1024):
+        """Start listening; returns the asyncio.Server"""
+        return await asyncio.start_server(self.handle, host, port, backlog=backlog)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default=os.environ.get('AGRIPREDICT_HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('AGRIPREDICT_ASYNC_PORT', 5001)))
+    parser.add_argument('--max-batch', type=int, default=MICRO_BATCH_MAX_SIZE,
+                        help='flush a queue once it holds this many requests')
+    parser.add_argument('--max-wait-ms', type=float, default=MICRO_BATCH_MAX_WAIT * 1000,
+                        help='flush a queue once its oldest request has waited this long (0 = next loop pass)')
+    parser.add_argument('--reload-interval', type=float, default=5.0,
+                        help='seconds between model artifact checks (0 disables)')
+    parser.add_argument('--models-dir', default='.', help=f'directory with {BUNDLE_FILE} or the pickles')
+    args = parser.parse_args()
+
+    registry = create_registry(args.models_dir)
+    reason = registry.refresh_bundle()
+    if reason is not None:
+        print(f"WARNING - {BUNDLE_FILE} was not rebuilt ({reason}); loading the pickles")
+    _, problems = registry.reload()
+    for problem in problems:
+        print(f"  [WARNING] {problem}")
+    if args.reload_interval > 0:
+        registry.watch(args.reload_interval)
+
+    server = AsyncPredictionServer(registry, args.max_batch, args.max_wait_ms / 1000)
+
+    async def run():
+        listener = await server.start(args.host, args.port)
+        print(f"Serving predictions on http://{args.host}:{listener.sockets[0].getsockname()[1]} "
+              f"(batches of up to {server.batcher.max_batch_size}, {args.max_wait_ms:g} ms max wait)")
+        async with listener:
+            await listener.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,303 @@
+#!/usr/bin/env python
+"""
+Benchmark suite for the AgriPredict service.
+
+Drives the app through Flask's test client - no network - and times single
+and batch production/price/demand predictions, recommendation and
+fertilizer inference, /statistics as registrations grow, chart rendering,
+model loading and cold start. Inputs come from a fixed seed and
+registrations go to a throwaway database, so runs on the same machine are
+comparable. Results are written as JSON and can be compared with an
+earlier run to catch regressions:
+
+    python benchmark_service.py --json before.json
+    python benchmark_service.py --json after.json --compare before.json
+    python benchmark_service.py --quick --only predict batch
+"""
+import argparse
+import contextlib
+import gc
+import io
+import itertools
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+
+import numpy as np
+
+BENCHMARK_FORMAT_VERSION = 1
+
+# Registered farms /statistics is measured at
+REGISTRATION_COUNTS = (0, 1000, 10000)
+BATCH_SIZES = (1, 100, 1000)
+
+# Median slowdown treated as a regression by --compare
+REGRESSION_THRESHOLD = 0.20
+
+
+def summarize(samples, items=1):
+    """Timing statistics (seconds) for one benchmark's samples"""
+    ordered = sorted(samples)
+    median = statistics.median(ordered)
+    return {
+        'iterations': len(ordered),
+        'items': items,
+        'median': median,
+        'mean': statistics.fmean(ordered),
+        'min': ordered[0],
+        'max': ordered[-1],
+        'p95': ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)],
+        'stdev': statistics.stdev(ordered) if len(ordered) > 1 else 0.0,
+        'items_per_second': items / median if median else None
+    }
+
+
+class Suite:
+    """Runs timed calls and collects their statistics by name"""
+
+    def __init__(self, iterations, warmup):
+        self.iterations = iterations
+        self.warmup = warmup
+        self.results = {}
+
+    def bench(self, name, func, iterations=None, items=1):
+        iterations = iterations or self.iterations
+        for _ in range(self.warmup):
+            func()
+        gc.collect()
+        samples = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            func()
+            samples.append(time.perf_counter() - start)
+        self.results[name] = summarize(samples, items)
+        result = self.results[name]
+        print(f"  {name:<40} {result['median'] * 1e3:9.3f} ms  p95 {result['p95'] * 1e3:9.3f} ms"
+              f"  {result['items_per_second']:12,.0f} items/s")
+
+    def record(self, name, samples, items=1):
+        self.results[name] = summarize(samples, items)
+        print(f"  {name:<40} {self.results[name]['median'] * 1e3:9.3f} ms")
+
+
+def post_json(client, url, body):
+    response = client.post(url, json=body)
+    assert response.status_code == 200 and response.get_json()['status'] == 'success', response.data[:200]
+    return response
+
+
+def bench_predict(suite, service, client, rng):
+    """Single-item prediction APIs, with and without a prediction cache hit"""
+    crops = list(service.CROP_CONFIGS)
+    districts = list(service.DISTRICTS)
+    areas = itertools.count(1000)
+
+    # Every call gets a fresh area, so the prediction cache always misses
+    suite.bench('predict.production', lambda: post_json(client, '/api/predict/production', {
+        'crop': crops[next(areas) % len(crops)], 'district': districts[0], 'area': next(areas)}))
+    suite.bench('predict.production_cached', lambda: post_json(client, '/api/predict/production', {
+        'crop': 1, 'district': districts[0], 'area': 100}))
+    suite.bench('predict.price', lambda: post_json(client, '/api/predict/price', {
+        'crop': crops[next(areas) % len(crops)], 'area': 100, 'production': next(areas)}))
+    suite.bench('predict.demand', lambda: post_json(client, '/api/predict/demand', {'crop': 1}))
+    suite.bench('predict.estimation_form', lambda: client.post('/estimation', data={
+        'dist': districts[0], 'crop': 1, 'area': next(areas)}))
+    suite.bench('predict.fertilizer', lambda: post_json(client, '/api/predict/fertilizer', {
+        'temperature': 26, 'humidity': 52, 'moisture_content': 38, 'crop': 3,
+        'nitrogen': 37, 'phosphorus': 0, 'potassium': 0}))
+    suite.bench('predict.recommendation_form', lambda: client.post('/recommend', data={
+        'n': 90, 'p': 42, 'k': 43, 'temp': 21, 'h': 82, 'ph': 6.5, 'rain': 203}))
+
+
+def batch_records(kind, size, rng, service):
+    crops = rng.choice(list(service.CROP_CONFIGS), size).tolist()
+    if kind == 'production':
+        return [{'crop': c, 'district': d, 'area': a} for c, d, a in zip(
+            crops, rng.choice(list(service.DISTRICTS), size).tolist(), rng.integers(1, 5000, size).tolist())]
+    if kind == 'price':
+        return [{'crop': c, 'area': a, 'production': p} for c, a, p in zip(
+            crops, rng.integers(1, 5000, size).tolist(), rng.integers(100, 100000, size).tolist())]
+    if kind == 'demand':
+        return [{'crop': c} for c in crops]
+    fields = service.TREE_BATCH_FIELDS[kind]
+    columns = {field: rng.integers(0, 100, size).tolist() for field in fields}
+    if 'ph' in columns:
+        columns['ph'] = np.round(rng.uniform(4, 9, size), 2).tolist()
+    return [dict(zip(fields, values)) for values in zip(*(columns[field] for field in fields))]
+
+
+def bench_batch(suite, service, client, rng):
+    """/api/predict/batch and /api/predict/estimate at growing batch sizes"""
+    for kind in ('production', 'price', 'demand', 'fertilizer', 'recommendation'):
+        for size in BATCH_SIZES:
+            body = {'kind': kind, 'records': batch_records(kind, size, rng, service)}
+            suite.bench(f'batch.{kind}[{size}]', lambda: post_json(client, '/api/predict/batch', body),
+                        items=size)
+    for size in BATCH_SIZES:
+        records = batch_records('production', size, rng, service)
+        body = {key: [record[key] for record in records] for key in ('crop', 'district', 'area')}
+        body['format'] = 'columns'
+        suite.bench(f'batch.estimate[{size}]', lambda: post_json(client, '/api/predict/estimate', body),
+                    items=size)
+
+
+def bench_statistics(suite, service, client, rng):
+    """/statistics and /api/statistics as the registration store grows"""
+    store = service.registration_store
+    crops = [config['name'] for config in service.CROP_CONFIGS.values()]
+    districts = list(service.DISTRICTS)
+    baseline = store.count()
+    added = 0
+    for count in REGISTRATION_COUNTS:
+        for i in range(added, count):
+            store.add(f'bench-{i}', districts[i % len(districts)], crops[i % len(crops)],
+                      int(rng.integers(1, 500)), int(rng.integers(100, 10000)))
+        added = count
+        suite.bench(f'statistics.page[{count}]', lambda: client.post('/statistics', data={'crop': 1}))
+        suite.bench(f'statistics.api[{count}]', lambda: client.get('/api/statistics?crop=1'))
+    print(f"  ({baseline} registrations were imported before the synthetic ones)")
+
+    # A server-rendered chart is a cache miss only once per total, so time the renderer itself
+    suite.bench('statistics.chart_render', lambda: service.render_statistics_chart('Paddy (Rice)', 12345, 67890),
+                iterations=max(suite.iterations // 20, 3))
+
+
+def bench_models(suite, service, client, rng):
+    """Loading every model from the current artifacts, and from the pickles alone"""
+    from model_registry import load_linear_model, load_tree_model
+    from tree_models import TREE_MODELS
+
+    def reload():
+        with contextlib.redirect_stdout(io.StringIO()):
+            assert service.reload_models()
+    suite.bench('models.reload', reload, iterations=max(suite.iterations // 20, 3))
+
+    def load_pickles():
+        for path in service.model_artifacts():
+            if not os.path.exists(path):
+                continue
+            if path in TREE_MODELS.values():
+                load_tree_model(path)
+            else:
+                load_linear_model(path)
+    suite.bench('models.load_pickles', load_pickles, iterations=max(suite.iterations // 20, 3))
+
+
+def bench_cold_start(suite, service, client, rng):
+    """Importing the service in a fresh interpreter"""
+    from startup_benchmark import measure
+    runs = max(suite.iterations // 40, 3)
+    suite.record('cold_start.import', [measure('flask_complete')[0] for _ in range(runs)])
+
+
+BENCHMARKS = {
+    'predict': bench_predict,
+    'batch': bench_batch,
+    'statistics': bench_statistics,
+    'models': bench_models,
+    'cold_start': bench_cold_start
+}
+
+
+def environment(service):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'model_bundle_version': service.model_registry.snapshot.version
+    }
+
+
+def run(service, groups=tuple(BENCHMARKS), iterations=200, warmup=5, seed=0):
+    """Run the selected benchmark groups; returns the JSON report"""
+    suite = Suite(iterations, warmup)
+    client = service.app.test_client()
+    rng = np.random.default_rng(seed)
+    for group in groups:
+        print(f"\n{group}:")
+        BENCHMARKS[group](suite, service, client, rng)
+    return {
+        'format_version': BENCHMARK_FORMAT_VERSION,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'settings': {'groups': list(groups), 'iterations': iterations, 'warmup': warmup, 'seed': seed},
+        'environment': environment(service),
+        'benchmarks': suite.results
+    }
+
+
+def compare(report, baseline, threshold=REGRESSION_THRESHOLD):
+    """[(name, baseline median, median, ratio, regressed)] for benchmarks in both reports"""
+    rows = []
+    for name, result in report['benchmarks'].items():
+        before = baseline.get('benchmarks', {}).get(name)
+        if before is None or not before['median']:
+            continue
+        ratio = result['median'] / before['median']
+        rows.append((name, before['median'], result['median'], ratio, ratio > 1 + threshold))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), default=list(BENCHMARKS),
+                        help='benchmark groups to run')
+    parser.add_argument('--iterations', type=int, default=200, help='timed calls per benchmark')
+    parser.add_argument('--warmup', type=int, default=5, help='untimed calls before each benchmark')
+    parser.add_argument('--quick', action='store_true', help='20 iterations per benchmark')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', metavar='PATH', help='write the results as JSON')
+    parser.add_argument('--compare', metavar='PATH', help='baseline JSON to compare medians against')
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help='median slowdown counted as a regression (default 0.20 = 20%%)')
+    args = parser.parse_args()
+    # Old-sklearn pickles warn on every unpickle
+    warnings.filterwarnings('ignore')
+
+    # Synthetic registrations must not reach the real database
+    work_dir = tempfile.mkdtemp(prefix='agripredict-bench-')
+    os.environ['AGRIPREDICT_REGISTRATIONS_DB'] = os.path.join(work_dir, 'registrations.db')
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            import flask_complete as service
+
+        print("=" * 60)
+        print("AgriPredict service benchmark")
+        print("=" * 60)
+        report = run(service, args.only, 20 if args.quick else args.iterations, args.warmup, args.seed)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            rows = compare(report, json.load(f), args.threshold)
+        print(f"\nCompared with {args.compare} (median, regression above +{args.threshold:.0%}):")
+        for name, before, after, ratio, regressed in rows:
+            flag = '  REGRESSION' if regressed else ''
+            print(f"  {name:<40} {before * 1e3:9.3f} -> {after * 1e3:9.3f} ms  {ratio:6.2f}x{flag}")
+        regressions = sum(regressed for *_, regressed in rows)
+        print(f"\n{'FAIL' if regressions else 'OK'} - {regressions} regression(s) in {len(rows)} benchmarks")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,273 @@
+#!/usr/bin/env python
+"""
+Bulk scoring of large CSV, JSONL or Parquet files.
+
+Reads the input in fixed-size chunks, scores each chunk with one vectorized
+call against the same models the service serves (pipeline.load_models:
+models.bundle when it is current, else the pickles) and appends the results to the output as it
+goes, so memory stays bounded by the chunk size however large the file is.
+With --jobs, chunks are scored on a process pool; at most two chunks per
+worker are in flight and results are written in input order.
+
+Input columns follow /api/predict/batch:
+
+    production       crop, district, area (acres)
+    price            crop, area (acres), production
+    demand           crop, optional year (default 2022)
+    estimate         crop, district, area - production -> price -> revenue and demand
+    recommendation   nitrogen, phosphorus, potassium, temperature, humidity, ph, rainfall
+    fertilizer       temperature, humidity, moisture_content, crop, nitrogen, potassium, phosphorus
+
+Every input column is kept and the predictions are added after them; rows
+with an unknown crop, or a blank or non-numeric input field, get empty
+predictions.
+
+    python bulk_score.py estimate plots.csv -o scored.csv
+    python bulk_score.py fertilizer samples.jsonl -o scored.parquet --jobs 4
+"""
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from model_bundle import BUNDLE_FILE
+from pipeline import ESTIMATE_YEAR, area_hectares, estimate, load_models
+from tree_models import FLOAT_FIELDS, TREE_BATCH_FIELDS
+
+INPUT_FIELDS = {
+    'production': ('crop', 'district', 'area'),
+    'price': ('crop', 'area', 'production'),
+    'demand': ('crop',),
+    'estimate': ('crop', 'district', 'area'),
+    **TREE_BATCH_FIELDS
+}
+
+FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.json': 'jsonl', '.parquet': 'parquet'}
+
+CHUNK_SIZE = 50000
+
+
+def open_models(directory="."):
+    """The service's models for scoring, with any load problems reported on stderr"""
+    models, problems = load_models(directory)
+    for problem in problems:
+        print(f"WARNING - {problem}", file=sys.stderr)
+    return models
+
+
+def integers(values):
+    """Truncated predictions as a nullable integer column (NaN becomes missing)"""
+    return pd.array(np.trunc(values), dtype='Float64').astype('Int64')
+
+
+def numeric_columns(frame, fields):
+    """The fields as float arrays, and a mask of the rows where every one is a usable number.
+
+    Blank cells and text come back as NaN and mark their row invalid, as do
+    values too large for the integer casts the models' inputs go through.
+    """
+    values = {field: pd.to_numeric(frame[field], errors='coerce').to_numpy(dtype=np.float64) for field in fields}
+    valid = np.ones(len(frame), dtype=bool)
+    for array in values.values():
+        valid &= np.isfinite(array) & (np.abs(array) < 2.0 ** 62)
+    return values, valid
+
+
+def column(values, field, valid, dtype=np.int64):
+    """One input column with invalid rows zeroed, truncating to integers like int() in the API"""
+    return np.where(valid, values[field], 0).astype(dtype)
+
+
+def score_chunk(models, kind, frame):
+    """Return frame with the kind's predictions appended as new columns.
+
+    Rows with a blank or non-numeric input field get empty predictions, like
+    rows with an unknown crop.
+    """
+    fields = INPUT_FIELDS[kind] + (('year',) if kind == 'demand' and 'year' in frame else ())
+    values, valid = numeric_columns(frame, fields)
+    if kind in TREE_BATCH_FIELDS:
+        features = np.column_stack([column(values, field, valid, np.float64 if field in FLOAT_FIELDS else np.int64)
+                                    for field in TREE_BATCH_FIELDS[kind]])
+        result_field = 'recommended_fertilizer' if kind == 'fertilizer' else 'recommended_crop'
+        tree = models.tree(kind)
+        if tree is None:
+            raise ValueError(f"{kind.capitalize()} model not available")
+        labels = tree.predict(features).astype(object)
+        labels[~valid] = None
+        return frame.assign(**{result_field: labels})
+
+    crop_ids = np.where(valid, column(values, 'crop', valid), -1)
+    year = np.full(len(frame), ESTIMATE_YEAR)
+    if kind == 'demand':
+        years = column(values, 'year', valid) if 'year' in values else year
+        demand = models.demand_table.lookup(models.rows(crop_ids), years)
+        return frame.assign(expected_demand_quintals=integers(demand))
+
+    if kind == 'price':
+        hectares = area_hectares(column(values, 'area', valid))
+        production = column(values, 'production', valid)
+        price = models.linear_table.predict(models.rows(crop_ids), 'price',
+                                            np.column_stack([year, hectares, production]))
+        return frame.assign(price_per_quintal=integers(price),
+                            total_revenue=integers(price * production))
+
+    result = estimate(models, crop_ids, column(values, 'district', valid), column(values, 'area', valid))
+    available = ~np.isnan(result['production'])
+    hectares = integers(np.where(valid, result['area_hectares'], np.nan))
+    if kind == 'production':
+        return frame.assign(area_hectares=hectares, production_quintals=integers(result['production']))
+    return frame.assign(
+        area_hectares=hectares,
+        production_quintals=integers(result['production']),
+        price_per_quintal=integers(np.where(available, result['price'], np.nan)),
+        estimated_revenue=integers(result['revenue']),
+        district_demand_quintals=integers(np.where(available, result['demand'], np.nan)),
+        production_gap_quintals=integers(result['gap']),
+        exceeds_demand=pd.array(np.where(available, result['exceeds_demand'], None), dtype='boolean')
+    )
+
+
+def read_chunks(path, fmt, chunk_size):
+    """Yield DataFrames of at most chunk_size rows"""
+    if fmt == 'csv':
+        yield from pd.read_csv(path, chunksize=chunk_size)
+    elif fmt == 'jsonl':
+        yield from pd.read_json(path, lines=True, chunksize=chunk_size)
+    else:
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+
+
+class ChunkWriter:
+    """Appends scored chunks to a CSV, JSONL or Parquet file"""
+
+    def __init__(self, path, fmt):
+        self.path = path
+        self.fmt = fmt
+        self.rows = 0
+        self._parquet = None
+        self._file = None if fmt == 'parquet' else open(path, 'w', newline='')
+
+    def write(self, frame):
+        if self.fmt == 'csv':
+            frame.to_csv(self._file, header=self.rows == 0, index=False)
+        elif self.fmt == 'jsonl':
+            if len(frame):
+                text = frame.to_json(orient='records', lines=True)
+                self._file.write(text if text.endswith('\n') else text + '\n')
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            if self._parquet is None:
+                table = pa.Table.from_pandas(frame, preserve_index=False)
+                self._parquet = pq.ParquetWriter(self.path, table.schema)
+            else:
+                table = pa.Table.from_pandas(frame, schema=self._parquet.schema, preserve_index=False)
+            self._parquet.write_table(table)
+        self.rows += len(frame)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+        if self._parquet is not None:
+            self._parquet.close()
+
+
+# Models loaded once per pool worker
+_worker_models = None
+
+
+def _init_worker(directory):
+    global _worker_models
+    _worker_models = open_models(directory)
+
+
+def _score_job(kind, frame):
+    return score_chunk(_worker_models, kind, frame)
+
+
+def score_file(kind, input_path, output_path, chunk_size=CHUNK_SIZE, jobs=1, models_dir=".",
+               input_format=None, output_format=None):
+    """Score input_path into output_path chunk by chunk; returns the number of rows"""
+    input_format = input_format or file_format(input_path)
+    output_format = output_format or file_format(output_path)
+    chunks = read_chunks(input_path, input_format, chunk_size)
+    writer = ChunkWriter(output_path, output_format)
+    try:
+        first = next(chunks, None)
+        if first is None:
+            return 0
+        missing = [field for field in INPUT_FIELDS[kind] if field not in first.columns]
+        if missing:
+            raise ValueError(f"{input_path} has no column(s) {missing} needed for {kind}")
+
+        if jobs <= 1:
+            models = open_models(models_dir)
+            writer.write(score_chunk(models, kind, first))
+            for chunk in chunks:
+                writer.write(score_chunk(models, kind, chunk))
+            return writer.rows
+
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(models_dir,)) as pool:
+            pending = deque([pool.submit(_score_job, kind, first)])
+            for chunk in chunks:
+                pending.append(pool.submit(_score_job, kind, chunk))
+                # Bound the chunks held in memory; write finished ones in input order
+                while len(pending) >= 2 * jobs:
+                    writer.write(pending.popleft().result())
+            while pending:
+                writer.write(pending.popleft().result())
+        return writer.rows
+    finally:
+        writer.close()
+
+
+def file_format(path):
+    fmt = FORMATS.get(os.path.splitext(path)[1].lower())
+    if fmt is None:
+        raise ValueError(f"Cannot tell the format of {path}; pass --input-format/--output-format")
+    return fmt
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('kind', choices=list(INPUT_FIELDS))
+    parser.add_argument('input', help='CSV, JSONL or Parquet file')
+    parser.add_argument('-o', '--output', required=True, help='CSV, JSONL or Parquet file to write')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='rows scored per call')
+    parser.add_argument('--jobs', type=int, default=1, help='worker processes (default: score in-process)')
+    parser.add_argument('--models-dir', default='.', help=f'directory with {BUNDLE_FILE} or the pickles')
+    parser.add_argument('--input-format', choices=sorted(set(FORMATS.values())))
+    parser.add_argument('--output-format', choices=sorted(set(FORMATS.values())))
+    args = parser.parse_args()
+
+    formats = {args.input_format or FORMATS.get(os.path.splitext(args.input)[1].lower()),
+               args.output_format or FORMATS.get(os.path.splitext(args.output)[1].lower())}
+    if 'parquet' in formats:
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            parser.error("Parquet files need pyarrow (pip install pyarrow)")
+
+    start = time.perf_counter()
+    try:
+        rows = score_file(args.kind, args.input, args.output, max(args.chunk_size, 1), args.jobs,
+                          args.models_dir, args.input_format, args.output_format)
+    except ValueError as e:
+        parser.error(str(e))
+    elapsed = time.perf_counter() - start
+    print(f"OK - Scored {rows:,} rows ({args.kind}) into {args.output} in {elapsed:.2f}s "
+          f"({rows / elapsed if elapsed else 0:,.0f} rows/s)", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
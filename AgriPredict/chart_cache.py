@@ -0,0 +1,78 @@
+"""
+Bounded in-memory cache for the rendered /statistics charts.
+
+The statistics chart depends only on the crop, its registered total and the
+district-model threshold, so the base64 PNG can be reused until one of those
+changes. Entries are evicted least-recently-used once the cache holds more
+than its byte budget.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+CHART_CACHE_BYTES = int(os.environ.get('AGRIPREDICT_CHART_CACHE_BYTES', 8 * 1024 * 1024))
+
+
+class ChartCache:
+    """Thread-safe LRU cache of rendered charts with a total byte budget"""
+
+    def __init__(self, max_bytes=CHART_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return the cached chart for key, or None"""
+        with self._lock:
+            chart = self._entries.get(key)
+            if chart is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return chart
+
+    def put(self, key, chart):
+        """Cache a chart, evicting the least recently used ones over budget"""
+        size = len(chart)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous)
+            self._entries[key] = chart
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+
+    def get_or_render(self, key, render):
+        """Return the cached chart for key, calling render() on a miss"""
+        chart = self.get(key)
+        if chart is None:
+            chart = render()
+            self.put(key, chart)
+        return chart
+
+    def invalidate(self, crop):
+        """Drop every chart for a crop - keys are (crop, total, threshold)"""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == crop]:
+                self._bytes -= len(self._entries.pop(key))
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
@@ -0,0 +1,49 @@
+"""
+Revenue-maximizing split of a farm's land across crops.
+
+The land is divided into equal area steps and each crop's revenue is known
+for every whole number of steps it could get (from the vectorized model
+evaluation in flask_complete.scenario_cube). Revenue is not linear in area -
+price depends on the production it is sold against - so the split is found
+by dynamic programming over the crops: after crop c, best[n] is the highest
+revenue of any allocation of exactly n steps to crops 0..c. Each crop costs
+one (steps x steps) max-plus step, done as a single array operation over a
+sliding window, so a few crops over a thousand steps take milliseconds.
+"""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def best_allocation(revenue, limits=None):
+    """Split up to n_steps area steps across crops to maximize total revenue.
+
+    revenue has shape (n_crops, n_steps + 1): revenue[c, k] is crop c's
+    revenue on k steps (-inf where crop c cannot take k steps); zero steps
+    earn nothing, whatever revenue[:, 0] holds. limits optionally caps the
+    steps of each crop. Land stays unplanted only when planting it earns
+    less; ties go to the larger area. Returns (steps per crop, total revenue).
+    """
+    revenue = np.array(revenue, dtype=np.float64)
+    n_crops, width = revenue.shape
+    steps = np.arange(width)
+    revenue[:, 0] = 0.0
+    if limits is not None:
+        revenue[steps[None, :] > np.asarray(limits)[:, None]] = -np.inf
+
+    best = revenue[0]
+    choices = [steps]
+    for c in range(1, n_crops):
+        # window[n, j] = best[n - k] for k = width - 1 - j, with -inf where n - k < 0
+        padded = np.concatenate([np.full(width - 1, -np.inf), best])
+        totals = sliding_window_view(padded, width) + revenue[c, ::-1]
+        j = totals.argmax(axis=1)
+        best = totals[steps, j]
+        choices.append(width - 1 - j)
+
+    remaining = width - 1 - int(best[::-1].argmax())
+    total = float(best[remaining])
+    allocation = np.zeros(n_crops, dtype=np.int64)
+    for c in range(n_crops - 1, -1, -1):
+        allocation[c] = choices[c][remaining]
+        remaining -= allocation[c]
+    return allocation, total
@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+"""
+Columnar cache of the historical CSV datasets.
+
+The harvest, price and district CSVs are parsed once into one .npy file per
+column, with the cleaning every consumer needs already applied: -1 sentinels
+become missing values and gaps in numeric columns are filled by linear
+interpolation, as the training scripts always did. Consumers memory-map
+only the columns they ask for, so loading is neither a CSV parse nor a copy.
+
+Each cached dataset records the SHA-256 of the CSV it was built from and is
+rebuilt when that changes. Build or refresh everything with:
+
+    python data_cache.py
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from registration_store import DISTRICT_CSV_FILES
+
+DATA_CACHE_DIR = os.environ.get('AGRIPREDICT_DATA_CACHE', '.data_cache')
+CACHE_FORMAT_VERSION = 1
+MISSING_SENTINEL = -1
+
+# Datasets served from the cache; {district}.csv files hold per-district history
+HISTORICAL_DATASETS = (
+    'harvest production dataset.csv',
+    'harvest price.csv',
+    'district_data.csv',
+    *(filename.replace('_user_crop_entry', '') for filename in DISTRICT_CSV_FILES.values())
+)
+
+
+def _slug(filename):
+    return re.sub(r'[^a-z0-9]+', '_', os.path.splitext(filename)[0].lower()).strip('_')
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def clean_frame(frame):
+    """Replace -1 sentinels with NaN and interpolate the numeric columns"""
+    numeric = frame.select_dtypes('number').columns
+    sentinel = (frame[numeric] == MISSING_SENTINEL).any()
+    for column in sentinel[sentinel].index:
+        frame[column] = frame[column].astype(np.float64).mask(frame[column] == MISSING_SENTINEL)
+    frame[numeric] = frame[numeric].interpolate(method='linear')
+    return frame
+
+
+class DataCache:
+    """Per-column .npy cache of CSV datasets, validated against source checksums"""
+
+    def __init__(self, cache_dir=DATA_CACHE_DIR, data_dir="."):
+        # A relative cache directory lives next to the CSVs
+        self.cache_dir = os.path.join(data_dir, cache_dir)
+        self.data_dir = data_dir
+
+    def _manifest_path(self, filename):
+        return os.path.join(self.cache_dir, _slug(filename) + '.json')
+
+    def _read_manifest(self, filename):
+        try:
+            with open(self._manifest_path(filename)) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return manifest if manifest.get('format_version') == CACHE_FORMAT_VERSION else None
+
+    def is_current(self, filename, manifest=None):
+        """True when the cache matches the CSV - by size and mtime, else by checksum"""
+        manifest = manifest or self._read_manifest(filename)
+        if manifest is None:
+            return False
+        stat = os.stat(os.path.join(self.data_dir, filename))
+        if stat.st_size == manifest['source_size'] and stat.st_mtime_ns == manifest['source_mtime_ns']:
+            return True
+        return _sha256(os.path.join(self.data_dir, filename)) == manifest['source_sha256']
+
+    def build(self, filename):
+        """Parse, clean and write one dataset's columns; returns the manifest"""
+        source = os.path.join(self.data_dir, filename)
+        stat = os.stat(source)
+        checksum = _sha256(source)
+        frame = clean_frame(pd.read_csv(source))
+
+        # Columns go in a directory named after the checksum; the manifest swap publishes it
+        os.makedirs(self.cache_dir, exist_ok=True)
+        directory = f"{_slug(filename)}-{checksum[:16]}"
+        target = os.path.join(self.cache_dir, directory)
+        staging = tempfile.mkdtemp(dir=self.cache_dir, prefix='.build-')
+        columns = {}
+        for i, name in enumerate(frame.columns):
+            values = frame[name].to_numpy()
+            if values.dtype == object or not np.issubdtype(values.dtype, np.number):
+                values = values.astype(str)
+            column_file = f"{i:03d}.npy"
+            np.save(os.path.join(staging, column_file), np.ascontiguousarray(values))
+            columns[name] = {'file': column_file, 'dtype': values.dtype.str}
+        if os.path.isdir(target):
+            shutil.rmtree(staging)
+        else:
+            os.replace(staging, target)
+
+        manifest = {
+            'format_version': CACHE_FORMAT_VERSION,
+            'source': filename,
+            'source_sha256': checksum,
+            'source_size': stat.st_size,
+            'source_mtime_ns': stat.st_mtime_ns,
+            'rows': len(frame),
+            'directory': directory,
+            'columns': columns
+        }
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(manifest, f, indent=1)
+        os.replace(tmp_path, self._manifest_path(filename))
+
+        # Older builds stay readable through existing memory maps after unlinking
+        prefix = _slug(filename) + '-'
+        for entry in os.listdir(self.cache_dir):
+            if entry.startswith(prefix) and entry != directory and entry[len(prefix):].isalnum():
+                shutil.rmtree(os.path.join(self.cache_dir, entry), ignore_errors=True)
+        return manifest
+
+    def manifest(self, filename):
+        """Manifest of a current cache for filename, building it if needed"""
+        manifest = self._read_manifest(filename)
+        if not self.is_current(filename, manifest):
+            manifest = self.build(filename)
+        return manifest
+
+    def columns(self, filename, columns=None):
+        """{column: read-only memory-mapped array} for the requested columns"""
+        manifest = self.manifest(filename)
+        names = list(manifest['columns']) if columns is None else list(columns)
+        missing = [name for name in names if name not in manifest['columns']]
+        if missing:
+            raise KeyError(f"{filename} has no column(s) {missing}")
+        directory = os.path.join(self.cache_dir, manifest['directory'])
+        return {name: np.load(os.path.join(directory, manifest['columns'][name]['file']), mmap_mode='r')
+                for name in names}
+
+    def frame(self, filename, columns=None):
+        """DataFrame over the memory-mapped columns"""
+        return pd.DataFrame(self.columns(filename, columns), copy=False)
+
+
+if __name__ == '__main__':
+    cache = DataCache()
+    for filename in HISTORICAL_DATASETS:
+        if not os.path.exists(filename):
+            continue
+        current = cache.is_current(filename)
+        manifest = cache.manifest(filename)
+        state = 'up to date' if current else 'built'
+        print(f"  [OK] {filename}: {manifest['rows']} rows, {len(manifest['columns'])} columns ({state})")
+    print(f"OK - Data cache in {cache.cache_dir}")
@@ -1,126 +1,160 @@
-from flask import Flask, request, render_template, jsonify
-import pickle
+from flask import Flask, Response, g, has_app_context, request, render_template, jsonify
+from flask import before_render_template, template_rendered
+import time
 import numpy as np
-import csv
 import base64
 from io import BytesIO
-import matplotlib
-matplotlib.use('Agg')  # Use non-interactive backend
-import matplotlib.pyplot as plt
-from matplotlib.figure import Figure
-try:
-    plt.style.use('seaborn-v0_8-darkgrid')
-except OSError:
+import os
+from lazy_imports import lazy_import
+from tree_models import FLOAT_FIELDS, TREE_BATCH_FIELDS
+from model_bundle import BUNDLE_FILE
+from pipeline import CROP_CONFIGS, DEMAND_YEARS, DISTRICTS, create_registry, estimate
+from registration_store import RegistrationStore
+from chart_cache import ChartCache
+from prediction_cache import PredictionCache
+from metrics import CONTENT_TYPE, MetricsRegistry
+from profiling import ADMIN_HEADER, ADMIN_SECRET, PROFILE_HEADER, SamplingProfiler, verify_token
+from crop_mix import best_allocation
+
+def configure_matplotlib(matplotlib):
+    """Select the non-interactive backend and chart style on first use"""
+    matplotlib.use('Agg')  # Use non-interactive backend
+    import matplotlib.figure
+    import matplotlib.style
+    import matplotlib.ticker
     try:
-        plt.style.use('seaborn-darkgrid')
+        matplotlib.style.use('seaborn-v0_8-darkgrid')
     except OSError:
-        plt.style.use('default')
-import pandas as pd
-import os
-from pathlib import Path
+        try:
+            matplotlib.style.use('seaborn-darkgrid')
+        except OSError:
+            matplotlib.style.use('default')
+
+# matplotlib is only needed for server-rendered statistics charts
+matplotlib = lazy_import('matplotlib', configure_matplotlib)
 
 #flask app
 app = Flask(__name__)
 
+# ==================== METRICS & PROFILING ====================
+
+# Samples the stacks of a fraction of requests (AGRIPREDICT_PROFILE_RATE) and
+# of requests carrying a signed X-AgriPredict-Profile token
+profiler = SamplingProfiler()
+
+@app.before_request
+def start_profile():
+    if request.endpoint and not request.endpoint.startswith('admin_') and \
+            profiler.should_profile(request.headers.get(PROFILE_HEADER)):
+        profiler.begin(request.endpoint)
+        g.profiling = True
+
+@app.teardown_request
+def end_profile(exc):
+    if g.pop('profiling', False):
+        profiler.end()
+
+metrics = MetricsRegistry()
+REQUESTS = metrics.counter('agripredict_requests_total', 'HTTP requests handled',
+                           ('endpoint', 'method', 'status'))
+REQUEST_SECONDS = metrics.histogram('agripredict_request_seconds', 'Request latency by endpoint',
+                                    ('endpoint',))
+# Stages: parse, model_lookup, predict, template_render, chart_render, storage
+STAGE_SECONDS = metrics.histogram('agripredict_stage_seconds', 'Time spent in each request stage',
+                                  ('stage',))
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    # Decode the body here so its cost is its own stage; views reuse the cached result
+    if request.content_length:
+        with STAGE_SECONDS.time('parse'):
+            request.get_json(silent=True) if request.is_json else request.form
+
+@app.after_request
+def record_request(response):
+    endpoint = request.endpoint or 'unmatched'
+    REQUEST_SECONDS.observe(time.perf_counter() - g.request_start, endpoint)
+    REQUESTS.inc(endpoint, request.method, str(response.status_code))
+    return response
+
+def start_template_timer(sender, template, context, **extra):
+    g.template_start = time.perf_counter()
+
+def record_template_render(sender, template, context, **extra):
+    STAGE_SECONDS.observe(time.perf_counter() - g.pop('template_start'), 'template_render')
+
+before_render_template.connect(start_template_timer, app)
+template_rendered.connect(record_template_render, app)
+
 # ==================== MODEL LOADING & CONFIGURATION ====================
 
-# Define all available crops
-CROP_CONFIGS = {
-    1: {'name': 'paddy', 'display': 'Paddy (Rice)'},
-    2: {'name': 'sorghum', 'display': 'Sorghum'},
-    3: {'name': 'arhar', 'display': 'Arhar (Pigeon Pea)'},
-    4: {'name': 'groundnut', 'display': 'Groundnut'},
-    5: {'name': 'sesamum', 'display': 'Sesamum'}
-}
+# Seconds between checks for replaced model artifacts (0 = reload only on request)
+MODEL_WATCH_INTERVAL = float(os.environ.get('AGRIPREDICT_MODEL_WATCH_SECONDS', 0))
 
-# Districts mapping
-DISTRICTS = {
-    63: 'Adilabad',
-    62: 'Karimnagar',
-    55: 'Hyderabad',
-    61: 'Khammam',
-    58: 'Mahabubnagar',
-    57: 'Medak',
-    59: 'Nalgonda',
-    56: 'Nizamabad',
-    60: 'Warangal'
-}
+# Build models.bundle from the pickles at load time when it is missing or stale
+# (0 = never write it; the pickles are loaded instead, importing sklearn)
+BUILD_BUNDLE = os.environ.get('AGRIPREDICT_BUILD_BUNDLE', '1') != '0'
 
-# Global model cache
-models_cache = {
-    'production': {},  # pro_model files
-    'price': {},       # pri_model files
-    'district': {},    # district_model files
-    'fertilizer': None,
-    'recommendation': None
-}
+# Single-row linear predictions keyed on (model generation, kind, crop id, features)
+prediction_cache = PredictionCache()
 
-def load_model_lazy(filename):
-    """Lazy load a model file only when needed"""
-    try:
-        if os.path.exists(filename):
-            return pickle.load(open(filename, "rb"))
-    except Exception as e:
-        print(f"✗ Error loading {filename}: {e}")
-    return None
+# Every loaded model, published as one immutable snapshot per load
+model_registry = create_registry(on_publish=lambda snapshot: prediction_cache.clear())
+
+@app.before_request
+def pin_models():
+    # A reload during the request must not mix model versions within it
+    g.models = model_registry.snapshot
+
+def current_models():
+    """The snapshot the current request started on, else the latest one"""
+    models = g.get('models') if has_app_context() else None
+    return models if models is not None else model_registry.snapshot
+
+def model_artifacts():
+    """Every individual pickle the service can load"""
+    return model_registry.artifacts()
+
+def artifact_signature():
+    """(path, mtime) of the bundle and every pickle - changes whenever one is replaced"""
+    return model_registry.signature()
 
 def load_all_models():
-    """Pre-load all models at startup for performance"""
+    """Load every model - from the bundle when current, else the pickles - and publish them.
+
+    A missing or stale bundle is rebuilt first (BUILD_BUNDLE), so later starts
+    take the fast path; when that is not possible the pickles are loaded.
+    """
     try:
         print("Loading models (this may take a moment)...")
-        # Load production models for each crop
-        for crop_id, crop_config in CROP_CONFIGS.items():
-            crop_name = crop_config['name']
-            pro_model_path = f"{crop_name}_pro_model.pkl"
-            pri_model_path = f"{crop_name}_pri_model.pkl"
-            dist_model_path = f"{crop_name}_district_model.pkl"
-            
-            # Production models
-            if os.path.exists(pro_model_path):
-                try:
-                    models_cache['production'][crop_name] = pickle.load(open(pro_model_path, "rb"))
-                    print(f"  [OK] {crop_name} production model")
-                except Exception as e:
-                    print(f"  [WARNING] Failed to load {crop_name} production model: {e}")
-            
-            # Price models
-            if os.path.exists(pri_model_path):
-                try:
-                    models_cache['price'][crop_name] = pickle.load(open(pri_model_path, "rb"))
-                    print(f"  [OK] {crop_name} price model")
-                except Exception as e:
-                    print(f"  [WARNING] Failed to load {crop_name} price model: {e}")
-            
-            # District models
-            if os.path.exists(dist_model_path):
-                try:
-                    models_cache['district'][crop_name] = pickle.load(open(dist_model_path, "rb"))
-                    print(f"  [OK] {crop_name} district model")
-                except Exception as e:
-                    print(f"  [WARNING] Failed to load {crop_name} district model: {e}")
-        
-        # Load fertilizer model
-        if os.path.exists("fertilizer.pkl"):
-            try:
-                models_cache['fertilizer'] = pickle.load(open("fertilizer.pkl", "rb"))
-                print(f"  [OK] Fertilizer model")
-            except Exception as e:
-                print(f"  [WARNING] Failed to load fertilizer model: {e}")
-        
-        # Load crop recommendation model
-        if os.path.exists("model.pkl"):
-            try:
-                models_cache['recommendation'] = pickle.load(open("model.pkl", "rb"))
-                print(f"  [OK] Crop recommendation model")
-            except Exception as e:
-                print(f"  [WARNING] Failed to load recommendation model: {e}")
-        
+        if not model_registry.bundle_is_current():
+            reason = model_registry.refresh_bundle() if BUILD_BUNDLE else 'AGRIPREDICT_BUILD_BUNDLE=0'
+            if reason is None:
+                print(f"  [OK] Built {BUNDLE_FILE} from the pickles")
+            else:
+                print(f"  [WARNING] {BUNDLE_FILE} is missing or older than the pickles and was not rebuilt "
+                      f"({reason}); loading the pickles, which imports sklearn and slows startup. "
+                      f"Run 'python model_bundle.py' to build it.")
+        published, problems = model_registry.reload()
+        for problem in problems:
+            print(f"  [WARNING] {problem}")
+        if not published:
+            print("ERROR - Models failed validation, still serving the previous ones")
+            return False
+        models = model_registry.snapshot
+        source = f"{BUNDLE_FILE} (version {models.version})" if models.version else "pickle files"
+        print(f"  [OK] {sum(models.counts().values())} models from {source}")
         print("OK - All models loaded!")
         return True
     except Exception as e:
         print(f"ERROR - Error loading models: {e}")
         return False
 
+def reload_models():
+    """Load the current artifacts into a new snapshot and swap it in if they validate"""
+    return load_all_models()
+
 # Load models when app starts
 try:
     print("\n" + "="*60)
@@ -128,64 +162,144 @@ try:
     print("="*60)
     load_all_models()
     print("OK - All models loaded successfully!")
+    if MODEL_WATCH_INTERVAL > 0:
+        model_registry.watch(MODEL_WATCH_INTERVAL)
 except Exception as e:
     print(f"WARNING - Error during model loading: {e}")
     import traceback
     traceback.print_exc()
 
+# Farmer registrations - the legacy per-district CSVs are imported on first start,
+# then the per-(crop, district) running totals are rebuilt from the raw rows
+registration_store = RegistrationStore()
+try:
+    imported = registration_store.import_csv_files()
+    if imported:
+        print(f"OK - Imported {imported} registrations from district CSV files")
+    registration_store.rebuild_totals()
+except Exception as e:
+    print(f"WARNING - Error preparing registration store: {e}")
+
+# Rendered /statistics charts keyed on (crop, total, threshold)
+chart_cache = ChartCache()
+
+# 'client' draws the /statistics chart in the browser with Chart.js,
+# 'server' renders it with matplotlib; ?chart=server overrides per request
+STATISTICS_CHART_MODE = os.environ.get('AGRIPREDICT_CHART_MODE', 'client')
+
 def get_production_model(crop_name):
-    """Get production model for a crop - load if not cached"""
-    if crop_name not in models_cache['production']:
-        model_file = f"{crop_name}_pro_model.pkl"
-        if os.path.exists(model_file):
-            try:
-                models_cache['production'][crop_name] = pickle.load(open(model_file, "rb"))
-            except Exception as e:
-                print(f"Error loading {model_file}: {e}")
-                return None
-    return models_cache['production'].get(crop_name)
+    """Get production model for a crop - None when it has no artifact"""
+    return current_models().linear['production'].get(crop_name)
 
 def get_price_model(crop_name):
-    """Get price model for a crop - load if not cached"""
-    if crop_name not in models_cache['price']:
-        model_file = f"{crop_name}_pri_model.pkl"
-        if os.path.exists(model_file):
-            try:
-                models_cache['price'][crop_name] = pickle.load(open(model_file, "rb"))
-            except Exception as e:
-                print(f"Error loading {model_file}: {e}")
-                return None
-    return models_cache['price'].get(crop_name)
+    """Get price model for a crop - None when it has no artifact"""
+    return current_models().linear['price'].get(crop_name)
 
 def get_district_model(crop_name):
-    """Get district demand model for a crop - load if not cached"""
-    if crop_name not in models_cache['district']:
-        model_file = f"{crop_name}_district_model.pkl"
-        if os.path.exists(model_file):
-            try:
-                models_cache['district'][crop_name] = pickle.load(open(model_file, "rb"))
-            except Exception as e:
-                print(f"Error loading {model_file}: {e}")
-                return None
-    return models_cache['district'].get(crop_name)
+    """Get district demand model for a crop - None when it has no artifact"""
+    return current_models().linear['district'].get(crop_name)
 
 def get_fertilizer_model():
-    """Get fertilizer model - load if not cached"""
-    if models_cache['fertilizer'] is None and os.path.exists("fertilizer.pkl"):
-        try:
-            models_cache['fertilizer'] = pickle.load(open("fertilizer.pkl", "rb"))
-        except Exception as e:
-            print(f"Error loading fertilizer.pkl: {e}")
-    return models_cache['fertilizer']
+    """Get fertilizer model - None when it has no artifact"""
+    return current_models().tree('fertilizer')
 
 def get_recommendation_model():
-    """Get crop recommendation model - load if not cached"""
-    if models_cache['recommendation'] is None and os.path.exists("model.pkl"):
-        try:
-            models_cache['recommendation'] = pickle.load(open("model.pkl", "rb"))
-        except Exception as e:
-            print(f"Error loading model.pkl: {e}")
-    return models_cache['recommendation']
+    """Get crop recommendation model - None when it has no artifact"""
+    return current_models().tree('recommendation')
+
+def cached_prediction(kind, crop_id, *features):
+    """Single-row linear prediction memoized in prediction_cache.
+
+    A hit skips crop validation and model lookup entirely. Returns
+    (prediction, None), or (None, error message) on a miss that fails.
+    """
+    models = current_models()
+    key = (models.generation, kind, crop_id, features)
+    prediction = prediction_cache.get(key)
+    if prediction is not None:
+        return prediction, None
+    if crop_id not in CROP_CONFIGS:
+        return None, 'Invalid crop'
+    with STAGE_SECONDS.time('model_lookup'):
+        model = models.linear[kind].get(CROP_CONFIGS[crop_id]['name'])
+    if not model:
+        return None, f'{kind.capitalize()} model not available'
+    with STAGE_SECONDS.time('predict'):
+        prediction = float(model.predict_one(*features))
+    prediction_cache.put(key, prediction)
+    return prediction, None
+
+def predicted_demand(crop_id, year=2022):
+    """District-model demand for one crop and year, read from the demand table.
+
+    Returns (demand, None), or (None, error message).
+    """
+    if crop_id not in CROP_CONFIGS:
+        return None, 'Invalid crop'
+    models = current_models()
+    demand = models.demand_table.get(int(models.rows([crop_id])[0]), year)
+    if np.isnan(demand):
+        return None, 'District model not available'
+    return demand, None
+
+@STAGE_SECONDS.timed('predict')
+def predict_linear(kind, crop_ids, features, models=None):
+    """Predict every row against its crop's model in one pass - rows without a model come back as NaN"""
+    models = models if models is not None else current_models()
+    return models.linear_table.predict(models.rows(crop_ids), kind, features)
+
+def parse_records(records, fields, float_fields=()):
+    """Numeric columns for fields from a list of JSON records, with a per-record error.
+
+    A record that is not an object, or whose field is missing or not a
+    number, gets zeros in every column and an 'Invalid <field>' error;
+    errors[i] is None for records that parsed.
+    """
+    columns = {field: np.zeros(len(records), dtype=np.float64 if field in float_fields else np.int64)
+               for field in fields}
+    errors = [None] * len(records)
+    for i, record in enumerate(records):
+        if not isinstance(record, dict):
+            errors[i] = 'Invalid record'
+            continue
+        for field in fields:
+            try:
+                value = float(record[field]) if field in float_fields else int(record[field])
+                if not np.isfinite(value):
+                    raise ValueError(field)
+                columns[field][i] = value
+            except (KeyError, TypeError, ValueError, OverflowError):
+                errors[i] = f'Invalid {field}'
+                break
+    invalid = np.array([error is not None for error in errors], dtype=bool)
+    for column in columns.values():
+        column[invalid] = 0
+    return columns, errors
+
+@STAGE_SECONDS.timed('predict')
+def estimate_pipeline(crop_ids, dists, areas):
+    """pipeline.estimate() against the models the current request pinned"""
+    return estimate(current_models(), crop_ids, dists, areas)
+
+def scenario_cube(crop_ids, dists, years, areas):
+    """Production, price and revenue for every (crop, district, year, area) combination.
+
+    Each axis is laid along its own dimension and broadcast against the
+    others, with the same truncation as estimate_pipeline. Returns the area
+    axis in hectares and three (crop, district, year, area) arrays; crops
+    without a production model are NaN.
+    """
+    models = current_models()
+    rows = models.rows(crop_ids)[:, None, None, None]
+    dists = np.asarray(dists)[None, :, None, None]
+    years = np.asarray(years)[None, None, :, None]
+    area_hectares = (np.asarray(areas) / 2.47).astype(np.int64)
+
+    production = np.trunc(models.linear_table.predict_broadcast(
+        rows, 'production', dists, years, area_hectares[None, None, None, :]))
+    price = np.trunc(np.nan_to_num(models.linear_table.predict_broadcast(
+        rows, 'price', years, area_hectares[None, None, None, :], np.nan_to_num(production))))
+    return area_hectares, production, price, production * price
 
 @app.route('/')
 def default():
@@ -203,54 +317,6 @@ def cropregistration():
 def cropyield():
     return render_template('crop_estimation.html')
 
-def reg_dist(name, crop_name, dist, area, pro_predictions):
-    if dist == 63:
-        with open('adilabad_user_crop_entry.csv', 'a', newline='') as crop_entry:
-            write_data = csv.writer(crop_entry, delimiter=',')
-            write_data.writerow([name, 2022, crop_name, int(area), int(pro_predictions)])
-
-    elif dist == 62:
-        with open('karimnagar_user_crop_entry.csv', 'a', newline='') as crop_entry:
-            write_data = csv.writer(crop_entry, delimiter=',')
-            write_data.writerow([name, 2022, crop_name, int(area), int(pro_predictions)])
-
-    elif dist == 55:
-        with open('hyderabad_user_crop_entry.csv', 'a', newline='') as crop_entry:
-            write_data = csv.writer(crop_entry, delimiter=',')
-            write_data.writerow([name, 2022, crop_name, int(area), int(pro_predictions)])
-
-    elif dist == 61:
-        with open('khammam_user_crop_entry.csv', 'a', newline='') as crop_entry:
-            write_data = csv.writer(crop_entry, delimiter=',')
-            write_data.writerow([name, 2022, crop_name, int(area), int(pro_predictions)])
-
-    elif dist == 58:
-        with open('mahabubnagar_user_crop_entry.csv', 'a', newline='') as crop_entry:
-            write_data = csv.writer(crop_entry, delimiter=',')
-            write_data.writerow([name, 2022, crop_name, int(area), int(pro_predictions)])
-
-    elif dist == 57:
-        with open('medak_user_crop_entry.csv', 'a', newline='') as crop_entry:
-            write_data = csv.writer(crop_entry, delimiter=',')
-            write_data.writerow([name, 2022, crop_name, int(area), int(pro_predictions)])
-
-    elif dist == 59:
-        with open('nalgonda_user_crop_entry.csv', 'a', newline='') as crop_entry:
-            write_data = csv.writer(crop_entry, delimiter=',')
-            write_data.writerow([name, 2022, crop_name, int(area), int(pro_predictions)])
-
-    elif dist == 56:
-        with open('nizamabad_user_crop_entry.csv', 'a', newline='') as crop_entry:
-            write_data = csv.writer(crop_entry, delimiter=',')
-            write_data.writerow([name, 2022, crop_name, int(area), int(pro_predictions)])
-
-    elif dist == 60:
-        with open('warangal_user_crop_entry.csv', 'a', newline='') as crop_entry:
-            write_data = csv.writer(crop_entry, delimiter=',')
-            write_data.writerow([name, 2022, crop_name, int(area), int(pro_predictions)])
-
-    crop_entry.close()
-
 @app.route('/estimation', methods=["POST","GET"])
 def estimation():
     try:
@@ -264,35 +330,23 @@ def estimation():
         
         crop_name = CROP_CONFIGS[n]['name']
         crop_display = CROP_CONFIGS[n]['display']
-        area_hectares = int(area / 2.47)
         
-        # Get production prediction
-        pro_model = get_production_model(crop_name)
-        if not pro_model:
+        # Production -> price -> revenue and demand in one pipeline pass
+        estimate = estimate_pipeline([n], [dist], [area])
+        if np.isnan(estimate['production'][0]):
             return render_template("result_page.html", prediction_text=f"Production model not available for {crop_display}")
         
-        production = pro_model.predict([[dist, 2022, area_hectares]])[0]
-        
-        # Get price prediction
-        price_model = get_price_model(crop_name)
-        price = 0
-        if price_model:
-            price = price_model.predict([[2022, area_hectares, int(production)]])[0]
-        
-        # Get district demand
-        district_model = get_district_model(crop_name)
-        district_demand = 0
-        if district_model:
-            district_demand = district_model.predict([[2022]])[0]
+        area_hectares = int(estimate['area_hectares'][0])
+        district_demand = estimate['demand'][0]
         
         # Calculate profits and insights
-        total_production_quintals = int(production)
-        estimated_price = int(price)
-        estimated_revenue = total_production_quintals * estimated_price
+        total_production_quintals = int(estimate['production'][0])
+        estimated_price = int(estimate['price'][0])
+        estimated_revenue = int(estimate['revenue'][0])
         
         # Determine if production meets district demand
-        demand_status = "✓ Exceeds demand" if production > district_demand else "✗ Below demand"
-        production_gap = abs(int(district_demand - production))
+        demand_status = "✓ Exceeds demand" if estimate['exceeds_demand'][0] else "✗ Below demand"
+        production_gap = int(estimate['gap'][0])
         
         prediction_text = f"""
         {crop_display} Prediction Report
@@ -330,50 +384,81 @@ def registration():
         
         if n not in CROP_CONFIGS:
             return render_template("result_page.html", prediction_text="Invalid crop selection!")
+        if dist not in DISTRICTS:
+            return render_template("result_page.html", prediction_text="Invalid district selection!")
         
         crop_name = CROP_CONFIGS[n]['name']
         area_hectares = int(area / 2.47)
         
         # Get production prediction
-        pro_model = get_production_model(crop_name)
-        if not pro_model:
+        production, error = cached_prediction('production', n, dist, 2022, area_hectares)
+        if error:
             return render_template("result_page.html", prediction_text=f"Production model not available")
         
-        production = pro_model.predict([[dist, 2022, area_hectares]])[0]
-        
         # Register the crop entry with production prediction
-        reg_dist(name, crop_name, dist, area, production)
+        with STAGE_SECONDS.time('storage'):
+            registration_store.add(name, dist, crop_name, area, production)
+        chart_cache.invalidate(crop_name)
         
         return render_template("result_page.html", prediction_text="✓ Registration Successful!!!")
     
     except Exception as e:
         return render_template("result_page.html", prediction_text=f"Error in registration: {str(e)}")
 
+@STAGE_SECONDS.timed('storage')
 def current_total(crop):
-    x = 0
-    csv_files = [
-        'adilabad_user_crop_entry.csv',
-        'karimnagar_user_crop_entry.csv',
-        'hyderabad_user_crop_entry.csv',
-        'warangal_user_crop_entry.csv',
-        'nalgonda_user_crop_entry.csv',
-        'medak_user_crop_entry.csv',
-        'nizamabad_user_crop_entry.csv',
-        'khammam_user_crop_entry.csv',
-        'mahabubnagar_user_crop_entry.csv'
-    ]
+    """Total registered production for a crop across all districts"""
+    return registration_store.crop_total(crop)
+
+@STAGE_SECONDS.timed('chart_render')
+def render_statistics_chart(crop_display, total, threshold):
+    """Render the production vs demand bar chart as a base64 PNG"""
+    # Enhanced visualization
+    fig = matplotlib.figure.Figure(figsize=(12, 6))
+    ax = fig.subplots()
     
-    for csv_file in csv_files:
-        try:
-            crop_entry = pd.read_csv(csv_file)
-            if not crop_entry.empty and 'Crop' in crop_entry.columns and 'Production' in crop_entry.columns:
-                filtered = crop_entry[crop_entry['Crop'].str.lower() == crop.lower()]
-                if not filtered.empty:
-                    x += filtered['Production'].sum()
-        except (FileNotFoundError, pd.errors.EmptyDataError, KeyError):
-            continue  # Skip if file doesn't exist or is empty
+    # Create bar chart with better styling
+    bars = ax.bar(['Current Production', 'Expected Demand'], 
+                  [total, threshold], 
+                  color=['#2d8659', '#e74c3c'],
+                  edgecolor='black', 
+                  linewidth=1.5,
+                  alpha=0.8)
+    
+    # Add value labels on bars
+    for i, (bar, value) in enumerate(zip(bars, [total, threshold])):
+        height = bar.get_height()
+        ax.text(bar.get_x() + bar.get_width()/2., height,
+               f'{int(value):,} Quintals',
+               ha='center', va='bottom', fontsize=12, fontweight='bold')
+    
+    # Add horizontal line showing threshold if production exceeds demand
+    if total < threshold:
+        ax.axhline(y=threshold, color='r', linestyle='--', linewidth=2, 
+                  label=f'Demand Threshold: {int(threshold):,} Quintals')
     
-    return x
+    # Styling
+    ax.set_ylabel('Production (Quintals)', fontsize=12, fontweight='bold')
+    ax.set_title(f'{crop_display} Statistics - 2022\nProduction vs Demand Analysis', 
+                fontsize=14, fontweight='bold', pad=20)
+    ax.grid(True, alpha=0.3, linestyle='--')
+    ax.set_facecolor('#f8f9fa')
+    
+    # Format y-axis
+    ax.yaxis.set_major_formatter(matplotlib.ticker.FuncFormatter(lambda x, p: f'{int(x):,}'))
+    
+    # Add legend
+    ax.legend(loc='upper right', fontsize=10)
+    
+    # Tight layout for better spacing
+    fig.tight_layout()
+    
+    buf = BytesIO()
+    fig.savefig(buf, format="png", dpi=100, bbox_inches='tight')
+    buf.seek(0)
+    data = base64.b64encode(buf.getbuffer()).decode("ascii")
+    buf.close()
+    return data
 
 @app.route("/statistics", methods=["POST", "GET"])
 def statistics():
@@ -390,58 +475,17 @@ def statistics():
         total = current_total(crop_name)
         
         # Get district demand prediction
-        district_model = get_district_model(crop_name)
-        if not district_model:
+        threshold, error = predicted_demand(n)
+        if error:
             return render_template("result_page.html", prediction_text=f"District model not available for {crop_display}")
         
-        threshold_pred = district_model.predict([[2022]])
-        threshold = float(threshold_pred[0])
-        
-        # Enhanced visualization
-        fig = Figure(figsize=(12, 6))
-        ax = fig.subplots()
-        
-        # Create bar chart with better styling
-        bars = ax.bar(['Current Production', 'Expected Demand'], 
-                      [total, threshold], 
-                      color=['#2d8659', '#e74c3c'],
-                      edgecolor='black', 
-                      linewidth=1.5,
-                      alpha=0.8)
-        
-        # Add value labels on bars
-        for i, (bar, value) in enumerate(zip(bars, [total, threshold])):
-            height = bar.get_height()
-            ax.text(bar.get_x() + bar.get_width()/2., height,
-                   f'{int(value):,} Quintals',
-                   ha='center', va='bottom', fontsize=12, fontweight='bold')
-        
-        # Add horizontal line showing threshold if production exceeds demand
-        if total < threshold:
-            ax.axhline(y=threshold, color='r', linestyle='--', linewidth=2, 
-                      label=f'Demand Threshold: {int(threshold):,} Quintals')
-        
-        # Styling
-        ax.set_ylabel('Production (Quintals)', fontsize=12, fontweight='bold')
-        ax.set_title(f'{crop_display} Statistics - 2022\nProduction vs Demand Analysis', 
-                    fontsize=14, fontweight='bold', pad=20)
-        ax.grid(True, alpha=0.3, linestyle='--')
-        ax.set_facecolor('#f8f9fa')
-        
-        # Format y-axis
-        ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f'{int(x):,}'))
-        
-        # Add legend
-        ax.legend(loc='upper right', fontsize=10)
-        
-        # Tight layout for better spacing
-        fig.tight_layout()
-        
-        buf = BytesIO()
-        fig.savefig(buf, format="png", dpi=100, bbox_inches='tight')
-        buf.seek(0)
-        data = base64.b64encode(buf.getbuffer()).decode("ascii")
-        buf.close()
+        # Client mode ships only the numbers and the page draws the chart with
+        # Chart.js; server mode renders a PNG, reused until the total changes
+        data = None
+        if request.values.get('chart', STATISTICS_CHART_MODE) == 'server':
+            data = chart_cache.get_or_render(
+                (crop_name, int(total), threshold),
+                lambda: render_statistics_chart(crop_display, total, threshold))
         
         # Calculate production gap and status
         production_gap = max(0, threshold - total)
@@ -473,15 +517,16 @@ def fertilizersfile():
 def api_available_crops():
     """Get list of all available crops"""
     try:
+        models = current_models()
         crops = [
             {
                 'id': crop_id,
                 'name': config['name'],
                 'display': config['display'],
                 'models_available': {
-                    'production': crop_name in models_cache['production'],
-                    'price': crop_name in models_cache['price'],
-                    'district': crop_name in models_cache['district']
+                    'production': crop_name in models.linear['production'],
+                    'price': crop_name in models.linear['price'],
+                    'district': crop_name in models.linear['district']
                 }
             }
             for crop_id, config in CROP_CONFIGS.items()
@@ -511,18 +556,11 @@ def api_predict_production():
         dist = int(data.get('district'))
         crop_id = int(data.get('crop'))
         area = int(data.get('area'))
-        
-        if crop_id not in CROP_CONFIGS:
-            return jsonify({'status': 'error', 'message': 'Invalid crop'})
-        
-        crop_name = CROP_CONFIGS[crop_id]['name']
         area_hectares = int(area / 2.47)
         
-        pro_model = get_production_model(crop_name)
-        if not pro_model:
-            return jsonify({'status': 'error', 'message': 'Production model not available'})
-        
-        production = float(pro_model.predict([[dist, 2022, area_hectares]])[0])
+        production, error = cached_prediction('production', crop_id, dist, 2022, area_hectares)
+        if error:
+            return jsonify({'status': 'error', 'message': error})
         
         return jsonify({
             'status': 'success',
@@ -543,18 +581,11 @@ def api_predict_price():
         crop_id = int(data.get('crop'))
         area = int(data.get('area'))
         production = int(data.get('production'))
-        
-        if crop_id not in CROP_CONFIGS:
-            return jsonify({'status': 'error', 'message': 'Invalid crop'})
-        
-        crop_name = CROP_CONFIGS[crop_id]['name']
         area_hectares = int(area / 2.47)
         
-        price_model = get_price_model(crop_name)
-        if not price_model:
-            return jsonify({'status': 'error', 'message': 'Price model not available'})
-        
-        price = float(price_model.predict([[2022, area_hectares, production]])[0])
+        price, error = cached_prediction('price', crop_id, 2022, area_hectares, production)
+        if error:
+            return jsonify({'status': 'error', 'message': error})
         
         return jsonify({
             'status': 'success',
@@ -572,25 +603,377 @@ def api_predict_demand():
         data = request.get_json()
         crop_id = int(data.get('crop'))
         
+        demand, error = predicted_demand(crop_id)
+        if error:
+            return jsonify({'status': 'error', 'message': error})
+        
+        return jsonify({
+            'status': 'success',
+            'crop': CROP_CONFIGS[crop_id]['display'],
+            'expected_demand_quintals': int(demand)
+        })
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)})
+
+# Longest demand curve one request may ask for
+MAX_DEMAND_RANGE_YEARS = 200
+
+@app.route('/api/predict/demand/range', methods=['GET', 'POST'])
+def api_predict_demand_range():
+    """API endpoint for a multi-year demand curve.
+
+    Takes crop, start_year and end_year (inclusive, default the precomputed
+    range) as JSON or query parameters.
+    """
+    try:
+        data = request.get_json(silent=True) or request.values
+        crop_id = int(data.get('crop'))
+        start_year = int(data.get('start_year', DEMAND_YEARS[0]))
+        end_year = int(data.get('end_year', DEMAND_YEARS[1]))
+        
         if crop_id not in CROP_CONFIGS:
             return jsonify({'status': 'error', 'message': 'Invalid crop'})
+        if not 0 <= end_year - start_year < MAX_DEMAND_RANGE_YEARS:
+            return jsonify({'status': 'error',
+                            'message': f'Year range must cover 1-{MAX_DEMAND_RANGE_YEARS} years'})
         
-        crop_name = CROP_CONFIGS[crop_id]['name']
-        
-        district_model = get_district_model(crop_name)
-        if not district_model:
-            return jsonify({'status': 'error', 'message': 'District model not available'})
+        _, error = predicted_demand(crop_id, start_year)
+        if error:
+            return jsonify({'status': 'error', 'message': error})
         
-        demand = float(district_model.predict([[2022]])[0])
+        years = np.arange(start_year, end_year + 1)
+        models = current_models()
+        demand = models.demand_table.lookup(models.rows(np.full(len(years), crop_id)), years)
         
         return jsonify({
             'status': 'success',
             'crop': CROP_CONFIGS[crop_id]['display'],
-            'expected_demand_quintals': int(demand)
+            'years': years.tolist(),
+            'expected_demand_quintals': demand.astype(np.int64).tolist()
+        })
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)})
+
+# Most (crop, district, year, area) points one scenario request may ask for
+MAX_SCENARIO_POINTS = 500000
+
+def scenario_axis(spec, default, name):
+    """Axis values from a list or an inclusive {"start", "end", "step"} range"""
+    if spec is None:
+        return np.asarray(default, dtype=np.int64)
+    if isinstance(spec, dict):
+        start, end, step = int(spec['start']), int(spec['end']), int(spec.get('step', 1))
+        if step <= 0 or end < start:
+            raise ValueError(f'{name} range needs start <= end and a positive step')
+        if (end - start) // step >= MAX_SCENARIO_POINTS:
+            raise ValueError(f'{name} range is too long')
+        return np.arange(start, end + 1, step)
+    return np.asarray([int(value) for value in spec], dtype=np.int64)
+
+@app.route('/api/predict/scenarios', methods=['POST'])
+def api_predict_scenarios():
+    """API endpoint for what-if sweeps over crop, district, year and area.
+
+    Body: {"crops": [1, 2], "districts": [63, 59], "years": {"start": 2022, "end": 2031},
+           "areas": {"start": 10, "end": 2000, "step": 10}}
+    Each axis is a list or an inclusive range; crops and districts default to
+    all of them, years to [2022]; areas are in acres. production_quintals,
+    price_per_quintal and estimated_revenue come back as dense cubes indexed
+    [crop][district][year][area], or with "layout": "flat" as row-major
+    lists alongside their shape.
+    """
+    try:
+        data = request.get_json()
+        crop_ids = scenario_axis(data.get('crops'), list(CROP_CONFIGS), 'crops')
+        dists = scenario_axis(data.get('districts'), list(DISTRICTS), 'districts')
+        years = scenario_axis(data.get('years'), [2022], 'years')
+        areas = scenario_axis(data.get('areas'), [], 'areas')
+
+        invalid = [int(crop_id) for crop_id in crop_ids if crop_id not in CROP_CONFIGS]
+        if invalid:
+            return jsonify({'status': 'error', 'message': f'Invalid crop(s): {invalid}'})
+        shape = (len(crop_ids), len(dists), len(years), len(areas))
+        points = int(np.prod(shape))
+        if points == 0 or points > MAX_SCENARIO_POINTS:
+            return jsonify({'status': 'error',
+                            'message': f'Scenarios must cover 1-{MAX_SCENARIO_POINTS:,} points, got {points:,}'})
+
+        area_hectares, production, price, revenue = scenario_cube(crop_ids, dists, years, areas)
+        available = ~np.isnan(production[:, 0, 0, 0])
+        cubes = {
+            'production_quintals': np.nan_to_num(production).astype(np.int64),
+            'price_per_quintal': price.astype(np.int64),
+            'estimated_revenue': np.nan_to_num(revenue).astype(np.int64)
+        }
+        flat = data.get('layout') == 'flat'
+
+        return jsonify({
+            'status': 'success',
+            'count': points,
+            'shape': list(shape),
+            'axes': {
+                'crop': crop_ids.tolist(),
+                'district': dists.tolist(),
+                'year': years.tolist(),
+                'area_acres': areas.tolist(),
+                'area_hectares': area_hectares.tolist()
+            },
+            'available': available.tolist(),
+            **{name: (cube.ravel() if flat else cube).tolist() for name, cube in cubes.items()}
         })
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)})
 
+# Most area steps the crop-mix optimizer splits a farm into; larger farms get coarser steps
+MAX_OPTIMIZER_STEPS = 500
+
+@app.route('/api/optimize/crop-mix', methods=['POST'])
+def api_optimize_crop_mix():
+    """API endpoint for the revenue-maximizing split of a farm across the crops.
+
+    Body: {"district": 63, "area": 120, "step": 1, "year": 2022,
+           "caps": {"1": 40}, "min_area": 10, "respect_demand": false}
+    area, step, caps and min_area are in acres; step defaults to 1 acre,
+    coarsened so the farm has at most MAX_OPTIMIZER_STEPS steps. caps limits
+    the acres of individual crops and a planted crop gets at least min_area
+    acres (and always at least one whole hectare). With respect_demand,
+    production beyond a crop's demand gap (expected demand minus registered
+    production) earns nothing.
+    """
+    try:
+        data = request.get_json()
+        dist = int(data.get('district'))
+        area = int(data.get('area'))
+        year = int(data.get('year', 2022))
+        step = max(int(data.get('step', 1)), -(-area // MAX_OPTIMIZER_STEPS), 1)
+        caps = {int(crop_id): int(acres) for crop_id, acres in (data.get('caps') or {}).items()}
+        min_area = int(data.get('min_area', 0))
+
+        if dist not in DISTRICTS:
+            return jsonify({'status': 'error', 'message': 'Invalid district'})
+        if area <= 0:
+            return jsonify({'status': 'error', 'message': 'Area must be positive'})
+        invalid = [crop_id for crop_id in caps if crop_id not in CROP_CONFIGS]
+        if invalid:
+            return jsonify({'status': 'error', 'message': f'Invalid crop(s) in caps: {invalid}'})
+        negative = [crop_id for crop_id, acres in caps.items() if acres < 0]
+        if negative:
+            return jsonify({'status': 'error', 'message': f'Caps must not be negative, got {negative}'})
+        if min_area < 0:
+            return jsonify({'status': 'error', 'message': 'min_area must not be negative'})
+
+        crop_ids = np.array(list(CROP_CONFIGS))
+
+        # Revenue of every crop on 0, 1, ..., area // step steps, in one vectorized pass
+        areas = np.arange(area // step + 1) * step
+        area_hectares, production, price, _ = scenario_cube(crop_ids, [dist], [year], areas)
+        production, price = production[:, 0, 0], price[:, 0, 0]
+        sold = np.maximum(production, 0)
+        if data.get('respect_demand'):
+            gaps = []
+            for crop_id in crop_ids.tolist():
+                demand, error = predicted_demand(crop_id, year)
+                total = current_total(CROP_CONFIGS[crop_id]['name'])
+                gaps.append(np.inf if error else max(0, demand - total))
+            sold = np.minimum(sold, np.array(gaps)[:, None])
+        revenue = np.where(np.isnan(production), -np.inf, np.trunc(sold) * np.maximum(price, 0))
+        revenue[:, (area_hectares == 0) | (areas < min_area)] = -np.inf
+        limits = np.array([caps.get(crop_id, area) // step for crop_id in crop_ids.tolist()])
+
+        allocation, total_revenue = best_allocation(revenue, limits)
+
+        crops = []
+        for c, crop_id in enumerate(crop_ids.tolist()):
+            k = int(allocation[c])
+            crops.append({
+                'id': crop_id,
+                'crop': CROP_CONFIGS[crop_id]['display'],
+                'area_acres': int(areas[k]),
+                'area_hectares': int(area_hectares[k]),
+                'production_quintals': int(production[c, k]) if k else 0,
+                'price_per_quintal': int(price[c, k]) if k else 0,
+                'revenue': int(revenue[c, k]) if k else 0,
+                'single_crop_revenue': int(revenue[c, -1]) if np.isfinite(revenue[c, -1]) else None
+            })
+
+        return jsonify({
+            'status': 'success',
+            'district': DISTRICTS[dist],
+            'year': year,
+            'area_acres': area,
+            'step_acres': step,
+            'allocation': crops,
+            'total_revenue': int(total_revenue),
+            'unallocated_acres': area - int(areas[allocation].sum())
+        })
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)})
+
+# Fields each linear batch kind reads from its records
+BATCH_FIELDS = {
+    'production': ('crop', 'district', 'area'),
+    'price': ('crop', 'area', 'production'),
+    'demand': ('crop',)
+}
+
+@app.route('/api/predict/batch', methods=['POST'])
+def api_predict_batch():
+    """API endpoint for batch prediction.
+
+    Body: {"kind": "production" | "price" | "demand" | "fertilizer" | "recommendation",
+           "records": [...]}
+    where each record carries the same fields as the single-item endpoint
+    (recommendation records use nitrogen, phosphorus, potassium, temperature,
+    humidity, ph and rainfall). Each model is evaluated once for the whole batch.
+    """
+    try:
+        data = request.get_json()
+        kind = data.get('kind', 'production')
+        records = data.get('records') or []
+
+        if kind in TREE_BATCH_FIELDS:
+            tree_model = get_fertilizer_model() if kind == 'fertilizer' else get_recommendation_model()
+            if not tree_model:
+                return jsonify({'status': 'error', 'message': f'{kind.capitalize()} model not available'})
+            columns, errors = parse_records(records, TREE_BATCH_FIELDS[kind], FLOAT_FIELDS)
+            features = np.column_stack([columns[field] for field in TREE_BATCH_FIELDS[kind]]) \
+                if records else np.empty((0, len(TREE_BATCH_FIELDS[kind])))
+            labels = tree_model.predict(features).tolist()
+            result_field = 'recommended_fertilizer' if kind == 'fertilizer' else 'recommended_crop'
+            results = [{'status': 'error', 'message': error} if error else {'status': 'success', result_field: label}
+                       for label, error in zip(labels, errors)]
+            return jsonify({'status': 'success', 'kind': kind, 'count': len(results), 'results': results})
+
+        if kind not in BATCH_FIELDS:
+            return jsonify({'status': 'error', 'message': 'Invalid kind'})
+
+        columns, errors = parse_records(records, BATCH_FIELDS[kind])
+        crop_ids = columns['crop']
+        valid = np.isin(crop_ids, list(CROP_CONFIGS))
+
+        if kind == 'production':
+            dists = columns['district']
+            areas = columns['area']
+            area_hectares = (areas / 2.47).astype(np.int64)
+            features = np.column_stack([dists, np.full(len(records), 2022), area_hectares])
+            production = predict_linear('production', crop_ids, features)
+            fields = {
+                'area_acres': areas.tolist(),
+                'area_hectares': area_hectares.tolist(),
+                'production_quintals': production
+            }
+        elif kind == 'price':
+            areas = columns['area']
+            production = columns['production']
+            area_hectares = (areas / 2.47).astype(np.int64)
+            features = np.column_stack([np.full(len(records), 2022), area_hectares, production])
+            price = predict_linear('price', crop_ids, features)
+            fields = {
+                'price_per_quintal': price,
+                'total_revenue': price * production
+            }
+        else:
+            models = current_models()
+            demand = models.demand_table.lookup(models.rows(crop_ids), np.full(len(records), 2022))
+            fields = {'expected_demand_quintals': demand}
+
+        available = valid.copy()
+        for name, values in fields.items():
+            if isinstance(values, np.ndarray):
+                available &= ~np.isnan(values)
+                fields[name] = np.nan_to_num(values).astype(np.int64).tolist()
+
+        results = []
+        for i, crop_id in enumerate(crop_ids.tolist()):
+            if errors[i]:
+                results.append({'status': 'error', 'message': errors[i]})
+                continue
+            if not valid[i]:
+                results.append({'status': 'error', 'message': 'Invalid crop'})
+                continue
+            if not available[i]:
+                results.append({'status': 'error', 'message': f'{kind.capitalize()} model not available'})
+                continue
+            result = {'status': 'success', 'crop': CROP_CONFIGS[crop_id]['display']}
+            if kind == 'production':
+                result['district'] = DISTRICTS.get(int(dists[i]), 'Unknown')
+            for name, values in fields.items():
+                result[name] = values[i]
+            results.append(result)
+
+        return jsonify({'status': 'success', 'kind': kind, 'count': len(results), 'results': results})
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)})
+
+ESTIMATE_FIELDS = ('crop', 'district', 'area')
+
+@app.route('/api/predict/estimate', methods=['POST'])
+def api_predict_estimate():
+    """API endpoint for the fused production -> price -> revenue estimate.
+
+    Body: {"records": [{"crop": 1, "district": 63, "area": 100}, ...]}
+    or the same fields as parallel arrays: {"crop": [...], "district": [...], "area": [...]}.
+    Pass "format": "columns" to get the results back as parallel arrays.
+    A record that is malformed gets its own error and does not fail the others.
+    """
+    try:
+        data = request.get_json()
+        records = data.get('records')
+        if records is not None:
+            columns, errors = parse_records(records, ESTIMATE_FIELDS)
+            crop_ids, dists, areas = (columns[field] for field in ESTIMATE_FIELDS)
+        else:
+            crop_ids = np.asarray(data.get('crop', []), dtype=np.int64)
+            dists = np.asarray(data.get('district', []), dtype=np.int64)
+            areas = np.asarray(data.get('area', []), dtype=np.int64)
+            errors = [None] * len(crop_ids)
+
+        if not (len(crop_ids) == len(dists) == len(areas)):
+            return jsonify({'status': 'error', 'message': 'crop, district and area must have the same length'})
+
+        estimate = estimate_pipeline(crop_ids, dists, areas)
+        available = ~np.isnan(estimate['production'])
+        columns = {
+            'crop': crop_ids.tolist(),
+            'district': dists.tolist(),
+            'area_acres': areas.tolist(),
+            'area_hectares': estimate['area_hectares'].tolist(),
+            'production_quintals': np.nan_to_num(estimate['production']).astype(np.int64).tolist(),
+            'price_per_quintal': estimate['price'].astype(np.int64).tolist(),
+            'estimated_revenue': np.nan_to_num(estimate['revenue']).astype(np.int64).tolist(),
+            'district_demand_quintals': estimate['demand'].astype(np.int64).tolist(),
+            'production_gap_quintals': np.nan_to_num(estimate['gap']).astype(np.int64).tolist(),
+            'exceeds_demand': estimate['exceeds_demand'].tolist(),
+            'available': (available & np.array([error is None for error in errors], dtype=bool)).tolist(),
+            'error': errors
+        }
+
+        if data.get('format') == 'columns':
+            return jsonify({'status': 'success', 'count': len(crop_ids), 'columns': columns})
+
+        results = []
+        for i, crop_id in enumerate(columns['crop']):
+            if errors[i]:
+                results.append({'status': 'error', 'message': errors[i]})
+                continue
+            if crop_id not in CROP_CONFIGS:
+                results.append({'status': 'error', 'message': 'Invalid crop'})
+                continue
+            if not columns['available'][i]:
+                results.append({'status': 'error', 'message': 'Production model not available'})
+                continue
+            result = {name: values[i] for name, values in columns.items() if name not in ('available', 'error')}
+            result.update({
+                'status': 'success',
+                'crop': CROP_CONFIGS[crop_id]['display'],
+                'district': DISTRICTS.get(columns['district'][i], 'Unknown')
+            })
+            results.append(result)
+
+        return jsonify({'status': 'success', 'count': len(results), 'results': results})
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)})
+
 @app.route('/api/predict/fertilizer', methods=['POST'])
 def api_predict_fertilizer():
     """API endpoint for fertilizer recommendation"""
@@ -625,16 +1008,53 @@ def api_predict_fertilizer():
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)})
 
+@app.route('/api/statistics', methods=['GET', 'POST'])
+def api_statistics():
+    """API endpoint for registered production vs expected demand of a crop"""
+    try:
+        data = request.get_json(silent=True) or request.args
+        crop_id = int(data.get('crop'))
+        
+        if crop_id not in CROP_CONFIGS:
+            return jsonify({'status': 'error', 'message': 'Invalid crop'})
+        
+        crop_name = CROP_CONFIGS[crop_id]['name']
+        
+        threshold, error = predicted_demand(crop_id)
+        if error:
+            return jsonify({'status': 'error', 'message': error})
+        
+        total = current_total(crop_name)
+        
+        return jsonify({
+            'status': 'success',
+            'crop': CROP_CONFIGS[crop_id]['display'],
+            'current_production_quintals': int(total),
+            'expected_demand_quintals': int(threshold),
+            'production_gap_quintals': int(max(0, threshold - total)),
+            'meets_demand': bool(total >= threshold),
+            'by_district': [
+                {'id': dist_id, 'name': DISTRICTS.get(dist_id, 'Unknown'), **totals}
+                for dist_id, totals in sorted(registration_store.district_totals(crop_name).items())
+            ]
+        })
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)})
+
 @app.route('/api/models/status', methods=['GET'])
 def api_models_status():
     """Get status of all models"""
     try:
+        models = current_models()
         status = {
-            'production_models': len(models_cache['production']),
-            'price_models': len(models_cache['price']),
-            'district_models': len(models_cache['district']),
-            'fertilizer_model': get_fertilizer_model() is not None,
-            'recommendation_model': get_recommendation_model() is not None,
+            'production_models': len(models.linear['production']),
+            'price_models': len(models.linear['price']),
+            'district_models': len(models.linear['district']),
+            'fertilizer_model': models.counts()['fertilizer'] > 0,
+            'recommendation_model': models.counts()['recommendation'] > 0,
+            'bundle_version': models.version,
+            'generation': models.generation,
+            'missing_artifacts': list(models.missing),
             'total_crops_supported': len(CROP_CONFIGS),
             'total_districts': len(DISTRICTS)
         }
@@ -642,17 +1062,129 @@ def api_models_status():
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)})
 
+@app.route('/api/cache/stats', methods=['GET'])
+def api_cache_stats():
+    """Hit/miss counters of the prediction, chart and model caches"""
+    try:
+        return jsonify({
+            'status': 'success',
+            'model_bundle_version': current_models().version,
+            'predictions': prediction_cache.stats(),
+            'charts': chart_cache.stats(),
+            'models': model_registry.cache.stats()
+        })
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)})
+
+@metrics.collector
+def cache_metrics():
+    """Cache counters and loaded models, read from their owners at scrape time"""
+    families = []
+    caches = (('prediction', prediction_cache.stats()), ('chart', chart_cache.stats()),
+              ('model', model_registry.cache.stats()))
+    for cache_name, stats in caches:
+        lookups = stats['hits'] + stats['misses']
+        prefix = f'agripredict_{cache_name}_cache'
+        families += [
+            (f'{prefix}_hits_total', 'counter', f'{cache_name.capitalize()} cache hits', [({}, stats['hits'])]),
+            (f'{prefix}_misses_total', 'counter', f'{cache_name.capitalize()} cache misses', [({}, stats['misses'])]),
+            (f'{prefix}_evictions_total', 'counter', f'{cache_name.capitalize()} cache evictions',
+             [({}, stats['evictions'])]),
+            (f'{prefix}_hit_ratio', 'gauge', f'{cache_name.capitalize()} cache hits per lookup',
+             [({}, stats['hits'] / lookups if lookups else 0.0)]),
+            (f'{prefix}_entries', 'gauge', f'{cache_name.capitalize()} cache entries', [({}, stats['entries'])])
+        ]
+    model_cache = model_registry.cache.stats()
+    families += [
+        ('agripredict_model_cache_bytes', 'gauge', 'Memory held by cached models', [({}, model_cache['bytes'])]),
+        ('agripredict_model_cache_max_bytes', 'gauge', 'Model cache memory budget', [({}, model_cache['max_bytes'])]),
+        ('agripredict_model_cache_coalesced_total', 'counter', 'Model cache misses that waited on a load in flight',
+         [({}, model_cache['coalesced'])]),
+        ('agripredict_model_table_bytes', 'gauge', 'Memory held by the served compiled linear and demand tables',
+         [({}, model_registry.snapshot.table_bytes())])
+    ]
+    models = model_registry.snapshot
+    loaded = [({'kind': kind}, count) for kind, count in models.counts().items()]
+    families.append(('agripredict_models_loaded', 'gauge', 'Models loaded per kind', loaded))
+    families.append(('agripredict_model_bundle_info', 'gauge', 'Model bundle the models came from',
+                     [({'version': models.version or 'pickles'}, 1)]))
+    families.append(('agripredict_model_generation', 'gauge', 'Model snapshots published by this process',
+                     [({}, models.generation)]))
+    families.append(('agripredict_model_reloads_failed_total', 'counter', 'Reloads rejected by validation',
+                     [({}, model_registry.failed_reloads)]))
+    return families
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Request, stage and cache metrics of this process in Prometheus text format"""
+    return Response(metrics.render(), content_type=CONTENT_TYPE)
+
+# Model reloads need an X-AgriPredict-Admin token signed with
+# AGRIPREDICT_ADMIN_SECRET; unset, the /admin/models endpoints always refuse
+admin_secret = ADMIN_SECRET
+
+def admin_authorized():
+    return verify_token(profiler.secret, request.headers.get(PROFILE_HEADER))
+
+def models_admin_authorized():
+    return verify_token(admin_secret, request.headers.get(ADMIN_HEADER))
+
+@app.route('/admin/profiles', methods=['GET', 'POST', 'DELETE'])
+def admin_profiles():
+    """Profiled endpoints of this process; POST {"rate": 0.01} sets the sample rate, DELETE clears"""
+    if not admin_authorized():
+        return jsonify({'status': 'error', 'message': 'Forbidden'}), 403
+    try:
+        if request.method == 'POST':
+            rate = float(request.get_json().get('rate'))
+            if not 0 <= rate <= 1:
+                return jsonify({'status': 'error', 'message': 'rate must be between 0 and 1'})
+            profiler.rate = rate
+        elif request.method == 'DELETE':
+            profiler.reset()
+        return jsonify({'status': 'success', 'profiler': profiler.stats()})
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)})
+
+@app.route('/admin/profiles/<endpoint>', methods=['GET'])
+def admin_profile(endpoint):
+    """Collapsed stacks of an endpoint, over every profiled request or (?latest=1) the last one"""
+    if not admin_authorized():
+        return jsonify({'status': 'error', 'message': 'Forbidden'}), 403
+    collapsed = profiler.collapsed(endpoint, latest=request.args.get('latest') == '1')
+    if collapsed is None:
+        return jsonify({'status': 'error', 'message': f'No profile for {endpoint}'}), 404
+    return Response(collapsed, content_type='text/plain; charset=utf-8')
+
+@app.route('/admin/models', methods=['GET'])
+def admin_models():
+    """Generation, counts and reload history of the served model snapshot"""
+    if not models_admin_authorized():
+        return jsonify({'status': 'error', 'message': 'Forbidden'}), 403
+    return jsonify({'status': 'success', 'registry': model_registry.stats()})
+
+@app.route('/admin/models/reload', methods=['POST'])
+def admin_reload_models():
+    """Load the current artifacts and swap them in; requests already running finish on the old models"""
+    if not models_admin_authorized():
+        return jsonify({'status': 'error', 'message': 'Forbidden'}), 403
+    try:
+        published, problems = model_registry.reload()
+        return jsonify({'status': 'success' if published else 'error',
+                        'message': 'Models reloaded' if published else 'New models failed validation',
+                        'problems': problems,
+                        'registry': model_registry.stats()}), 200 if published else 409
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)})
+
 @app.route('/api/health', methods=['GET'])
 def api_health():
     """Health check endpoint"""
     try:
-        has_production = len(models_cache['production']) > 0 or any(
-            os.path.exists(f"{config['name']}_pro_model.pkl") 
-            for config in CROP_CONFIGS.values()
-        )
+        production_models = len(current_models().linear['production'])
         return jsonify({
-            'status': 'healthy' if has_production else 'initializing',
-            'models_loaded': len(models_cache['production'])
+            'status': 'healthy' if production_models > 0 else 'initializing',
+            'models_loaded': production_models
         })
     except Exception as e:
         return jsonify({'status': 'unhealthy', 'error': str(e)})
@@ -740,11 +1272,12 @@ if __name__ == '__main__':
     print("🌾 AgriPredict ML Service Starting...")
     print("="*60)
     print("\n📦 Available Models:")
-    print(f"  • Production Models: {len(models_cache['production'])} crops")
-    print(f"  • Price Models: {len(models_cache['price'])} crops")
-    print(f"  • District Models: {len(models_cache['district'])} crops")
-    print(f"  • Fertilizer Model: {'✓ Loaded' if models_cache['fertilizer'] else '✗ Not found'}")
-    print(f"  • Recommendation Model: {'✓ Loaded' if models_cache['recommendation'] else '✗ Not found'}")
+    models = model_registry.snapshot
+    print(f"  • Production Models: {len(models.linear['production'])} crops")
+    print(f"  • Price Models: {len(models.linear['price'])} crops")
+    print(f"  • District Models: {len(models.linear['district'])} crops")
+    print(f"  • Fertilizer Model: {'✓ Loaded' if models.counts()['fertilizer'] else '✗ Not found'}")
+    print(f"  • Recommendation Model: {'✓ Loaded' if models.counts()['recommendation'] else '✗ Not found'}")
     print(f"\n🌾 Supported Crops:")
     for crop_id, config in CROP_CONFIGS.items():
         print(f"  • {config['display']}")
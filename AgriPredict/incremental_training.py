@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+"""
+Incremental refresh of the crop linear models.
+
+A full retrain refits every model on the whole 1966-present history. The
+linear models only depend on a few sufficient statistics - the row count,
+the feature and target means, and the centred XᵀX and Xᵀy - so those are
+kept next to each artifact in {crop}_{suffix}.stats.npz, together with a
+cursor into the training CSV. A refresh reads only the bytes appended since
+the cursor, folds the new rows into the statistics and re-solves the
+coefficients, a p x p system with p <= 3.
+
+    python incremental_training.py                  # fold in new CSV rows
+
+A full retrain with train_models.py drops the statistics of the models it
+refits.
+
+The first run (or a CSV that was edited rather than appended to) builds the
+statistics from the whole file. Rows held out by the full retrain are held
+out here too, by an equivalent random TEST_SIZE mask; trailing gaps that
+linear interpolation filled forward are not revisited once the next season
+arrives.
+
+Farmer registrations are not a training source: the production stored with
+each one is this model's own prediction, not an observed yield, so folding
+it back in would only reweight the current fit.
+"""
+import argparse
+import hashlib
+import io
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from linear_models import MODEL_KINDS
+from model_bundle import BUNDLE_FILE, TRAINING_DATA, build_bundle
+from train_models import TEST_SIZE, TRAINING_CROPS, artifact_name, linear_columns, stats_path, write_artifact
+
+# Bytes before the cursor that must be unchanged for the file to count as appended to
+FINGERPRINT_BYTES = 4096
+
+
+class LinearStats:
+    """Mergeable least-squares statistics for one linear model.
+
+    Keeps the means and centred co-moments rather than raw XᵀX, which is
+    the same information but does not lose precision to Year² terms.
+    """
+
+    def __init__(self, n_features, n=0, mean_x=None, mean_y=0.0, cxx=None, cxy=None):
+        self.n = int(n)
+        self.mean_x = np.zeros(n_features) if mean_x is None else np.asarray(mean_x, dtype=np.float64)
+        self.mean_y = float(mean_y)
+        self.cxx = np.zeros((n_features, n_features)) if cxx is None else np.asarray(cxx, dtype=np.float64)
+        self.cxy = np.zeros(n_features) if cxy is None else np.asarray(cxy, dtype=np.float64)
+
+    def update(self, X, y):
+        """Fold a batch of rows in (Chan et al. pairwise update)"""
+        X = np.asarray(X, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        m = len(y)
+        if m == 0:
+            return
+        batch_x = X.mean(axis=0)
+        batch_y = y.mean()
+        dx = X - batch_x
+        dy = y - batch_y
+        total = self.n + m
+        delta_x = batch_x - self.mean_x
+        delta_y = batch_y - self.mean_y
+        weight = self.n * m / total
+        self.cxx += dx.T @ dx + weight * np.outer(delta_x, delta_x)
+        self.cxy += dx.T @ dy + weight * delta_x * delta_y
+        self.mean_x += delta_x * (m / total)
+        self.mean_y += delta_y * (m / total)
+        self.n = total
+
+    def solve(self):
+        """Ordinary least squares coefficients and intercept"""
+        coef = np.linalg.lstsq(self.cxx, self.cxy, rcond=None)[0]
+        return coef, self.mean_y - self.mean_x @ coef
+
+
+def read_appended(path, offset, fingerprint):
+    """Return (rows, new offset, new fingerprint, appended) for bytes past offset.
+
+    appended is False when the bytes before offset changed, in which case
+    rows holds the whole file.
+    """
+    with open(path, 'rb') as f:
+        header = f.readline()
+        size = os.fstat(f.fileno()).st_size
+        appended = offset and size >= offset
+        if appended:
+            f.seek(max(offset - FINGERPRINT_BYTES, 0))
+            appended = hashlib.sha256(f.read(offset - f.tell())).hexdigest() == fingerprint
+        start = offset if appended else len(header)
+        f.seek(start)
+        tail = f.read()
+        f.seek(max(size - FINGERPRINT_BYTES, 0))
+        new_fingerprint = hashlib.sha256(f.read()).hexdigest()
+    rows = pd.read_csv(io.BytesIO(header + tail)) if tail.strip() else None
+    return rows, size, new_fingerprint, bool(appended)
+
+
+def load_state(path):
+    if not os.path.exists(path):
+        return None
+    with np.load(path, allow_pickle=False) as data:
+        return {name: data[name] for name in data.files}
+
+
+def save_state(path, state):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, **state)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def linear_model(kind, coef, intercept, feature_names):
+    """A fitted LinearRegression with the given coefficients, shaped like a full fit's"""
+    from sklearn.linear_model import LinearRegression
+
+    model = LinearRegression()
+    if kind == 'district':
+        model.coef_ = coef.reshape(1, -1)
+        model.intercept_ = np.array([intercept])
+    else:
+        model.coef_ = coef
+        model.intercept_ = float(intercept)
+    model.n_features_in_ = len(feature_names)
+    model.feature_names_in_ = np.array(feature_names, dtype=object)
+    model.rank_ = len(feature_names)
+    return model
+
+
+def refresh_model(kind, crop, data_dir=".", output_dir=".", seed=None):
+    """Fold new rows into one model's statistics and rewrite its artifact.
+
+    Returns (new rows used, whether the statistics were rebuilt, solve seconds).
+    """
+    features, target = linear_columns(kind, crop)
+    columns = features + [target]
+    path = stats_path(output_dir, kind, crop)
+    state = load_state(path)
+
+    rows, offset, fingerprint, appended = read_appended(
+        os.path.join(data_dir, TRAINING_DATA[kind]),
+        int(state['offset']) if state else 0,
+        str(state['fingerprint']) if state else '')
+    if state is None or not appended:
+        stats = LinearStats(len(features))
+        carry = None
+    else:
+        stats = LinearStats(len(features), state['n'], state['mean_x'], state['mean_y'],
+                            state['cxx'], state['cxy'])
+        carry = state['carry']
+
+    used = 0
+    if rows is not None:
+        frame = rows[columns].astype(np.float64)
+        if kind != 'district':
+            # Interpolate the new rows against the last row already folded in
+            if carry is not None:
+                frame = pd.concat([pd.DataFrame([carry], columns=columns), frame], ignore_index=True)
+            frame = frame.interpolate(method='linear')
+            if carry is not None:
+                frame = frame.iloc[1:]
+        frame = frame.dropna()
+        if len(frame):
+            carry = frame.iloc[-1].to_numpy()
+        if kind != 'price':
+            keep = np.random.default_rng(seed).random(len(frame)) >= TEST_SIZE
+            frame = frame[keep]
+        stats.update(frame[features].to_numpy(), frame[target].to_numpy())
+        used += len(frame)
+
+    start = time.perf_counter()
+    coef, intercept = stats.solve()
+    solve_seconds = time.perf_counter() - start
+
+    write_artifact(linear_model(kind, coef, intercept, features),
+                   os.path.join(output_dir, artifact_name(kind, crop)))
+    save_state(path, {
+        'n': stats.n, 'mean_x': stats.mean_x, 'mean_y': stats.mean_y,
+        'cxx': stats.cxx, 'cxy': stats.cxy,
+        'offset': offset, 'fingerprint': fingerprint,
+        'carry': np.full(len(columns), np.nan) if carry is None else carry
+    })
+    return used, state is None or not appended, solve_seconds
+
+
+def refresh(crops=TRAINING_CROPS, kinds=None, data_dir=".", output_dir=".", seed=None, bundle=True):
+    """Refresh the selected linear models; returns {artifact: refresh_model() result}"""
+    kinds = [kind for kind in (kinds or MODEL_KINDS) if kind in MODEL_KINDS]
+    results = {artifact_name(kind, crop): refresh_model(kind, crop, data_dir, output_dir, seed)
+               for crop in crops for kind in kinds}
+    if bundle:
+        build_bundle(TRAINING_CROPS, os.path.join(output_dir, BUNDLE_FILE), data_dir, output_dir)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--crops', nargs='+', default=list(TRAINING_CROPS), choices=TRAINING_CROPS)
+    parser.add_argument('--kinds', nargs='+', default=None, choices=list(MODEL_KINDS))
+    parser.add_argument('--seed', type=int, default=None, help='seed for the holdout mask')
+    parser.add_argument('--data-dir', default='.', help='directory with the training CSVs')
+    parser.add_argument('--output-dir', default='.', help='directory with the artifacts')
+    parser.add_argument('--no-bundle', action='store_true', help=f'do not rebuild {BUNDLE_FILE}')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = refresh(args.crops, args.kinds, args.data_dir, args.output_dir, args.seed, not args.no_bundle)
+    for filename, (used, rebuilt, solve_seconds) in results.items():
+        note = ' (statistics rebuilt)' if rebuilt else ''
+        print(f"  [OK] {filename}: {used} new rows, solved in {solve_seconds * 1e6:.0f} us{note}")
+    print(f"OK - Refreshed {len(results)} models in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""
+Deferred imports for heavy optional dependencies.
+
+Only the server-rendered /statistics chart needs matplotlib, so importing it
+at startup slows down every worker that just serves prediction APIs.
+lazy_import() returns a stand-in module that performs the real import (and
+any one-time setup) on first attribute access.
+"""
+import importlib
+import threading
+
+
+class LazyModule:
+    """Module proxy that imports the real module on first attribute access"""
+
+    def __init__(self, name, on_load=None):
+        self._name = name
+        self._on_load = on_load
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._module is None:
+                module = importlib.import_module(self._name)
+                if self._on_load is not None:
+                    self._on_load(module)
+                self._module = module
+        return self._module
+
+    @property
+    def is_loaded(self):
+        return self._module is not None
+
+    def __getattr__(self, attr):
+        return getattr(self._module or self._load(), attr)
+
+    def __repr__(self):
+        state = 'loaded' if self.is_loaded else 'not loaded'
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+def lazy_import(name, on_load=None):
+    """Return a LazyModule for name; on_load(module) runs once after the import"""
+    return LazyModule(name, on_load)
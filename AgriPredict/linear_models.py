@@ -0,0 +1,189 @@
+"""
+Compiled inference for the per-crop LinearRegression models.
+
+The production, price and district models are plain linear regressions, so
+all they need at serve time is coef_ and intercept_. This module pulls those
+out of the sklearn objects once and stacks them into a single
+(crop, model kind) -> coefficient table. Predictions are then a dot product
+with no sklearn input validation. model_bundle.py stores the table so a
+serving process never has to import sklearn for these models.
+"""
+import operator
+
+import numpy as np
+
+# Model kinds in table order, with the artifact suffix each one is trained to
+MODEL_KINDS = {
+    'production': 'pro_model',
+    'price': 'pri_model',
+    'district': 'district_model'
+}
+
+
+class CompiledLinearModel:
+    """A LinearRegression reduced to its coefficients, with the same predict() API"""
+
+    __slots__ = ('coef', 'intercept', 'feature_names', '_weights')
+
+    def __init__(self, coef, intercept, feature_names=()):
+        self.coef = np.ascontiguousarray(np.ravel(coef), dtype=np.float64)
+        self.intercept = float(intercept)
+        self.feature_names = tuple(str(name) for name in feature_names)
+        self._weights = tuple(self.coef.tolist())
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """Compile a fitted sklearn LinearRegression (single target)"""
+        return cls(np.ravel(model.coef_),
+                   np.ravel(model.intercept_)[0],
+                   getattr(model, 'feature_names_in_', ()))
+
+    @property
+    def n_features_in_(self):
+        return len(self.coef)
+
+    def predict(self, X):
+        """Predict a 2-D batch of feature rows, like LinearRegression.predict"""
+        return np.asarray(X, dtype=np.float64) @ self.coef + self.intercept
+
+    def predict_one(self, *features):
+        """Predict a single row given as positional features, in pure Python"""
+        return sum(map(operator.mul, self._weights, features), self.intercept)
+
+
+class LinearModelTable:
+    """All crop linear models stacked into one (crop, kind, feature) array.
+
+    coef has shape (n_crops, n_kinds, max_features) and is zero-padded for
+    kinds with fewer features; intercept and available are (n_crops, n_kinds).
+    """
+
+    def __init__(self, crops, coef, intercept, available, n_features, feature_names=None):
+        self.crops = [str(crop) for crop in crops]
+        self.kinds = list(MODEL_KINDS)
+        self.crop_index = {crop: i for i, crop in enumerate(self.crops)}
+        self.kind_index = {kind: i for i, kind in enumerate(self.kinds)}
+        self.coef = np.ascontiguousarray(coef, dtype=np.float64)
+        self.intercept = np.ascontiguousarray(intercept, dtype=np.float64)
+        self.available = np.ascontiguousarray(available, dtype=bool)
+        self.n_features = np.asarray(n_features, dtype=np.int64)
+        self.feature_names = feature_names or {}
+
+    @classmethod
+    def from_models(cls, crops, models_by_kind):
+        """Stack compiled models given as {kind: {crop: CompiledLinearModel}}"""
+        crops = list(crops)
+        kinds = list(MODEL_KINDS)
+        n_features = np.zeros(len(kinds), dtype=np.int64)
+        for k, kind in enumerate(kinds):
+            for model in models_by_kind.get(kind, {}).values():
+                n_features[k] = max(n_features[k], model.n_features_in_)
+
+        coef = np.zeros((len(crops), len(kinds), max(int(n_features.max(initial=0)), 1)))
+        intercept = np.zeros((len(crops), len(kinds)))
+        available = np.zeros((len(crops), len(kinds)), dtype=bool)
+        feature_names = {}
+        for c, crop in enumerate(crops):
+            for k, kind in enumerate(kinds):
+                model = models_by_kind.get(kind, {}).get(crop)
+                if model is None:
+                    continue
+                coef[c, k, :model.n_features_in_] = model.coef
+                intercept[c, k] = model.intercept
+                available[c, k] = True
+                feature_names[(crop, kind)] = model.feature_names
+        return cls(crops, coef, intercept, available, n_features, feature_names)
+
+    def model(self, crop, kind):
+        """Return the compiled model for one crop and kind, or None"""
+        c = self.crop_index.get(crop)
+        k = self.kind_index[kind]
+        if c is None or not self.available[c, k]:
+            return None
+        return CompiledLinearModel(self.coef[c, k, :self.n_features[k]],
+                                   self.intercept[c, k],
+                                   self.feature_names.get((crop, kind), ()))
+
+    def predict(self, rows, kind, features):
+        """Predict many rows at once, each against its own crop's coefficients.
+
+        rows holds a table row index per feature row (-1 for unknown crops);
+        rows whose crop has no model of this kind come back as NaN.
+        """
+        k = self.kind_index[kind]
+        rows = np.asarray(rows, dtype=np.int64)
+        features = np.asarray(features, dtype=np.float64)
+        known = rows >= 0
+        safe_rows = np.where(known, rows, 0)
+        coef = self.coef[safe_rows, k, :self.n_features[k]]
+        predictions = np.einsum('ij,ij->i', features[:, :self.n_features[k]], coef)
+        predictions += self.intercept[safe_rows, k]
+        predictions[~(known & self.available[safe_rows, k])] = np.nan
+        return predictions
+
+    def predict_broadcast(self, rows, kind, *features):
+        """Predict over arrays that broadcast against each other.
+
+        rows and each feature (in model order) may have any shapes that
+        broadcast together, e.g. one axis each for a Cartesian product; the
+        result has the broadcast shape, NaN where the crop has no model.
+        """
+        k = self.kind_index[kind]
+        rows = np.asarray(rows, dtype=np.int64)
+        known = rows >= 0
+        safe_rows = np.where(known, rows, 0)
+        predictions = self.intercept[safe_rows, k]
+        for j, feature in enumerate(features[:self.n_features[k]]):
+            predictions = predictions + self.coef[safe_rows, k, j] * np.asarray(feature, dtype=np.float64)
+        return np.where(known & self.available[safe_rows, k], predictions, np.nan)
+
+
+class DemandTable:
+    """District-model demand precomputed for every crop over a range of years.
+
+    values has shape (n_crops, n_years), with NaN for crops that have no
+    district model. Years outside the range fall back to the coefficients.
+    """
+
+    def __init__(self, table, first_year, last_year):
+        self.table = table
+        self.first_year = int(first_year)
+        self.years = np.arange(self.first_year, int(last_year) + 1)
+        rows = np.repeat(np.arange(len(table.crops)), len(self.years))
+        years = np.tile(self.years, len(table.crops))
+        self.values = table.predict(rows, 'district', years[:, None]).reshape(len(table.crops), len(self.years))
+
+    def get(self, row, year):
+        """Demand for one table row and year, NaN when there is no model"""
+        index = year - self.first_year
+        if row >= 0 and 0 <= index < len(self.years):
+            return float(self.values[row, index])
+        return float(self.lookup([row], [year])[0])
+
+    def lookup(self, rows, years):
+        """Demand for parallel arrays of table rows and years"""
+        rows = np.asarray(rows, dtype=np.int64)
+        years = np.asarray(years, dtype=np.int64)
+        index = years - self.first_year
+        inside = (rows >= 0) & (index >= 0) & (index < len(self.years))
+        demand = np.empty(len(rows))
+        demand[inside] = self.values[rows[inside], index[inside]]
+        if not inside.all():
+            demand[~inside] = self.table.predict(rows[~inside], 'district', years[~inside, None])
+        return demand
+
+
+def compile_pickles(crops, directory="."):
+    """Compile every {crop}_{suffix}.pkl found in directory into a table"""
+    import os
+    import pickle
+
+    models_by_kind = {kind: {} for kind in MODEL_KINDS}
+    for crop in crops:
+        for kind, suffix in MODEL_KINDS.items():
+            path = os.path.join(directory, f"{crop}_{suffix}.pkl")
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    models_by_kind[kind][crop] = CompiledLinearModel.from_sklearn(pickle.load(f))
+    return LinearModelTable.from_models(crops, models_by_kind)
+
@@ -0,0 +1,82 @@
+"""
+Micro-batching of single-item predictions across concurrent requests.
+
+Clients such as the Node backend send one prediction per request from many
+users at once. A MicroBatcher lives on the event loop that serves those
+requests (async_serve.py) and queues each prediction under a key - model
+kind and crop. A queue is flushed with one vectorized predict call when it
+reaches max_batch_size or when its oldest entry has waited max_wait
+seconds, and each caller's future is resolved with its own row of the
+result. With max_wait 0 (the default) a queue is flushed on the loop's
+next pass: requests that arrived together share a call and a lone request
+waits for nothing.
+"""
+import asyncio
+import os
+
+import numpy as np
+
+MICRO_BATCH_MAX_SIZE = int(os.environ.get('AGRIPREDICT_MICRO_BATCH_SIZE', 64))
+MICRO_BATCH_MAX_WAIT = float(os.environ.get('AGRIPREDICT_MICRO_BATCH_WAIT_MS', 0)) / 1000
+
+
+class MicroBatcher:
+    """Collects single predictions into per-key queues and evaluates each queue at once.
+
+    predict(key, features) receives the queue key and a 2-D array with one
+    feature row per queued request, and returns one result per row. Use it
+    from coroutines on a single event loop only.
+    """
+
+    def __init__(self, predict, max_batch_size=MICRO_BATCH_MAX_SIZE, max_wait=MICRO_BATCH_MAX_WAIT):
+        self._predict = predict
+        self.max_batch_size = max(int(max_batch_size), 1)
+        self.max_wait = max(float(max_wait), 0.0)
+        self._queues = {}
+        self._timers = {}
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+
+    async def submit(self, key, features):
+        """Queue one feature row under key and wait for its result"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        queue = self._queues.setdefault(key, [])
+        queue.append((features, future))
+        if len(queue) >= self.max_batch_size:
+            self._flush(key)
+        elif len(queue) == 1:
+            self._timers[key] = loop.call_later(self.max_wait, self._flush, key)
+        return await future
+
+    def _flush(self, key):
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        queue = self._queues.pop(key, None)
+        if not queue:
+            return
+        try:
+            results = self._predict(key, np.array([features for features, _ in queue], dtype=np.float64))
+        except Exception as e:
+            for _, future in queue:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(queue, results):
+            if not future.done():
+                future.set_result(result)
+        self.batches += 1
+        self.items += len(queue)
+        self.largest_batch = max(self.largest_batch, len(queue))
+
+    def stats(self):
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000,
+            'batches': self.batches,
+            'items': self.items,
+            'mean_batch_size': self.items / self.batches if self.batches else 0.0,
+            'largest_batch': self.largest_batch
+        }
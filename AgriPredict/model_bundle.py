@@ -0,0 +1,210 @@
+"""
+Single-file model bundle for the AgriPredict service.
+
+All 17 models are stored in one versioned file: a JSON manifest (crop, model
+kind, feature order and a hash of the training data for every model)
+followed by the numeric parameters as raw, 64-byte aligned NumPy arrays.
+Loading is one read-only memory map; arrays are views into it, so worker
+processes that open the same bundle share its pages instead of each holding
+copies, and no pickle (or sklearn) is involved.
+
+Layout:
+
+    b'AGRIPRED' | format version (u32) | manifest length (u64) | manifest JSON
+    | padding | array data (offsets in the manifest are relative to here)
+
+Build the bundle from the trained pickles with:
+
+    python model_bundle.py
+"""
+import hashlib
+import json
+import os
+import struct
+import tempfile
+import time
+
+import numpy as np
+
+from linear_models import LinearModelTable, MODEL_KINDS, compile_pickles
+from tree_models import FlatTree, TREE_MODELS, flatten_pickles
+
+BUNDLE_FILE = "models.bundle"
+BUNDLE_MAGIC = b'AGRIPRED'
+BUNDLE_FORMAT_VERSION = 1
+HEADER = struct.Struct('<IQ')
+ALIGNMENT = 64
+
+# Dataset each model kind is trained on
+TRAINING_DATA = {
+    'production': 'harvest production dataset.csv',
+    'price': 'harvest production dataset.csv',
+    'district': 'district_data.csv',
+    'recommendation': 'Crop Recommendation dataset.csv',
+    'fertilizer': 'Fertilizer Prediction.csv'
+}
+
+TREE_ARRAYS = ('children_left', 'children_right', 'feature', 'threshold', 'node_class')
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def file_sha256(path):
+    """SHA-256 of a file, or None when it does not exist"""
+    if not os.path.exists(path):
+        return None
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ModelBundle:
+    """Models read from a bundle file - arrays are views into one memory map"""
+
+    def __init__(self, manifest, linear, trees, path=None):
+        self.manifest = manifest
+        self.linear = linear
+        self.trees = trees
+        self.path = path
+
+    @property
+    def version(self):
+        return self.manifest['bundle_version']
+
+    @property
+    def model_count(self):
+        return int(self.linear.available.sum()) + len(self.trees)
+
+
+def write_bundle(linear, trees, path=BUNDLE_FILE, data_dir="."):
+    """Write a LinearModelTable and {name: FlatTree} to a bundle file atomically"""
+    arrays = {
+        'linear/coef': linear.coef,
+        'linear/intercept': linear.intercept,
+        'linear/available': linear.available,
+        'linear/n_features': linear.n_features
+    }
+    for name, tree in trees.items():
+        for field in TREE_ARRAYS:
+            arrays[f'{name}/{field}'] = getattr(tree, field)
+
+    data_hashes = {kind: file_sha256(os.path.join(data_dir, filename))
+                   for kind, filename in TRAINING_DATA.items()}
+    models = []
+    for crop in linear.crops:
+        for kind, suffix in MODEL_KINDS.items():
+            if linear.model(crop, kind) is None:
+                continue
+            models.append({
+                'name': f'{crop}_{suffix}', 'crop': crop, 'kind': kind, 'type': 'linear',
+                'features': list(linear.feature_names.get((crop, kind), ())),
+                'training_data': {'file': TRAINING_DATA[kind], 'sha256': data_hashes[kind]}
+            })
+    for name, tree in trees.items():
+        models.append({
+            'name': os.path.splitext(TREE_MODELS.get(name, name))[0], 'kind': name, 'type': 'tree',
+            'features': list(tree.feature_names), 'classes': tree.classes.astype(str).tolist(),
+            'training_data': {'file': TRAINING_DATA.get(name), 'sha256': data_hashes.get(name)}
+        })
+
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        arrays[name] = array
+        layout[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        offset = _align(offset + array.nbytes)
+
+    content = hashlib.sha256(json.dumps(models, sort_keys=True).encode())
+    for array in arrays.values():
+        content.update(array.tobytes())
+    manifest = {
+        'format_version': BUNDLE_FORMAT_VERSION,
+        'bundle_version': content.hexdigest()[:16],
+        'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'linear': {'crops': linear.crops, 'kinds': list(MODEL_KINDS)},
+        'trees': list(trees),
+        'models': models,
+        'arrays': layout
+    }
+    manifest_bytes = json.dumps(manifest, indent=1).encode('utf-8')
+    data_start = _align(len(BUNDLE_MAGIC) + HEADER.size + len(manifest_bytes))
+
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(BUNDLE_MAGIC)
+            f.write(HEADER.pack(BUNDLE_FORMAT_VERSION, len(manifest_bytes)))
+            f.write(manifest_bytes)
+            for name, array in arrays.items():
+                f.seek(data_start + layout[name]['offset'])
+                f.write(array.tobytes())
+            f.truncate(max(f.tell(), data_start))
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return manifest
+
+
+def read_bundle(path=BUNDLE_FILE):
+    """Memory-map a bundle file and rebuild its models as views into the map"""
+    buffer = np.memmap(path, dtype=np.uint8, mode='r')
+    if bytes(buffer[:len(BUNDLE_MAGIC)]) != BUNDLE_MAGIC:
+        raise ValueError(f"{path} is not a model bundle")
+    header_end = len(BUNDLE_MAGIC) + HEADER.size
+    format_version, manifest_length = HEADER.unpack(bytes(buffer[len(BUNDLE_MAGIC):header_end]))
+    if format_version != BUNDLE_FORMAT_VERSION:
+        raise ValueError(f"{path} has bundle format {format_version}, expected {BUNDLE_FORMAT_VERSION}")
+    manifest = json.loads(bytes(buffer[header_end:header_end + manifest_length]))
+    if manifest['linear']['kinds'] != list(MODEL_KINDS):
+        raise ValueError(f"{path} was written for model kinds {manifest['linear']['kinds']}")
+    data_start = _align(header_end + manifest_length)
+
+    arrays = {}
+    for name, spec in manifest['arrays'].items():
+        dtype = np.dtype(spec['dtype'])
+        start = data_start + spec['offset']
+        count = int(np.prod(spec['shape'], dtype=np.int64))
+        arrays[name] = buffer[start:start + count * dtype.itemsize].view(dtype).reshape(spec['shape'])
+
+    feature_names = {}
+    tree_info = {}
+    for model in manifest['models']:
+        if model['type'] == 'linear':
+            feature_names[(model['crop'], model['kind'])] = tuple(model['features'])
+        else:
+            tree_info[model['kind']] = model
+
+    linear = LinearModelTable(manifest['linear']['crops'],
+                              arrays['linear/coef'],
+                              arrays['linear/intercept'],
+                              arrays['linear/available'],
+                              arrays['linear/n_features'],
+                              feature_names)
+    trees = {
+        name: FlatTree(*(arrays[f'{name}/{field}'] for field in TREE_ARRAYS),
+                       tree_info[name]['classes'], tree_info[name]['features'])
+        for name in manifest['trees']
+    }
+    return ModelBundle(manifest, linear, trees, path)
+
+
+def build_bundle(crops, path=BUNDLE_FILE, data_dir=".", directory=None):
+    """Compile the trained pickles in directory (default data_dir) into one bundle file"""
+    directory = data_dir if directory is None else directory
+    return write_bundle(compile_pickles(crops, directory), flatten_pickles(directory), path, data_dir)
+
+
+if __name__ == '__main__':
+    import glob
+
+    crops = sorted(os.path.basename(p)[:-len("_pro_model.pkl")] for p in glob.glob("*_pro_model.pkl"))
+    manifest = build_bundle(crops)
+    print(f"OK - Bundled {len(manifest['models'])} models into {BUNDLE_FILE} "
+          f"(version {manifest['bundle_version']})")
@@ -0,0 +1,154 @@
+"""
+Memory-budgeted cache of models unpickled from individual artifacts.
+
+A handful of crops fits in memory many times over, but statewide coverage
+with per-district variants means thousands of artifacts, most of them
+rarely used. Models are loaded on first use and kept least-recently-used
+within a byte budget, sized by the NumPy arrays (and Python objects) they
+hold. Keys name an artifact and its mtime, so a replaced file is a new entry
+and the old one simply ages out.
+
+Loading is single-flight: when several threads miss on the same key at once,
+one loads it from disk and the others wait for that result. A load that
+raises is not cached; each waiter sees the exception and the next lookup
+tries again.
+
+Models from models.bundle never pass through here - they are views into one
+shared memory map and cost no private memory.
+"""
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+MODEL_CACHE_BYTES = int(os.environ.get('AGRIPREDICT_MODEL_CACHE_BYTES', 256 * 1024 * 1024))
+
+
+def model_nbytes(model):
+    """Approximate memory held by a model: its arrays' buffers plus the objects around them"""
+    size = sys.getsizeof(model)
+    names = getattr(type(model), '__slots__', ()) or getattr(model, '__dict__', {})
+    for name in names:
+        value = getattr(model, name, None)
+        if isinstance(value, np.ndarray):
+            size += sys.getsizeof(value) + (value.nbytes if value.base is not None else 0)
+        elif isinstance(value, (tuple, list)):
+            size += sys.getsizeof(value) + sum(sys.getsizeof(item) for item in value)
+        elif value is not None:
+            size += sys.getsizeof(value)
+    return size
+
+
+class _Load:
+    """A load in progress that other threads missing on the same key wait for"""
+
+    __slots__ = ('done', 'model', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.model = None
+        self.error = None
+
+
+class ModelCache:
+    """Thread-safe LRU of loaded models with a total byte budget and single-flight loads"""
+
+    def __init__(self, max_bytes=MODEL_CACHE_BYTES, sizeof=model_nbytes):
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._entries = OrderedDict()  # key -> (model, bytes)
+        self._loading = {}             # key -> _Load
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.load_seconds = 0.0
+
+    def get(self, key, load):
+        """Return the model for key, calling load() on a miss - once, however many threads miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            pending = self._loading.get(key)
+            if pending is None:
+                pending = self._loading[key] = _Load()
+                leader = True
+            else:
+                self.coalesced += 1
+                leader = False
+
+        if not leader:
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.model
+
+        start = time.perf_counter()
+        try:
+            pending.model = load()
+            size = self._sizeof(pending.model)
+        except BaseException as e:
+            pending.error = e
+            with self._lock:
+                del self._loading[key]
+            pending.done.set()
+            raise
+        with self._lock:
+            del self._loading[key]
+            self.loads += 1
+            self.load_seconds += time.perf_counter() - start
+            self._store(key, pending.model, size)
+        pending.done.set()
+        return pending.model
+
+    def _store(self, key, model, size):
+        # A model larger than the whole budget is still returned, just not kept
+        if size > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= previous[1]
+        self._entries[key] = (model, size)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._bytes -= evicted
+            self.evictions += 1
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def footprint(self):
+        """(key, bytes) of every cached model, most recently used first"""
+        with self._lock:
+            return [(key, size) for key, (_, size) in reversed(self._entries.items())]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'loads': self.loads,
+                'coalesced': self.coalesced,
+                'evictions': self.evictions,
+                'load_seconds': self.load_seconds
+            }
@@ -0,0 +1,370 @@
+"""
+Versioned, lock-free access to the loaded models.
+
+Every model the service serves - the linear models with the LinearModelTable
+and DemandTable compiled from them, and the two decision trees - lives in one
+ModelSnapshot that is never changed after it is published. A reload builds
+and validates a complete new snapshot off to the side and publishes it with a
+single attribute assignment, so readers take no lock and a request that
+started on the old snapshot finishes on it. A model whose artifact does not
+exist is simply absent from the snapshot: looking it up is a dictionary miss,
+not a stat() per request, until a reload finds the artifact.
+
+Every individual pickle is loaded through a ModelCache keyed on
+(file, mtime), with a memory budget, LRU eviction and single-flight loads;
+a reload only unpickles the files that changed or were evicted. Snapshots
+do not hold the unpickled linear models: their coefficients are copied
+into the snapshot's LinearModelTable - a few floats per artifact - and
+snapshot.linear hands out views of it. A snapshot holds only a weak
+reference to each tree, so a tree evicted from the cache is freed once no
+request uses it and is loaded again - once - on its next use, after
+checking that its file is still the one that was validated.
+
+Reloads run from reload() (POST /admin/models/reload) or from watch(), a
+background thread that polls the artifacts' mtimes.
+"""
+import os
+import pickle
+import threading
+import time
+import weakref
+from collections.abc import Mapping
+from types import MappingProxyType
+
+import numpy as np
+
+from linear_models import CompiledLinearModel, DemandTable, LinearModelTable, MODEL_KINDS
+from model_bundle import BUNDLE_FILE, build_bundle, read_bundle
+from model_cache import ModelCache
+from tree_models import FlatTree, TREE_BATCH_FIELDS, TREE_MODELS
+
+# Features each linear model kind is trained on
+LINEAR_FEATURES = {
+    'production': 3,  # district, year, area
+    'price': 3,       # year, area, production
+    'district': 1     # year
+}
+
+
+def load_linear_model(filename):
+    """Unpickle a LinearRegression and compile it down to its coefficients"""
+    with open(filename, "rb") as f:
+        return CompiledLinearModel.from_sklearn(pickle.load(f))
+
+
+def load_tree_model(filename):
+    """Unpickle a DecisionTreeClassifier and flatten it into node arrays"""
+    with open(filename, "rb") as f:
+        return FlatTree.from_sklearn(pickle.load(f))
+
+
+class StaleArtifactError(RuntimeError):
+    """An artifact changed on disk after the snapshot that refers to it was validated"""
+
+
+class TableModels(Mapping):
+    """crop -> model of one kind, as views into a LinearModelTable made on lookup"""
+
+    __slots__ = ('_table', '_kind', '_crops')
+
+    def __init__(self, table, kind):
+        self._table = table
+        self._kind = kind
+        k = table.kind_index[kind]
+        self._crops = frozenset(crop for c, crop in enumerate(table.crops) if table.available[c, k])
+
+    def __getitem__(self, crop):
+        if crop not in self._crops:
+            raise KeyError(crop)
+        return self._table.model(crop, self._kind)
+
+    def __contains__(self, crop):
+        return crop in self._crops
+
+    def __iter__(self):
+        return iter(sorted(self._crops))
+
+    def __len__(self):
+        return len(self._crops)
+
+
+class ModelSnapshot:
+    """Every model of one load and the tables compiled from them - read-only once published.
+
+    crops maps crop id to crop name; rows(crop_ids) gives their linear_table rows.
+    linear ({kind: {crop: model}}) is compiled into linear_table and not kept;
+    snapshot.linear reads the models back out of the table. trees holds each tree itself (from the bundle) or its pickle's (file, mtime)
+    key, which tree() resolves through fetch(key, loader) and then remembers
+    by weak reference, so later calls take no lock until the tree is freed.
+    """
+
+    __slots__ = ('generation', 'version', 'signature', 'loaded_at', 'linear', 'linear_table',
+                 'demand_table', 'missing', '_trees', '_fetch', '_rows', '_fetched')
+
+    def __init__(self, generation, crops, linear, trees, demand_years, version=None, signature=(),
+                 missing=(), fetch=None):
+        self.generation = generation
+        self.version = version
+        self.signature = signature
+        self.loaded_at = time.time()
+        self._trees = MappingProxyType({name: trees.get(name) for name in TREE_MODELS})
+        self._fetch = fetch
+        self._fetched = {}  # name -> weakref to the tree last fetched for its key
+        self.linear_table = LinearModelTable.from_models(list(crops.values()), linear)
+        self.linear = MappingProxyType({kind: TableModels(self.linear_table, kind) for kind in MODEL_KINDS})
+        self.demand_table = DemandTable(self.linear_table, *demand_years)
+        self.missing = tuple(missing)
+        rows = np.full(max(crops, default=0) + 1, -1, dtype=np.int64)
+        for crop_id, crop in crops.items():
+            rows[crop_id] = self.linear_table.crop_index[crop]
+        rows.flags.writeable = False
+        self._rows = rows
+
+    def rows(self, crop_ids):
+        """linear_table row per crop id, -1 for unknown crops"""
+        crop_ids = np.asarray(crop_ids, dtype=np.int64)
+        in_range = (crop_ids >= 0) & (crop_ids < len(self._rows))
+        return np.where(in_range, self._rows[np.where(in_range, crop_ids, 0)], -1)
+
+    def tree(self, name):
+        """The named tree, None when it has no artifact or fails to load"""
+        tree = self._trees.get(name)
+        if not isinstance(tree, tuple):
+            return tree
+        ref = self._fetched.get(name)
+        model = ref() if ref is not None else None
+        if model is not None:
+            return model
+        try:
+            model = self._fetch(tree, load_tree_model)
+        except StaleArtifactError:
+            raise
+        except Exception as e:
+            print(f"Error loading {tree[0]}: {e}")
+            return None
+        self._fetched[name] = weakref.ref(model)
+        return model
+
+    def counts(self):
+        """Models available per kind"""
+        counts = {kind: len(models) for kind, models in self.linear.items()}
+        counts.update((name, int(tree is not None)) for name, tree in self._trees.items())
+        return counts
+
+    def table_bytes(self):
+        """Memory held by the compiled linear and demand tables"""
+        table = self.linear_table
+        return table.coef.nbytes + table.intercept.nbytes + table.available.nbytes + self.demand_table.values.nbytes
+
+
+def validate(snapshot):
+    """Reasons a snapshot must not be served: wrong feature counts or non-finite parameters"""
+    problems = []
+    for kind, models in snapshot.linear.items():
+        for crop, model in models.items():
+            if model.n_features_in_ != LINEAR_FEATURES[kind]:
+                problems.append(f"{crop} {kind} model takes {model.n_features_in_} features, "
+                                f"expected {LINEAR_FEATURES[kind]}")
+            elif not (np.isfinite(model.coef).all() and np.isfinite(model.intercept)):
+                problems.append(f"{crop} {kind} model has non-finite coefficients")
+    for name in TREE_MODELS:
+        tree = snapshot.tree(name)
+        if tree is None:
+            continue
+        if tree.feature.max(initial=-1) >= len(TREE_BATCH_FIELDS[name]) or not len(tree.classes):
+            problems.append(f"{name} tree does not match its {len(TREE_BATCH_FIELDS[name])} input features")
+    return problems
+
+
+class ModelRegistry:
+    """Holds the current ModelSnapshot and replaces it when the artifacts change.
+
+    snapshot is read without locking; reloads are serialized among themselves.
+    on_publish(snapshot) is called after each new snapshot is published.
+    Pickled models are shared across snapshots through cache.
+    """
+
+    def __init__(self, crops, demand_years, directory=".", on_publish=None, cache=None):
+        self.crops = dict(crops)
+        self.demand_years = demand_years
+        self.directory = directory
+        self.on_publish = on_publish
+        self.cache = cache if cache is not None else ModelCache()
+        self.snapshot = ModelSnapshot(0, self.crops, {}, {}, demand_years)
+        self._reload_lock = threading.Lock()
+        self._rejected = None
+        self.reloads = 0
+        self.failed_reloads = 0
+        self.last_problems = []
+
+    def path(self, filename):
+        return os.path.join(self.directory, filename)
+
+    def artifacts(self):
+        """Every individual pickle the registry can load"""
+        return [f"{crop}_{suffix}.pkl"
+                for crop in self.crops.values() for suffix in MODEL_KINDS.values()] + list(TREE_MODELS.values())
+
+    def bundle_is_current(self):
+        """True when the model bundle exists and is newer than every pickle"""
+        bundle = self.path(BUNDLE_FILE)
+        if not os.path.exists(bundle):
+            return False
+        bundled = os.path.getmtime(bundle)
+        return all(os.path.getmtime(path) <= bundled
+                   for path in map(self.path, self.artifacts()) if os.path.exists(path))
+
+    def refresh_bundle(self):
+        """Build the bundle from the pickles when it is missing or older than one of them.
+
+        Returns None when the bundle is current or was rebuilt, else why it was not.
+        """
+        if self.bundle_is_current() or not any(os.path.exists(self.path(f)) for f in self.artifacts()):
+            return None
+        if not os.access(self.directory, os.W_OK):
+            return f"{os.path.abspath(self.directory)} is not writable"
+        try:
+            build_bundle(list(self.crops.values()), self.path(BUNDLE_FILE), data_dir=self.directory)
+        except Exception as e:
+            return str(e)
+        return None
+
+    def signature(self):
+        """(path, mtime) of the bundle and every pickle - changes whenever one is added or replaced"""
+        return tuple((path, os.stat(self.path(path)).st_mtime_ns)
+                     for path in [BUNDLE_FILE, *self.artifacts()] if os.path.exists(self.path(path)))
+
+    def fetch(self, key, loader):
+        """The model in the artifact key = (file, mtime), from the cache or loaded once by loader(path).
+
+        Raises StaleArtifactError when the file's mtime no longer matches the key.
+        """
+        filename, mtime = key
+        path = self.path(filename)
+
+        def load():
+            if os.stat(path).st_mtime_ns != mtime:
+                raise StaleArtifactError(f"{filename} changed after it was validated; reload the models")
+            model = loader(path)
+            if os.stat(path).st_mtime_ns != mtime:
+                raise StaleArtifactError(f"{filename} changed while it was loading; reload the models")
+            return model
+        return self.cache.get(key, load)
+
+    def load(self):
+        """Load the current artifacts into a new, unpublished snapshot.
+
+        Returns (snapshot, problems); problems lists artifacts that exist but
+        failed to load, and anything validate() rejects.
+        """
+        signature = self.signature()
+        mtimes = dict(signature)
+        linear = {kind: {} for kind in MODEL_KINDS}
+        trees = {}
+        version = None
+        problems = []
+        if self.bundle_is_current():
+            try:
+                bundle = read_bundle(self.path(BUNDLE_FILE))
+                for crop in self.crops.values():
+                    for kind in MODEL_KINDS:
+                        model = bundle.linear.model(crop, kind)
+                        if model is not None:
+                            linear[kind][crop] = model
+                trees.update((name, tree) for name, tree in bundle.trees.items() if name in TREE_MODELS)
+                version = bundle.version
+            except Exception as e:
+                problems.append(f"Failed to load {BUNDLE_FILE}: {e}")
+
+        # Anything the bundle did not provide comes from the individual pickles
+        missing = []
+        for crop in self.crops.values():
+            for kind, suffix in MODEL_KINDS.items():
+                filename = f"{crop}_{suffix}.pkl"
+                if crop in linear[kind]:
+                    continue
+                if filename not in mtimes:
+                    missing.append(filename)
+                    continue
+                try:
+                    linear[kind][crop] = self.fetch((filename, mtimes[filename]), load_linear_model)
+                except Exception as e:
+                    problems.append(f"Failed to load {filename}: {e}")
+        for name, filename in TREE_MODELS.items():
+            if name in trees:
+                continue
+            if filename not in mtimes:
+                missing.append(filename)
+                continue
+            # Loaded now to validate it; the snapshot keeps only the key
+            key = (filename, mtimes[filename])
+            try:
+                self.fetch(key, load_tree_model)
+                trees[name] = key
+            except Exception as e:
+                problems.append(f"Failed to load {filename}: {e}")
+
+        snapshot = ModelSnapshot(self.snapshot.generation + 1, self.crops, linear, trees, self.demand_years,
+                                 version, signature, missing, self.fetch)
+        return snapshot, problems + validate(snapshot)
+
+    def reload(self):
+        """Load and validate the current artifacts, then publish them in one assignment.
+
+        A load with problems is rejected and the current snapshot stays -
+        except on the first load, which publishes whatever did load.
+        Returns (published, problems).
+        """
+        with self._reload_lock:
+            snapshot, problems = self.load()
+            self.last_problems = problems
+            if problems and self.snapshot.generation > 0:
+                self.failed_reloads += 1
+                self._rejected = snapshot.signature
+                return False, problems
+            self.snapshot = snapshot
+            self.reloads += 1
+            self._rejected = None
+        if self.on_publish is not None:
+            self.on_publish(snapshot)
+        return True, problems
+
+    def changed(self):
+        """True when the artifacts differ from both the served and the last rejected snapshot"""
+        signature = self.signature()
+        return signature != self.snapshot.signature and signature != self._rejected
+
+    def watch(self, interval):
+        """Reload in a daemon thread whenever the artifacts change, checking every interval seconds"""
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    if self.changed():
+                        published, problems = self.reload()
+                        for problem in problems:
+                            print(f"  [WARNING] {problem}")
+                        print(f"OK - Models reloaded (generation {self.snapshot.generation})" if published
+                              else "WARNING - Model reload rejected, still serving the previous models")
+                except Exception as e:
+                    print(f"WARNING - Model watcher: {e}")
+        thread = threading.Thread(target=run, name='model-watcher', daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self):
+        snapshot = self.snapshot
+        return {
+            'generation': snapshot.generation,
+            'bundle_version': snapshot.version,
+            'loaded_at': snapshot.loaded_at,
+            'models': snapshot.counts(),
+            'missing': list(snapshot.missing),
+            'reloads': self.reloads,
+            'failed_reloads': self.failed_reloads,
+            'last_problems': list(self.last_problems),
+            'table_bytes': snapshot.table_bytes(),
+            'cache': self.cache.stats(),
+            'cached_models': [{'artifact': filename, 'mtime_ns': mtime, 'bytes': size}
+                              for (filename, mtime), size in self.cache.footprint()]
+        }
@@ -0,0 +1,89 @@
+"""
+Crops, districts, model loading and the fused estimate - without Flask.
+
+flask_complete.py, bulk_score.py and any other scorer take the crop ids,
+the way models are loaded (models.bundle when current, else the pickles,
+through a ModelRegistry) and the production -> price -> revenue chain from
+here, so they cannot drift apart.
+"""
+import os
+
+import numpy as np
+
+from model_registry import ModelRegistry
+
+# Define all available crops
+CROP_CONFIGS = {
+    1: {'name': 'paddy', 'display': 'Paddy (Rice)'},
+    2: {'name': 'sorghum', 'display': 'Sorghum'},
+    3: {'name': 'arhar', 'display': 'Arhar (Pigeon Pea)'},
+    4: {'name': 'groundnut', 'display': 'Groundnut'},
+    5: {'name': 'sesamum', 'display': 'Sesamum'}
+}
+
+# Crop id -> artifact name, the mapping the registry loads models under
+CROP_NAMES = {crop_id: config['name'] for crop_id, config in CROP_CONFIGS.items()}
+
+# Districts mapping
+DISTRICTS = {
+    63: 'Adilabad',
+    62: 'Karimnagar',
+    55: 'Hyderabad',
+    61: 'Khammam',
+    58: 'Mahabubnagar',
+    57: 'Medak',
+    59: 'Nalgonda',
+    56: 'Nizamabad',
+    60: 'Warangal'
+}
+
+# Years the district models are evaluated for when models load, e.g. "1966-2050"
+DEMAND_YEARS = tuple(int(year) for year in os.environ.get('AGRIPREDICT_DEMAND_YEARS', '1966-2050').split('-'))
+
+# Year every estimate is made for
+ESTIMATE_YEAR = 2022
+
+
+def create_registry(directory=".", **kwargs):
+    """A ModelRegistry for every crop in CROP_CONFIGS, not loaded yet"""
+    return ModelRegistry(CROP_NAMES, DEMAND_YEARS, directory, **kwargs)
+
+
+def load_models(directory="."):
+    """Load the models in directory once; returns (snapshot, problems)"""
+    registry = create_registry(directory)
+    _, problems = registry.reload()
+    return registry.snapshot, problems
+
+
+def area_hectares(areas):
+    """Acres to whole hectares, truncated like int(area / 2.47) in the views"""
+    return (np.asarray(areas) / 2.47).astype(np.int64)
+
+
+def estimate(models, crop_ids, dists, areas):
+    """Chain production -> price -> revenue and demand for whole arrays of farms.
+
+    Mirrors the estimation() view: price is predicted from the truncated
+    production, missing price/district models count as 0, and rows without
+    a production model (or with an unknown crop id) come back as NaN.
+    """
+    rows = models.rows(crop_ids)
+    hectares = area_hectares(areas)
+    year = np.full(len(rows), ESTIMATE_YEAR)
+
+    raw_production = models.linear_table.predict(rows, 'production', np.column_stack([dists, year, hectares]))
+    production = np.trunc(raw_production)
+    price = np.trunc(np.nan_to_num(models.linear_table.predict(
+        rows, 'price', np.column_stack([year, hectares, np.nan_to_num(production)]))))
+    demand = np.nan_to_num(models.demand_table.lookup(rows, year))
+
+    return {
+        'area_hectares': hectares,
+        'production': production,
+        'price': price,
+        'revenue': production * price,
+        'demand': demand,
+        'gap': np.abs(np.trunc(demand - raw_production)),
+        'exceeds_demand': raw_production > demand
+    }
@@ -0,0 +1,77 @@
+"""
+Bounded memo of single-row model predictions.
+
+Production, price and demand requests repeat a small input space - five
+crops, nine districts and whole hectares - so the service remembers each
+prediction under its normalized feature vector and the model snapshot it
+came from. Entries expire after a TTL and the least recently used ones are
+evicted past a fixed entry count.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+PREDICTION_CACHE_ENTRIES = int(os.environ.get('AGRIPREDICT_PREDICTION_CACHE_ENTRIES', 4096))
+PREDICTION_CACHE_TTL = float(os.environ.get('AGRIPREDICT_PREDICTION_CACHE_TTL', 3600))
+
+
+class PredictionCache:
+    """Thread-safe LRU cache with per-entry expiry"""
+
+    def __init__(self, max_entries=PREDICTION_CACHE_ENTRIES, ttl=PREDICTION_CACHE_TTL, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return the cached value for key, or None when missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires = entry
+            if expires <= self._clock():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Cache a value, evicting the least recently used entries over the limit"""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, self._clock() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'expirations': self.expirations,
+                'evictions': self.evictions
+            }
@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+"""
+Sampling profiler for live requests.
+
+A profiled request registers its thread with the SamplingProfiler. While any
+request is registered, a background thread reads the threads' current frames
+every interval and counts each stack; with none registered it sleeps, so
+requests that are not profiled pay one random() call. Stacks are aggregated
+per endpoint in the collapsed format ("frame;frame;frame count") that
+flamegraph.pl and speedscope read, and written to
+{AGRIPREDICT_PROFILE_DIR}/{endpoint}.collapsed, with the most recent
+profiled request next to it in {endpoint}.latest.collapsed.
+
+Requests are profiled at AGRIPREDICT_PROFILE_RATE (a fraction, 0 = off) or
+when they carry a token signed with AGRIPREDICT_PROFILE_SECRET:
+
+    python profiling.py token --ttl 600      # print a token valid for 10 minutes
+    curl -H "X-AgriPredict-Profile: <token>" ...
+
+The same tokens, signed with AGRIPREDICT_ADMIN_SECRET and sent as
+X-AgriPredict-Admin, authorize the model admin endpoints:
+
+    python profiling.py token --admin
+"""
+import argparse
+import hashlib
+import hmac
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+PROFILE_RATE = float(os.environ.get('AGRIPREDICT_PROFILE_RATE', 0))
+PROFILE_INTERVAL = float(os.environ.get('AGRIPREDICT_PROFILE_INTERVAL_MS', 5)) / 1000
+PROFILE_DIR = os.environ.get('AGRIPREDICT_PROFILE_DIR', 'profiles')
+PROFILE_SECRET = os.environ.get('AGRIPREDICT_PROFILE_SECRET', '')
+PROFILE_HEADER = 'X-AgriPredict-Profile'
+ADMIN_SECRET = os.environ.get('AGRIPREDICT_ADMIN_SECRET', '')
+ADMIN_HEADER = 'X-AgriPredict-Admin'
+
+# Deepest stack recorded; deeper frames (towards the thread's entry point) are dropped
+MAX_STACK_DEPTH = 128
+# Seconds between writes of the collapsed-stack files
+FLUSH_INTERVAL = 1.0
+
+
+def sign_token(secret, expires):
+    """Token '<expires>.<hex HMAC-SHA256 of expires>' accepted until the unix time expires"""
+    expires = int(expires)
+    signature = hmac.new(secret.encode(), str(expires).encode(), hashlib.sha256).hexdigest()
+    return f"{expires}.{signature}"
+
+
+def verify_token(secret, token, now=None):
+    if not secret or not token or '.' not in token:
+        return False
+    expires, _ = token.split('.', 1)
+    if not expires.isdigit() or int(expires) < (time.time() if now is None else now):
+        return False
+    return hmac.compare_digest(sign_token(secret, expires), token)
+
+
+def frame_name(frame):
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+def collapse(frame):
+    """Collapsed-stack line for a frame, outermost call first"""
+    names = []
+    while frame is not None and len(names) < MAX_STACK_DEPTH:
+        names.append(frame_name(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+def _write(path, stacks):
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        for stack, count in stacks.most_common():
+            f.write(f"{stack} {count}\n")
+    os.replace(tmp_path, path)
+
+
+class SamplingProfiler:
+    """Samples the stacks of registered request threads, aggregated per endpoint"""
+
+    def __init__(self, rate=PROFILE_RATE, interval=PROFILE_INTERVAL, directory=PROFILE_DIR,
+                 secret=PROFILE_SECRET):
+        self.rate = rate
+        self.interval = interval
+        self.directory = directory
+        self.secret = secret
+        self._lock = threading.Lock()
+        self._active = {}  # thread id -> (endpoint, Counter of this request's stacks)
+        self._wake = threading.Event()
+        self._pid = None
+        self._stacks = {}  # endpoint -> Counter over every profiled request
+        self._latest = {}  # endpoint -> Counter of the last profiled request
+        self._requests = Counter()
+        self._samples = Counter()
+        self._last_profiled = {}
+        self._dirty = set()
+        self._last_flush = 0.0
+
+    def should_profile(self, token=None):
+        """Whether to profile a request: a valid signed token, else a random draw against rate"""
+        if token and verify_token(self.secret, token):
+            return True
+        return self.rate > 0 and random.random() < self.rate
+
+    def _ensure_sampler(self):
+        # The sampler thread does not survive a fork; start one per process
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._wake = threading.Event()
+            threading.Thread(target=self._run, name='profiler', daemon=True).start()
+
+    def begin(self, endpoint):
+        """Start sampling the calling thread under endpoint"""
+        with self._lock:
+            self._ensure_sampler()
+            self._active[threading.get_ident()] = (endpoint, Counter())
+            self._wake.set()
+
+    def end(self):
+        """Stop sampling the calling thread and fold its stacks into the endpoint's profile"""
+        with self._lock:
+            session = self._active.pop(threading.get_ident(), None)
+            if session is None:
+                return
+            endpoint, stacks = session
+            self._stacks.setdefault(endpoint, Counter()).update(stacks)
+            self._latest[endpoint] = stacks
+            self._requests[endpoint] += 1
+            self._samples[endpoint] += sum(stacks.values())
+            self._last_profiled[endpoint] = time.time()
+            self._dirty.add(endpoint)
+            if not self._active:
+                self._wake.clear()
+
+    def _run(self):
+        wake = self._wake
+        while True:
+            if not wake.is_set():
+                self.flush()
+                wake.wait()
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, (_, stacks) in self._active.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        stacks[collapse(frame)] += 1
+            del frames
+            if time.monotonic() - self._last_flush >= FLUSH_INTERVAL:
+                self.flush()
+
+    def flush(self):
+        """Write the collapsed-stack files of endpoints profiled since the last flush"""
+        with self._lock:
+            dirty = {endpoint: (Counter(self._stacks[endpoint]), Counter(self._latest[endpoint]))
+                     for endpoint in self._dirty}
+            self._dirty.clear()
+            self._last_flush = time.monotonic()
+        if not dirty or not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        for endpoint, (stacks, latest) in dirty.items():
+            _write(os.path.join(self.directory, f"{endpoint}.collapsed"), stacks)
+            _write(os.path.join(self.directory, f"{endpoint}.latest.collapsed"), latest)
+
+    def collapsed(self, endpoint, latest=False):
+        """Collapsed-stack text of an endpoint's profile, or None if it was never profiled"""
+        with self._lock:
+            stacks = (self._latest if latest else self._stacks).get(endpoint)
+            if stacks is None:
+                return None
+            return ''.join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+    def reset(self):
+        with self._lock:
+            self._stacks.clear()
+            self._latest.clear()
+            self._requests.clear()
+            self._samples.clear()
+            self._last_profiled.clear()
+            self._dirty.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'rate': self.rate,
+                'interval_ms': self.interval * 1000,
+                'active': len(self._active),
+                'endpoints': {
+                    endpoint: {
+                        'requests': self._requests[endpoint],
+                        'samples': self._samples[endpoint],
+                        'last_profiled': self._last_profiled[endpoint]
+                    }
+                    for endpoint in sorted(self._requests)
+                }
+            }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    token = commands.add_parser('token', help=f'print a signed {PROFILE_HEADER} token')
+    token.add_argument('--ttl', type=int, default=600, help='seconds the token stays valid')
+    token.add_argument('--admin', action='store_true', help=f'sign a {ADMIN_HEADER} token instead')
+    args = parser.parse_args()
+
+    secret, variable = ((ADMIN_SECRET, 'AGRIPREDICT_ADMIN_SECRET') if args.admin
+                        else (PROFILE_SECRET, 'AGRIPREDICT_PROFILE_SECRET'))
+    if not secret:
+        parser.error(f'{variable} is not set')
+    print(sign_token(secret, time.time() + args.ttl))
+
+
+if __name__ == '__main__':
+    main()
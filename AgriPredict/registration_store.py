@@ -0,0 +1,158 @@
+"""
+SQLite-backed storage for farmer crop registrations.
+
+Registrations used to be appended to nine {district}_user_crop_entry.csv
+files and re-read in full for every statistics request. They now live in one
+SQLite database in WAL mode, indexed by (crop, district), so concurrent
+registrations are safe and per-crop totals are index lookups.
+
+Running totals per (crop, district) are kept in a crop_totals table that is
+updated in the same transaction as each registration, so statistics reads
+cost the same no matter how many registrations there are.
+
+The legacy CSV files are imported once, the first time the store sees them:
+
+    python registration_store.py
+"""
+import csv
+import os
+import sqlite3
+import threading
+
+REGISTRATIONS_DB = os.environ.get('AGRIPREDICT_REGISTRATIONS_DB', 'registrations.db')
+
+# District code -> legacy registration CSV
+DISTRICT_CSV_FILES = {
+    63: 'adilabad_user_crop_entry.csv',
+    62: 'karimnagar_user_crop_entry.csv',
+    55: 'hyderabad_user_crop_entry.csv',
+    61: 'khammam_user_crop_entry.csv',
+    58: 'mahabubnagar_user_crop_entry.csv',
+    57: 'medak_user_crop_entry.csv',
+    59: 'nalgonda_user_crop_entry.csv',
+    56: 'nizamabad_user_crop_entry.csv',
+    60: 'warangal_user_crop_entry.csv'
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS registrations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_name TEXT,
+    district INTEGER NOT NULL,
+    year INTEGER NOT NULL,
+    crop TEXT NOT NULL,
+    area INTEGER NOT NULL,
+    production INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_registrations_crop_district
+    ON registrations (crop, district, production);
+CREATE TABLE IF NOT EXISTS crop_totals (
+    crop TEXT NOT NULL,
+    district INTEGER NOT NULL,
+    total INTEGER NOT NULL,
+    registrations INTEGER NOT NULL,
+    PRIMARY KEY (crop, district)
+);
+CREATE TABLE IF NOT EXISTS imported_files (
+    filename TEXT PRIMARY KEY,
+    rows INTEGER NOT NULL
+);
+"""
+
+
+class RegistrationStore:
+    """Crop registrations in one SQLite database, one connection per thread"""
+
+    def __init__(self, path=REGISTRATIONS_DB):
+        self.path = path
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connection(self):
+        """Return this thread's connection, opening a new one after a fork"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def add(self, name, district, crop, area, production, year=2022):
+        """Record one registration and bump its (crop, district) running total"""
+        crop = crop.lower()
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT INTO registrations (user_name, district, year, crop, area, production) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (name, int(district), int(year), crop, int(area), int(production)))
+            conn.execute(
+                "INSERT INTO crop_totals (crop, district, total, registrations) VALUES (?, ?, ?, 1) "
+                "ON CONFLICT (crop, district) DO UPDATE SET "
+                "total = total + excluded.total, registrations = registrations + 1",
+                (crop, int(district), int(production)))
+
+    def rebuild_totals(self):
+        """Recompute crop_totals from the raw registrations"""
+        with self._connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM crop_totals")
+            conn.execute(
+                "INSERT INTO crop_totals (crop, district, total, registrations) "
+                "SELECT crop, district, SUM(production), COUNT(*) FROM registrations GROUP BY crop, district")
+
+    def crop_total(self, crop):
+        """Total registered production for one crop across all districts"""
+        row = self._connection().execute(
+            "SELECT COALESCE(SUM(total), 0) FROM crop_totals WHERE crop = ?",
+            (crop.lower(),)).fetchone()
+        return row[0]
+
+    def district_totals(self, crop):
+        """Registered production and registration count per district for one crop"""
+        rows = self._connection().execute(
+            "SELECT district, total, registrations FROM crop_totals WHERE crop = ?", (crop.lower(),))
+        return {district: {'production': total, 'registrations': count} for district, total, count in rows}
+
+    def count(self):
+        return self._connection().execute("SELECT COUNT(*) FROM registrations").fetchone()[0]
+
+    def import_csv_files(self, csv_files=DISTRICT_CSV_FILES, directory="."):
+        """Import legacy per-district CSV files, skipping ones already imported.
+
+        Returns the number of rows imported.
+        """
+        imported = 0
+        conn = self._connection()
+        for district, filename in csv_files.items():
+            path = os.path.join(directory, filename)
+            if not os.path.exists(path):
+                continue
+            with conn:
+                # Take the write lock first so two processes cannot import the same file
+                conn.execute("BEGIN IMMEDIATE")
+                if conn.execute("SELECT 1 FROM imported_files WHERE filename = ?", (filename,)).fetchone():
+                    continue
+                with open(path, newline='') as f:
+                    rows = [
+                        (row['User Name'], district, int(row['Year']), row['Crop'].lower(),
+                         int(row['Area']), int(row['Production']))
+                        for row in csv.DictReader(f)
+                        if row.get('Crop') and row.get('Production')
+                    ]
+                conn.executemany(
+                    "INSERT INTO registrations (user_name, district, year, crop, area, production) "
+                    "VALUES (?, ?, ?, ?, ?, ?)", rows)
+                conn.execute("INSERT INTO imported_files (filename, rows) VALUES (?, ?)", (filename, len(rows)))
+                imported += len(rows)
+        if imported:
+            self.rebuild_totals()
+        return imported
+
+
+if __name__ == '__main__':
+    store = RegistrationStore()
+    imported = store.import_csv_files()
+    print(f"OK - Imported {imported} registrations into {store.path} ({store.count()} total)")
@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+"""
+Production server for the AgriPredict service.
+
+The master process imports the app once - loading the model bundle, the
+registration store and the demand table - binds the listening socket and
+forks the workers. Workers inherit the loaded models copy-on-write (the
+bundle itself is one shared memory map) and each answers requests on a fixed
+pool of threads, so CPU-bound prediction and chart work scales with cores
+instead of sharing one GIL.
+
+When a new model artifact appears (models.bundle or a pickle is replaced),
+or on SIGHUP, the master reloads the models, forks a fresh set of workers
+and stops the old ones once their in-flight requests finish. Crashed
+workers are replaced. SIGTERM or Ctrl+C shuts everything down gracefully.
+
+    python serve.py                          # one worker per core, 4 threads each
+    python serve.py --workers 4 --threads 8 --port 5000
+    kill -HUP <master pid>                   # reload models now
+
+On platforms without fork() (Windows) it serves from a single process on
+the same thread pool, without reloading.
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.serving import BaseWSGIServer
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """Werkzeug server that handles requests on a fixed-size thread pool"""
+
+    def __init__(self, host, port, app, threads=4, **kwargs):
+        self._pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='request')
+        super().__init__(host, port, app, **kwargs)
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def drain(self):
+        """Wait for in-flight requests, then close the socket"""
+        self._pool.shutdown(wait=True)
+        self.server_close()
+
+
+def bind_socket(host, port, backlog=128):
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(app, host, sock, threads):
+    """Serve on an inherited listening socket until SIGTERM"""
+    server = PooledWSGIServer(host, sock.getsockname()[1], app, threads=threads, fd=sock.fileno())
+
+    def stop(signum, frame):
+        # shutdown() waits for serve_forever(), so it cannot run in this thread
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    server.serve_forever()
+    server.drain()
+
+
+# A worker exiting this soon after it was forked failed to boot
+BOOT_TIMEOUT = 2.0
+
+
+class Master:
+    """Forks and supervises workers; reloads them when model artifacts change"""
+
+    def __init__(self, service, host, sock, workers, threads, reload_interval, graceful_timeout):
+        self.service = service
+        self.host = host
+        self.sock = sock
+        self.worker_count = workers
+        self.threads = threads
+        self.reload_interval = reload_interval
+        self.graceful_timeout = graceful_timeout
+        self.workers = {}  # pid -> (generation, start time)
+        self.generation = 0
+        self.signature = service.artifact_signature()
+        self._reload_requested = False
+        self._stopping = False
+
+    def log(self, message):
+        print(f"[master {os.getpid()}] {message}", flush=True)
+
+    def spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                run_worker(self.service.app, self.host, self.sock, self.threads)
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            finally:
+                os._exit(code)
+        self.workers[pid] = (self.generation, time.monotonic())
+
+    def spawn_generation(self):
+        # Objects loaded so far are never collected again; freezing them keeps
+        # the collector from touching (and so copying) their pages in workers
+        gc.collect()
+        gc.freeze()
+        for _ in range(self.worker_count):
+            self.spawn()
+
+    def reload(self):
+        self.log("Reloading models")
+        if not self.service.reload_models():
+            self.log("Model reload failed, keeping the current workers")
+            return
+        self.signature = self.service.artifact_signature()
+        old = [pid for pid, (generation, _) in self.workers.items() if generation == self.generation]
+        self.generation += 1
+        self.spawn_generation()
+        self.signal_workers(signal.SIGTERM, old)
+        version = self.service.model_registry.snapshot.version
+        source = f"bundle {version}" if version else "pickle files"
+        self.log(f"Started {self.worker_count} workers with models from {source}")
+
+    def signal_workers(self, signum, pids=None):
+        for pid in list(self.workers) if pids is None else pids:
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    def reap(self):
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            generation, started = self.workers.pop(pid, (None, 0))
+            if generation != self.generation or self._stopping:
+                continue
+            if time.monotonic() - started < BOOT_TIMEOUT:
+                self.log(f"Worker {pid} failed to boot (status {status}), stopping")
+                self._stopping = True
+            else:
+                self.log(f"Worker {pid} exited with status {status}, replacing it")
+                self.spawn()
+
+    def run(self):
+        signal.signal(signal.SIGHUP, lambda signum, frame: setattr(self, '_reload_requested', True))
+        signal.signal(signal.SIGTERM, lambda signum, frame: setattr(self, '_stopping', True))
+        signal.signal(signal.SIGINT, lambda signum, frame: setattr(self, '_stopping', True))
+
+        self.spawn_generation()
+        self.log(f"Serving on http://{self.host}:{self.sock.getsockname()[1]} "
+                 f"with {self.worker_count} workers x {self.threads} threads")
+        last_check = time.monotonic()
+        while not self._stopping:
+            time.sleep(min(self.reload_interval or 1.0, 1.0))
+            self.reap()
+            if self.reload_interval and time.monotonic() - last_check >= self.reload_interval:
+                last_check = time.monotonic()
+                if self.service.artifact_signature() != self.signature:
+                    self._reload_requested = True
+            if self._reload_requested:
+                self._reload_requested = False
+                self.reload()
+
+        self.log("Shutting down")
+        self.signal_workers(signal.SIGTERM)
+        deadline = time.monotonic() + self.graceful_timeout
+        while self.workers and time.monotonic() < deadline:
+            time.sleep(0.1)
+            self.reap()
+        self.signal_workers(signal.SIGKILL)
+        self.reap()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default=os.environ.get('AGRIPREDICT_HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('AGRIPREDICT_PORT', 5000)))
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('AGRIPREDICT_WORKERS', os.cpu_count() or 1)),
+                        help='worker processes (default: one per core)')
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('AGRIPREDICT_THREADS', 4)),
+                        help='request threads per worker')
+    parser.add_argument('--reload-interval', type=float, default=5.0,
+                        help='seconds between model artifact checks (0 disables)')
+    parser.add_argument('--graceful-timeout', type=float, default=30.0,
+                        help='seconds workers get to finish requests on shutdown or reload')
+    args = parser.parse_args()
+
+    import flask_complete as service
+
+    if not hasattr(os, 'fork'):
+        print(f"Serving on http://{args.host}:{args.port} from one process with {args.threads} threads")
+        server = PooledWSGIServer(args.host, args.port, service.app, threads=args.threads)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        server.drain()
+        return
+
+    sock = bind_socket(args.host, args.port)
+    Master(service, args.host, sock, max(args.workers, 1), max(args.threads, 1),
+           args.reload_interval, args.graceful_timeout).run()
+    sock.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+"""
+Startup benchmark - how long a fresh worker takes to import the service.
+
+Imports the app in clean subprocesses with `python -X importtime` and reports
+the wall time plus the cumulative import time of each module the app pulls
+in directly, and whether the heavy optional dependencies got loaded.
+
+    python startup_benchmark.py                 # flask_complete, 5 runs
+    python startup_benchmark.py --runs 10 --top 15
+    python startup_benchmark.py --json startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Dependencies a prediction-only worker should not need at startup
+HEAVY_MODULES = ('matplotlib', 'pandas', 'sklearn', 'scipy')
+
+
+def parse_importtime(stderr):
+    """Parse -X importtime output into (module, depth, self_us, cumulative_us) rows"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return rows
+
+
+def measure(target):
+    """Import target once in a fresh interpreter; return wall seconds and import rows"""
+    env = dict(os.environ, PYTHONWARNINGS='ignore')
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {target}'],
+                            capture_output=True, text=True, env=env)
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"import {target} failed:\n{result.stderr[-2000:]}")
+    return wall, parse_importtime(result.stderr)
+
+
+def run(target, runs):
+    walls = []
+    modules = {}
+    loaded = set()
+    for _ in range(runs):
+        wall, rows = measure(target)
+        walls.append(wall)
+        # The target is the outermost import; its direct imports sit one level in
+        base_depth = min((depth for name, depth, _, _ in rows if name == target), default=0)
+        for name, depth, _, cumulative_us in rows:
+            if depth == base_depth + 1 or name == target:
+                modules.setdefault(name, []).append(cumulative_us / 1e6)
+            if name.split('.')[0] in HEAVY_MODULES:
+                loaded.add(name.split('.')[0])
+    return {
+        'target': target,
+        'runs': runs,
+        'wall_seconds': {'median': statistics.median(walls), 'min': min(walls), 'max': max(walls)},
+        'modules': {name: statistics.median(times) for name, times in modules.items()},
+        'heavy_modules_loaded': sorted(loaded)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--target', default='flask_complete', help='module to import')
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters to start')
+    parser.add_argument('--top', type=int, default=10, help='modules to list')
+    parser.add_argument('--json', metavar='PATH', help='also write the results as JSON')
+    args = parser.parse_args()
+
+    report = run(args.target, args.runs)
+
+    wall = report['wall_seconds']
+    print("=" * 60)
+    print(f"Startup benchmark: import {report['target']} ({report['runs']} runs)")
+    print("=" * 60)
+    print(f"  Wall time: {wall['median'] * 1000:.0f} ms median "
+          f"({wall['min'] * 1000:.0f} - {wall['max'] * 1000:.0f} ms)")
+    print(f"\n  Slowest direct imports (cumulative, median):")
+    ranked = sorted(report['modules'].items(), key=lambda item: item[1], reverse=True)
+    for name, seconds in ranked[:args.top + 1]:
+        print(f"    {seconds * 1000:8.1f} ms  {name}")
+    heavy = ', '.join(report['heavy_modules_loaded']) or 'none'
+    print(f"\n  Heavy modules loaded at startup: {heavy}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n  Results written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
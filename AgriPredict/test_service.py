@@ -2,12 +2,19 @@
 """
 Simple test to verify Flask service and models
 """
+import os
 import sys
+import tempfile
 import warnings
 
 # Suppress sklearn warnings
 warnings.filterwarnings('ignore')
 
+# Keep test registrations out of the real database
+test_dir = tempfile.mkdtemp(prefix='agripredict-test-')
+os.environ['AGRIPREDICT_REGISTRATIONS_DB'] = os.path.join(test_dir, 'registrations.db')
+os.environ['AGRIPREDICT_DATA_CACHE'] = os.path.join(test_dir, 'data_cache')
+
 print("=" * 60)
 print("AgriPredict Service Test")
 print("=" * 60)
@@ -61,6 +68,920 @@ except Exception as e:
     import traceback
     traceback.print_exc()
 
+# Test 5: Batch prediction must agree with the single-item endpoints
+print("\n5. Testing batch prediction...")
+try:
+    with app.test_client() as client:
+        records = [{'crop': c, 'district': d, 'area': a}
+                   for c in (1, 2, 3, 4, 5) for d in (55, 63) for a in (10, 250)]
+        batch = client.post('/api/predict/batch', json={'kind': 'production', 'records': records}).get_json()
+        for record, result in zip(records, batch['results']):
+            single = client.post('/api/predict/production', json=record).get_json()
+            assert result['production_quintals'] == single['production_quintals'], (record, result, single)
+        # Bad records fail in place without failing the batch
+        mixed = [{'crop': 1, 'district': 63, 'area': 100}, {'crop': 1, 'district': 63},
+                 {'crop': 'x', 'district': 63, 'area': 100}, {'crop': 2, 'district': None, 'area': 10}, 7]
+        results = client.post('/api/predict/batch', json={'kind': 'production', 'records': mixed}).get_json()['results']
+        assert [r.get('message') for r in results] == [None, 'Invalid area', 'Invalid crop', 'Invalid district',
+                                                       'Invalid record'], results
+        single = client.post('/api/predict/production', json=mixed[0]).get_json()
+        assert results[0]['production_quintals'] == single['production_quintals']
+        soil = client.post('/api/predict/batch', json={'kind': 'fertilizer', 'records': [{'temperature': 'hot'}]}).get_json()
+        assert soil['results'] == [{'status': 'error', 'message': 'Invalid temperature'}], soil
+        print(f"   OK - /api/predict/batch: {batch['count']} records match single predictions, bad records fail in place")
+except Exception as e:
+    print(f"   FAIL - Batch prediction: {e}")
+    import traceback
+    traceback.print_exc()
+    sys.exit(1)
+
+# Test 6: Fused estimate must agree with chaining production -> price
+print("\n6. Testing fused estimate pipeline...")
+try:
+    with app.test_client() as client:
+        records = [{'crop': c, 'district': d, 'area': a}
+                   for c in (1, 2, 3, 4, 5) for d in (55, 63) for a in (10, 250)]
+        estimate = client.post('/api/predict/estimate', json={'records': records}).get_json()
+        for record, result in zip(records, estimate['results']):
+            production = client.post('/api/predict/production', json=record).get_json()['production_quintals']
+            price = client.post('/api/predict/price', json=dict(record, production=production)).get_json()
+            assert result['production_quintals'] == production, (record, result)
+            assert result['price_per_quintal'] == price['price_per_quintal'], (record, result, price)
+            assert result['estimated_revenue'] == production * price['price_per_quintal'], (record, result)
+        # Malformed records fail in place without failing the request
+        mixed = [{'crop': 1, 'district': 63, 'area': 100}, {'crop': 1, 'district': 63},
+                 {'crop': 'x', 'district': 63, 'area': 100}, None, {'crop': 9, 'district': 63, 'area': 100}]
+        results = client.post('/api/predict/estimate', json={'records': mixed}).get_json()['results']
+        assert [r.get('message') for r in results] == [None, 'Invalid area', 'Invalid crop', 'Invalid record',
+                                                       'Invalid crop'], results
+        single = client.post('/api/predict/production', json=mixed[0]).get_json()
+        assert results[0]['production_quintals'] == single['production_quintals']
+        columns = client.post('/api/predict/estimate', json={'records': mixed, 'format': 'columns'}).get_json()['columns']
+        assert columns['available'] == [True, False, False, False, False] and columns['error'][1] == 'Invalid area'
+        print(f"   OK - /api/predict/estimate: {estimate['count']} records match chained predictions, "
+              f"bad records fail in place")
+except Exception as e:
+    print(f"   FAIL - Estimate pipeline: {e}")
+    import traceback
+    traceback.print_exc()
+    sys.exit(1)
+
+# Test 7: Compiled coefficient table must match sklearn's predict
+print("\n7. Testing compiled linear models...")
+try:
+    import time
+    from flask_complete import CROP_CONFIGS, model_registry
+    linear_table = model_registry.snapshot.linear_table
+    from linear_models import MODEL_KINDS
+
+    rng = np.random.default_rng(0)
+    checked = 0
+    for config in CROP_CONFIGS.values():
+        for kind, suffix in MODEL_KINDS.items():
+            with open(f"{config['name']}_{suffix}.pkl", "rb") as f:
+                model = pickle.load(f)
+            X = rng.uniform([1, 1960, 0], [70, 2030, 5000], size=(200, 3))[:, -model.n_features_in_:]
+            expected = np.ravel(model.predict(X))
+            rows = np.full(len(X), linear_table.crop_index[config['name']])
+            assert np.allclose(linear_table.predict(rows, kind, X), expected, rtol=1e-9), (config, kind)
+            compiled = linear_table.model(config['name'], kind)
+            assert np.isclose(compiled.predict_one(*X[0]), expected[0], rtol=1e-9), (config, kind)
+            checked += 1
+
+    compiled = linear_table.model('paddy', 'production')
+    start = time.perf_counter()
+    for _ in range(100000):
+        compiled.predict_one(63, 2022, 40)
+    per_call = (time.perf_counter() - start) / 100000
+    print(f"   OK - {checked} compiled models match sklearn ({per_call * 1e6:.2f} us per single prediction)")
+except Exception as e:
+    print(f"   FAIL - Compiled linear models: {e}")
+    import traceback
+    traceback.print_exc()
+    sys.exit(1)
+
+# Test 8: Flattened decision trees must match sklearn's predict
+print("\n8. Testing flattened decision trees...")
+try:
+    from tree_models import FlatTree, TREE_MODELS
+
+    fertilizer_data = pd.read_csv('Fertilizer Prediction.csv').drop(columns=['Fertilizer Name', 'Soil Type'])
+    crop_data = pd.read_csv('Crop Recommendation dataset.csv').drop(columns=['CROP'])
+    samples = {'fertilizer': fertilizer_data.values, 'recommendation': crop_data.values}
+
+    trees = {}
+    checked = 0
+    for name, filename in TREE_MODELS.items():
+        with open(filename, "rb") as f:
+            model = pickle.load(f)
+        tree = trees[name] = FlatTree.from_sklearn(model)
+        X = samples[name].astype(np.float64)
+        X = np.vstack([X, X + rng.normal(0, 5, X.shape)])
+        expected = model.predict(pd.DataFrame(X, columns=model.feature_names_in_)
+                                 if hasattr(model, 'feature_names_in_') else X)
+        assert np.array_equal(tree.predict(X), expected.astype(str)), name
+        assert all(tree.predict_one(*row) == label for row, label in zip(X[:50], expected[:50])), name
+        checked += len(X)
+
+    with app.test_client() as client:
+        records = [dict(zip(('nitrogen', 'phosphorus', 'potassium', 'temperature', 'humidity', 'ph', 'rainfall'), row))
+                   for row in crop_data.values[:20].tolist()]
+        batch = client.post('/api/predict/batch', json={'kind': 'recommendation', 'records': records}).get_json()
+        assert batch['count'] == 20 and all(r['status'] == 'success' for r in batch['results']), batch
+    print(f"   OK - Flattened trees match sklearn on {checked} samples")
+except Exception as e:
+    print(f"   FAIL - Flattened decision trees: {e}")
+    import traceback
+    traceback.print_exc()
+    sys.exit(1)
+
+# Test 9: Registration store imports the CSVs and survives concurrent writers
+print("\n9. Testing registration store...")
+try:
+    import glob
+    import threading
+    from flask_complete import current_total, registration_store
+    from registration_store import RegistrationStore
+
+    legacy = pd.concat([pd.read_csv(f) for f in glob.glob('*_user_crop_entry.csv')])
+    legacy_totals = legacy.groupby(legacy['Crop'].str.lower())['Production'].sum()
+    for config in CROP_CONFIGS.values():
+        assert current_total(config['name']) == legacy_totals.get(config['name'], 0), config
+
+    store = RegistrationStore(os.path.join(test_dir, 'concurrent.db'))
+    assert store.import_csv_files() == len(legacy) and store.import_csv_files() == 0
+
+    def register_many():
+        for _ in range(50):
+            store.add('load-test', 63, 'paddy', 10, 7)
+
+    threads = [threading.Thread(target=register_many) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert store.crop_total('paddy') == legacy_totals['paddy'] + 8 * 50 * 7
+
+    raw_total = store._connection().execute(
+        "SELECT SUM(production) FROM registrations WHERE crop = 'paddy'").fetchone()[0]
+    store.rebuild_totals()
+    assert store.crop_total('paddy') == raw_total
+
+    with app.test_client() as client:
+        before = client.get('/api/statistics?crop=2').get_json()
+        client.post('/registration', data={'user': 'test', 'dist': 57, 'crop': 2, 'area': 50})
+        after = client.get('/api/statistics?crop=2').get_json()
+        assert after['current_production_quintals'] > before['current_production_quintals'], (before, after)
+        assert after['current_production_quintals'] == current_total('sorghum')
+        assert sum(d['production'] for d in after['by_district']) == current_total('sorghum')
+    print(f"   OK - {len(legacy)} CSV rows imported once, 400 concurrent registrations totalled")
+except Exception as e:
+    print(f"   FAIL - Registration store: {e}")
+    import traceback
+    traceback.print_exc()
+    sys.exit(1)
+
+# Test 10: Server-rendered charts are cached until the total changes; client mode renders nothing
+print("\n10. Testing statistics chart cache...")
+try:
+    from chart_cache import ChartCache
+    from flask_complete import chart_cache
+
+    with app.test_client() as client:
+        first = client.post('/statistics', data={'crop': 3, 'chart': 'server'}).get_data()
+        misses, hits = chart_cache.misses, chart_cache.hits
+        second = client.post('/statistics', data={'crop': 3, 'chart': 'server'}).get_data()
+        assert first == second and chart_cache.hits == hits + 1 and chart_cache.misses == misses
+        client.post('/registration', data={'user': 'test', 'dist': 55, 'crop': 3, 'area': 400})
+        third = client.post('/statistics', data={'crop': 3, 'chart': 'server'}).get_data()
+        assert third != second and chart_cache.misses == misses + 1
+
+        client_page = client.post('/statistics', data={'crop': 3, 'chart': 'client'}).get_data(as_text=True)
+        assert 'statisticsChart' in client_page and 'base64' not in client_page
+        assert chart_cache.misses == misses + 1 and len(client_page) < len(third) / 2
+
+    small = ChartCache(max_bytes=10)
+    small.put(('a', 1, 1.0), 'x' * 6)
+    small.put(('b', 1, 1.0), 'y' * 6)
+    assert small.get(('a', 1, 1.0)) is None and small.get(('b', 1, 1.0)) == 'y' * 6
+    assert small.stats()['evictions'] == 1 and small.stats()['bytes'] == 6
+    print(f"   OK - Repeat views hit the cache, registrations invalidate it, client mode skips rendering")
+except Exception as e:
+    print(f"   FAIL - Chart cache: {e}")
+    import traceback
+    traceback.print_exc()
+    sys.exit(1)
+
+# Test 11: Model bundle round-trips every model through one memory map
+print("\n11. Testing model bundle...")
+try:
+    from model_bundle import build_bundle, read_bundle
+
+    bundle_file = os.path.join(test_dir, 'models.bundle')
+    manifest = build_bundle([config['name'] for config in CROP_CONFIGS.values()], bundle_file)
+    bundle = read_bundle(bundle_file)
+    assert bundle.version == manifest['bundle_version'] and bundle.model_count == 17
+    assert isinstance(bundle.linear.coef.base, np.memmap) or not bundle.linear.coef.flags.owndata
+    assert np.array_equal(bundle.linear.coef, linear_table.coef)
+    assert np.array_equal(bundle.linear.intercept, linear_table.intercept)
+    for name, tree in trees.items():
+        assert np.array_equal(bundle.trees[name].predict(samples[name]), tree.predict(samples[name])), name
+    paddy = next(m for m in manifest['models'] if m['name'] == 'paddy_pro_model')
+    assert paddy['features'] == ['Dist Code', 'Year', 'PADDY AREA (1000 ha)'] and paddy['training_data']['sha256']
+    assert build_bundle([config['name'] for config in CROP_CONFIGS.values()], bundle_file)['bundle_version'] == bundle.version
+    print(f"   OK - {bundle.model_count} models bundled (version {bundle.version})")
+except Exception as e:
+    print(f"   FAIL - Model bundle: {e}")
+    import traceback
+    traceback.print_exc()
+    sys.exit(1)
+
+# Test 12: Training pipeline reproduces the committed models
+print("\n12. Testing training pipeline...")
+try:
+    from train_models import train
+
+    train_dir = os.path.join(test_dir, 'trained')
+    os.mkdir(train_dir)
+    timings = train(jobs=1, seed=0, output_dir=train_dir)
+    assert len(timings) == 17 and os.path.exists(os.path.join(train_dir, 'models.bundle'))
+    retrained = read_bundle(os.path.join(train_dir, 'models.bundle'))
+    assert retrained.model_count == 17
+    # Price models are fit on every row, so retraining must reproduce them
+    price = linear_table.kind_index['price']
+    assert np.allclose(retrained.linear.coef[:, price], linear_table.coef[:, price])
+    assert np.allclose(retrained.linear.intercept[:, price], linear_table.intercept[:, price])
+    assert retrained.linear.feature_names == linear_table.feature_names
+    print(f"   OK - Retrained {len(timings)} models, price models match the committed ones")
+except Exception as e:
+    print(f"   FAIL - Training pipeline: {e}")
+    import traceback
+    traceback.print_exc()
+    sys.exit(1)
+
+# Test 13: Incremental refresh folds in appended rows only
+print("\n13. Testing incremental training...")
+try:
+    import shutil
+    from incremental_training import LinearStats, refresh
+
+    inc_dir = os.path.join(test_dir, 'incremental')
+    os.mkdir(inc_dir)
+    history = {}
+    for filename in ('harvest production dataset.csv', 'district_data.csv'):
+        with open(filename, 'rb') as f:
+            history[filename] = f.read().splitlines(keepends=True)
+        with open(os.path.join(inc_dir, filename), 'wb') as f:
+            f.writelines(history[filename][:-30])
+    first = refresh(data_dir=inc_dir, output_dir=inc_dir, seed=0, bundle=False)
+    assert all(rebuilt for _, rebuilt, _ in first.values())
+    for filename, lines in history.items():
+        with open(os.path.join(inc_dir, filename), 'ab') as f:
+            f.writelines(lines[-30:])
+    second = refresh(data_dir=inc_dir, output_dir=inc_dir, seed=0)
+    assert not any(rebuilt for _, rebuilt, _ in second.values())
+    assert second['paddy_pri_model.pkl'][0] == 30 and second['paddy_district_model.pkl'][0] <= 30
+    # Price models use every row, so two batches must match the one-shot fit
+    refreshed = read_bundle(os.path.join(inc_dir, 'models.bundle')).linear
+    price = linear_table.kind_index['price']
+    assert np.allclose(refreshed.coef[:, price], linear_table.coef[:, price])
+    assert np.allclose(refreshed.intercept[:, price], linear_table.intercept[:, price])
+
+    X = np.random.default_rng(0).random((50, 3)) * [10, 2000, 100]
+    y = X @ [1.5, -0.25, 3.0] + 7
+    stats = LinearStats(3)
+    stats.update(X[:20], y[:20])
+    stats.update(X[20:], y[20:])
+    coef, intercept = stats.solve()
+    assert np.allclose(coef, [1.5, -0.25, 3.0]) and np.isclose(intercept, 7)
+    print(f"   OK - Refresh used {sum(used for used, _, _ in second.values())} appended rows across "
+          f"{len(second)} models, price models match a full fit")
+except Exception as e:
+    print(f"   FAIL - Incremental training: {e}")
+    import traceback
+    traceback.print_exc()
+    sys.exit(1)
+
+# Test 14: Columnar data cache is cleaned, memory-mapped and checksum-invalidated
+print("\n14. Testing columnar data cache...")
+try:
+    from data_cache import DataCache
+
+    cache = DataCache()
+    harvest = cache.columns('harvest production dataset.csv', ['Year', 'PADDY AREA (1000 ha)'])
+    assert all(isinstance(column, np.memmap) for column in harvest.values())
+    expected = pd.read_csv('harvest production dataset.csv')['PADDY AREA (1000 ha)'].interpolate(method='linear')
+    assert np.allclose(harvest['PADDY AREA (1000 ha)'], expected, equal_nan=True)
+    prices = cache.frame('harvest price.csv')
+    assert not (prices.select_dtypes('number') == -1).any().any()
+    assert prices['Dist Name'].iloc[0] == 'Adilabad' and prices['Year'].dtype == np.int64
+
+    data_dir = os.path.join(test_dir, 'data')
+    os.mkdir(data_dir)
+    shutil.copy('district_data.csv', data_dir)
+    local = DataCache(data_dir=data_dir)
+    rows = local.manifest('district_data.csv')['rows']
+    with open(os.path.join(data_dir, 'district_data.csv'), 'a') as f:
+        f.write('2018,1900,61000,900,4700,190,600,270,2400,40,55\n')
+    assert not local.is_current('district_data.csv')
+    assert local.manifest('district_data.csv')['rows'] == rows + 1
+    assert local.columns('district_data.csv', ['Year'])['Year'][-1] == 2018
+    print(f"   OK - Cached columns are memory-mapped, cleaned and rebuilt when the CSV changes")
+except Exception as e:
+    print(f"   FAIL - Data cache: {e}")
+    import traceback
+    traceback.print_exc()
+    sys.exit(1)
+
+# Test 15: Prediction cache serves repeated inputs and expires entries
+print("\n15. Testing prediction cache...")
+try:
+    from prediction_cache import PredictionCache
+    from flask_complete import get_production_model, prediction_cache
+
+    with app.test_client() as client:
+        payload = {'crop': 2, 'district': 61, 'area': 250}
+        first = client.post('/api/predict/production', json=payload).get_json()
+        hits = prediction_cache.hits
+        second = client.post('/api/predict/production', json=payload).get_json()
+        assert first == second and first['status'] == 'success' and prediction_cache.hits == hits + 1
+        expected = get_production_model('sorghum').predict_one(61, 2022, int(250 / 2.47))
+        assert first['production_quintals'] == int(expected)
+        assert client.post('/api/predict/production', json={**payload, 'crop': 9}).get_json()['message'] == 'Invalid crop'
+        stats = client.get('/api/cache/stats').get_json()
+        assert stats['status'] == 'success' and stats['predictions']['hits'] == prediction_cache.hits
+
+    now = [0.0]
+    small = PredictionCache(max_entries=2, ttl=10, clock=lambda: now[0])
+    small.put('a', 1.0)
+    small.put('b', 2.0)
+    assert small.get('a') == 1.0
+    small.put('c', 3.0)
+    assert small.get('b') is None and small.stats()['evictions'] == 1
+    now[0] = 11.0
+    assert small.get('a') is None and small.stats()['expirations'] == 1
+    print(f"   OK - Repeated inputs hit the cache, entries expire and evict")
+except Exception as e:
+    print(f"   FAIL - Prediction cache: {e}")
+    import traceback
+    traceback.print_exc()
+    sys.exit(1)
+
+# Test 16: Demand comes from the precomputed (crop, year) table
+print("\n16. Testing demand lookup table...")
+try:
+    from flask_complete import get_district_model
+    demand_table = model_registry.snapshot.demand_table
+
+    with app.test_client() as client:
+        for crop_id, config in CROP_CONFIGS.items():
+            model = get_district_model(config['name'])
+            single = client.post('/api/predict/demand', json={'crop': crop_id}).get_json()
+            assert single['expected_demand_quintals'] == int(model.predict_one(2022)), config['name']
+            curve = client.get(f'/api/predict/demand/range?crop={crop_id}&start_year=2010&end_year=2060').get_json()
+            assert curve['years'] == list(range(2010, 2061))
+            assert curve['expected_demand_quintals'] == [int(model.predict_one(year)) for year in range(2010, 2061)]
+        assert client.get('/api/predict/demand/range?crop=9').get_json()['message'] == 'Invalid crop'
+        assert client.get('/api/predict/demand/range?crop=1&start_year=2030&end_year=2020').get_json()['status'] == 'error'
+    assert demand_table.values.shape == (len(CROP_CONFIGS), len(demand_table.years))
+    print(f"   OK - {demand_table.values.size} (crop, year) demands precomputed, curves match the models")
+except Exception as e:
+    print(f"   FAIL - Demand lookup table: {e}")
+    import traceback
+    traceback.print_exc()
+    sys.exit(1)
+
+# Test 17: Prefork server answers from several workers and reloads on SIGHUP
+print("\n17. Testing prefork server...")
+try:
+    import json
+    import signal
+    import socket
+    import subprocess
+    import time
+    import urllib.request
+
+    if not hasattr(os, 'fork'):
+        print("   SKIP - fork() not available")
+    else:
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            port = probe.getsockname()[1]
+        log_path = os.path.join(test_dir, 'serve.log')
+        with open(log_path, 'w') as log:
+            server = subprocess.Popen(
+                [sys.executable, 'serve.py', '--host', '127.0.0.1', '--port', str(port),
+                 '--workers', '2', '--threads', '2', '--reload-interval', '0'],
+                stdout=log, stderr=subprocess.STDOUT)
+
+        def get(path):
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}{path}', timeout=5) as response:
+                return json.loads(response.read())
+
+        def wait_for(text, timeout=60):
+            deadline = time.time() + timeout
+            while time.time() < deadline:
+                with open(log_path) as f:
+                    if text in f.read():
+                        return
+                time.sleep(0.2)
+            raise AssertionError(f"server never logged {text!r}")
+
+        try:
+            wait_for('Serving on')
+            assert all(get('/api/health')['status'] == 'healthy' for _ in range(6))
+            server.send_signal(signal.SIGHUP)
+            wait_for('Started 2 workers')
+            assert get('/api/predict/demand/range?crop=1&start_year=2020&end_year=2022')['status'] == 'success'
+        finally:
+            server.send_signal(signal.SIGTERM)
+            code = server.wait(timeout=30)
+        assert code == 0, f"exit status {code}"
+        print(f"   OK - 2 workers served requests, reloaded on SIGHUP and shut down cleanly")
+except Exception as e:
+    print(f"   FAIL - Prefork server: {e}")
+    import traceback
+    traceback.print_exc()
+    sys.exit(1)
+
+# Test 18: Prometheus metrics
+print("\n18. Testing /metrics...")
+try:
+    import flask_complete
+    from metrics import Histogram, MetricsRegistry
+
+    registry = MetricsRegistry()
+    latency = registry.histogram('test_seconds', 'Test latency', ('stage',), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        latency.observe(value, 'a')
+    rendered = registry.render()
+    assert 'test_seconds_bucket{stage="a",le="0.1"} 1' in rendered
+    assert 'test_seconds_bucket{stage="a",le="1.0"} 2' in rendered
+    assert 'test_seconds_bucket{stage="a",le="+Inf"} 3' in rendered
+    assert 'test_seconds_count{stage="a"} 3' in rendered
+
+    client = app.test_client()
+    before = flask_complete.REQUESTS.value('api_predict_production', 'POST', '200')
+    predicted = flask_complete.STAGE_SECONDS.count('predict')
+    client.post('/api/predict/production', json={'crop': 2, 'district': 57, 'area': 321})
+    assert flask_complete.REQUESTS.value('api_predict_production', 'POST', '200') == before + 1
+    assert flask_complete.STAGE_SECONDS.count('predict') == predicted + 1
+    response = client.get('/metrics')
+    body = response.get_data(as_text=True)
+    assert response.status_code == 200 and response.content_type.startswith('text/plain; version=0.0.4')
+    for sample in ('agripredict_request_seconds_count{endpoint="api_predict_production"}',
+                   'agripredict_stage_seconds_count{stage="parse"}',
+                   'agripredict_prediction_cache_hit_ratio ',
+                   'agripredict_models_loaded{kind="production"} '):
+        assert sample in body, sample
+    print(f"   OK - {len(body.splitlines())} metric lines exported")
+except Exception as e:
+    print(f"   FAIL - Metrics: {e}")
+    import traceback
+    traceback.print_exc()
+    sys.exit(1)
+
+# Test 19: Benchmark harness
+print("\n19. Testing benchmark harness...")
+try:
+    import contextlib
+    import io
+    import json
+    from benchmark_service import compare, run
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        report = run(flask_complete, ('predict', 'batch'), iterations=3, warmup=1)
+    report = json.loads(json.dumps(report))
+    assert report['benchmarks']['batch.production[1000]']['items'] == 1000
+    assert all(result['iterations'] == 3 and result['median'] > 0 for result in report['benchmarks'].values())
+
+    slower = json.loads(json.dumps(report))
+    slower['benchmarks']['predict.price']['median'] *= 2
+    regressed = [name for name, *_, flagged in compare(slower, report) if flagged]
+    assert regressed == ['predict.price'], regressed
+    print(f"   OK - {len(report['benchmarks'])} benchmarks timed, regression detected")
+except Exception as e:
+    print(f"   FAIL - Benchmark harness: {e}")
+    import traceback
+    traceback.print_exc()
+    sys.exit(1)
+
+# Test 20: Sampling profiler
+print("\n20. Testing request profiling...")
+try:
+    import time
+    from profiling import PROFILE_HEADER, sign_token, verify_token
+
+    profiler = flask_complete.profiler
+    profiler.secret = 'test-secret'
+    profiler.directory = os.path.join(test_dir, 'profiles')
+    profiler.interval = 0.001
+    token = sign_token('test-secret', time.time() + 60)
+    assert verify_token('test-secret', token)
+    assert not verify_token('test-secret', sign_token('test-secret', time.time() - 1))
+    assert not verify_token('other-secret', token)
+
+    client = app.test_client()
+    assert client.get('/admin/profiles').status_code == 403
+    client.post('/api/predict/demand', json={'crop': 1})
+    assert profiler.stats()['endpoints'] == {}
+
+    flask_complete.chart_cache.invalidate('sorghum')
+    client.post('/statistics?chart=server', data={'crop': 2}, headers={PROFILE_HEADER: token})
+    status = client.get('/admin/profiles', headers={PROFILE_HEADER: token}).get_json()['profiler']
+    assert status['endpoints']['statistics']['requests'] == 1 and status['endpoints']['statistics']['samples'] > 0
+    collapsed = client.get('/admin/profiles/statistics?latest=1', headers={PROFILE_HEADER: token}).get_data(as_text=True)
+    assert 'render_statistics_chart' in collapsed
+    assert all(line.rsplit(' ', 1)[1].isdigit() for line in collapsed.splitlines())
+    profiler.flush()
+    assert os.path.exists(os.path.join(profiler.directory, 'statistics.collapsed'))
+    client.delete('/admin/profiles', headers={PROFILE_HEADER: token})
+    assert client.get('/admin/profiles/statistics', headers={PROFILE_HEADER: token}).status_code == 404
+    print(f"   OK - {status['endpoints']['statistics']['samples']} stack samples from one signed request")
+except Exception as e:
+    print(f"   FAIL - Profiling: {e}")
+    import traceback
+    traceback.print_exc()
+    sys.exit(1)
+
+# Test 21: Scenario cube
+print("\n21. Testing scenario sweeps...")
+try:
+    from flask_complete import estimate_pipeline, get_price_model
+
+    client = app.test_client()
+    body = {'crops': [1, 4], 'districts': [59, 63, 57],
+            'years': {'start': 2020, 'end': 2026, 'step': 3}, 'areas': [40, 100, 250, 1000]}
+    cube = client.post('/api/predict/scenarios', json=body).get_json()
+    assert cube['status'] == 'success' and cube['shape'] == [2, 3, 3, 4] and cube['count'] == 72
+    assert cube['axes']['year'] == [2020, 2023, 2026]
+    for c, crop_id in enumerate(cube['axes']['crop']):
+        production_model = get_production_model(CROP_CONFIGS[crop_id]['name'])
+        price_model = get_price_model(CROP_CONFIGS[crop_id]['name'])
+        for d, dist in enumerate(cube['axes']['district']):
+            for y, year in enumerate(cube['axes']['year']):
+                for a, hectares in enumerate(cube['axes']['area_hectares']):
+                    production = int(production_model.predict_one(dist, year, hectares))
+                    price = int(price_model.predict_one(year, hectares, production))
+                    assert cube['production_quintals'][c][d][y][a] == production
+                    assert cube['price_per_quintal'][c][d][y][a] == price
+                    assert cube['estimated_revenue'][c][d][y][a] == production * price
+
+    # The 2022 slice matches the fused estimate pipeline
+    body['years'] = [2022]
+    body['layout'] = 'flat'
+    flat = client.post('/api/predict/scenarios', json=body).get_json()
+    grid = np.array(np.meshgrid(body['crops'], body['districts'], body['areas'], indexing='ij')).reshape(3, -1)
+    estimate = estimate_pipeline(*grid)
+    assert flat['production_quintals'] == estimate['production'].astype(int).tolist()
+    assert flat['estimated_revenue'] == estimate['revenue'].astype(int).tolist()
+
+    assert client.post('/api/predict/scenarios', json={'crops': [9], 'areas': [10]}).get_json()['status'] == 'error'
+    too_big = {'areas': {'start': 1, 'end': 20000}, 'years': {'start': 2000, 'end': 2100}}
+    assert client.post('/api/predict/scenarios', json=too_big).get_json()['status'] == 'error'
+    print("   OK - 72-point cube matches single predictions, 2022 slice matches the estimate pipeline")
+except Exception as e:
+    print(f"   FAIL - Scenario sweeps: {e}")
+    import traceback
+    traceback.print_exc()
+    sys.exit(1)
+
+# Test 22: Crop-mix optimizer
+print("\n22. Testing crop-mix optimizer...")
+try:
+    import itertools
+    import time
+    from crop_mix import best_allocation
+
+    rng = np.random.default_rng(7)
+    for _ in range(50):
+        revenue = rng.normal(0, 10, (3, 7))
+        limits = rng.integers(0, 7, 3)
+        allocation, total = best_allocation(revenue, limits)
+        brute = max(sum(revenue[c, k] for c, k in enumerate(split) if k)
+                    for split in itertools.product(*(range(limit + 1) for limit in limits)) if sum(split) <= 6)
+        assert abs(total - brute) < 1e-9 and allocation.sum() <= 6 and (allocation <= limits).all()
+
+    client = app.test_client()
+    start = time.perf_counter()
+    mix = client.post('/api/optimize/crop-mix', json={'district': 63, 'area': 500}).get_json()
+    elapsed = time.perf_counter() - start
+    assert mix['status'] == 'success', mix
+    planted = [crop for crop in mix['allocation'] if crop['area_acres']]
+    assert sum(crop['area_acres'] for crop in mix['allocation']) + mix['unallocated_acres'] == 500
+    assert mix['total_revenue'] == sum(crop['revenue'] for crop in mix['allocation'])
+    assert all(mix['total_revenue'] >= (crop['single_crop_revenue'] or 0) for crop in mix['allocation'])
+    for crop in planted:
+        estimate = estimate_pipeline([crop['id']], [63], [crop['area_acres']])
+        assert crop['revenue'] == int(estimate['revenue'][0])
+
+    capped = client.post('/api/optimize/crop-mix', json={
+        'district': 63, 'area': 200, 'caps': {'1': 20}, 'min_area': 30}).get_json()
+    assert capped['status'] == 'success', capped
+    assert capped['allocation'][0]['area_acres'] == 0
+    assert all(crop['area_acres'] == 0 or crop['area_acres'] >= 30 for crop in capped['allocation'])
+    assert client.post('/api/optimize/crop-mix', json={'district': 1, 'area': 10}).get_json()['status'] == 'error'
+    negative = client.post('/api/optimize/crop-mix', json={'district': 63, 'area': 100, 'caps': {'1': -5}}).get_json()
+    assert negative == {'status': 'error', 'message': 'Caps must not be negative, got [1]'}, negative
+    below = client.post('/api/optimize/crop-mix', json={'district': 63, 'area': 100, 'min_area': -1}).get_json()
+    assert below['status'] == 'error' and 'min_area' in below['message'], below
+    print(f"   OK - 500 acres split across {len(planted)} crops in {elapsed * 1000:.1f} ms")
+except Exception as e:
+    print(f"   FAIL - Crop-mix optimizer: {e}")
+    import traceback
+    traceback.print_exc()
+    sys.exit(1)
+
+# Test 23: Bulk scoring CLI
+print("\n23. Testing bulk scoring...")
+try:
+    import pandas as pd
+    from bulk_score import open_models, score_file
+    from flask_complete import get_fertilizer_model
+
+    # The CLI loads the same crops and models as the service
+    bulk_models = open_models()
+    served = flask_complete.model_registry.snapshot
+    assert bulk_models.linear_table.crops == served.linear_table.crops
+    assert np.array_equal(bulk_models.linear_table.coef, served.linear_table.coef)
+    assert np.array_equal(bulk_models.rows(list(CROP_CONFIGS)), served.rows(list(CROP_CONFIGS)))
+
+    rng = np.random.default_rng(3)
+    plots = pd.DataFrame({
+        'plot_id': np.arange(100),
+        'crop': rng.integers(0, 7, 100),
+        'district': rng.choice(list(flask_complete.DISTRICTS), 100),
+        'area': rng.integers(1, 3000, 100)
+    })
+    plots_path = os.path.join(test_dir, 'plots.csv')
+    plots.to_csv(plots_path, index=False)
+    scored_path = os.path.join(test_dir, 'scored.csv')
+    assert score_file('estimate', plots_path, scored_path, chunk_size=7) == 100
+    scored = pd.read_csv(scored_path)
+    assert scored['plot_id'].tolist() == list(range(100))
+    estimate = estimate_pipeline(plots['crop'], plots['district'], plots['area'])
+    known = plots['crop'].isin(list(CROP_CONFIGS)).to_numpy()
+    assert scored['production_quintals'].isna().to_numpy().tolist() == (~known).tolist()
+    assert scored['production_quintals'][known].astype(int).tolist() == estimate['production'][known].astype(int).tolist()
+    assert scored['estimated_revenue'][known].astype(int).tolist() == estimate['revenue'][known].astype(int).tolist()
+
+    # Blank and non-numeric cells give empty predictions instead of garbage
+    gaps_path = os.path.join(test_dir, 'gaps.csv')
+    with open(gaps_path, 'w') as f:
+        f.write("crop,district,area\n1,,100\n2,59,\n,59,100\n3,59,abc\n1,63,100\n")
+    assert score_file('estimate', gaps_path, scored_path) == 5
+    gaps = pd.read_csv(scored_path)
+    outputs = ['area_hectares', 'production_quintals', 'price_per_quintal', 'estimated_revenue',
+               'district_demand_quintals', 'production_gap_quintals', 'exceeds_demand']
+    assert gaps[outputs][:4].isna().all().all(), gaps
+    assert gaps['production_quintals'][4] == int(estimate_pipeline([1], [63], [100])['production'][0])
+
+    fields = ('temperature', 'humidity', 'moisture_content', 'crop', 'nitrogen', 'potassium', 'phosphorus')
+    soil = pd.DataFrame({field: rng.integers(0, 60, 50) for field in fields})
+    soil_path = os.path.join(test_dir, 'soil.jsonl')
+    soil.to_json(soil_path, orient='records', lines=True)
+    fertilizer_path = os.path.join(test_dir, 'fertilizer.jsonl')
+    assert score_file('fertilizer', soil_path, fertilizer_path, chunk_size=8, jobs=2) == 50
+    labels = pd.read_json(fertilizer_path, lines=True)['recommended_fertilizer'].tolist()
+    assert labels == get_fertilizer_model().predict(soil[list(fields)].to_numpy()).tolist()
+    print("   OK - 100 plots scored in 7-row chunks, 50 soil samples on 2 processes match the service")
+except Exception as e:
+    print(f"   FAIL - Bulk scoring: {e}")
+    import traceback
+    traceback.print_exc()
+    sys.exit(1)
+
+# Test 24: Model registry swaps whole snapshots
+print("\n24. Testing model registry reload...")
+try:
+    import shutil
+    import time
+    from model_registry import ModelRegistry
+    from profiling import sign_token
+
+    registry_dir = os.path.join(test_dir, 'registry')
+    os.mkdir(registry_dir)
+    for filename in ('paddy_pro_model.pkl', 'paddy_pri_model.pkl'):
+        shutil.copy(filename, registry_dir)
+    registry = ModelRegistry({1: 'paddy', 2: 'sorghum'}, (2020, 2025), directory=registry_dir)
+    assert registry.reload()[0]
+    first = registry.snapshot
+    assert first.generation == 1 and set(first.linear['production']) == {'paddy'}
+    assert 'sorghum_pro_model.pkl' in first.missing and first.rows([1, 2, 9]).tolist() == [0, 1, -1]
+    assert not registry.changed()
+
+    # A new artifact is picked up by the next reload; the old snapshot is untouched
+    shutil.copy('sorghum_pro_model.pkl', registry_dir)
+    assert registry.changed() and registry.reload()[0]
+    assert registry.snapshot.generation == 2 and 'sorghum' in registry.snapshot.linear['production']
+    assert 'sorghum' not in first.linear['production']
+
+    # A broken artifact is rejected and the previous snapshot keeps serving
+    with open(os.path.join(registry_dir, 'paddy_pri_model.pkl'), 'wb') as f:
+        f.write(b'not a pickle')
+    published, problems = registry.reload()
+    assert not published and problems and registry.snapshot.generation == 2
+    assert not registry.changed() and registry.failed_reloads == 1
+
+    # Requests pin the snapshot they started on
+    with app.test_request_context('/'):
+        app.preprocess_request()
+        pinned = flask_complete.current_models()
+        assert flask_complete.reload_models()
+        seen = [flask_complete.current_models() is pinned, flask_complete.model_registry.snapshot is pinned]
+    assert seen == [True, False]
+
+    flask_complete.admin_secret = 'test-secret'
+    with app.test_client() as client:
+        assert client.post('/admin/models/reload').status_code == 403
+        token = sign_token('test-secret', time.time() + 60)
+        assert client.post('/admin/models/reload', headers={'X-AgriPredict-Profile': token}).status_code == 403
+        before = flask_complete.model_registry.snapshot.generation
+        reloaded = client.post('/admin/models/reload', headers={'X-AgriPredict-Admin': token}).get_json()
+        assert reloaded['status'] == 'success' and reloaded['registry']['generation'] == before + 1
+        status = client.get('/api/models/status').get_json()['models']
+        assert status['generation'] == before + 1 and status['production_models'] == len(CROP_CONFIGS)
+        result = client.post('/api/predict/production', json={'crop': 1, 'district': 63, 'area': 100}).get_json()
+        assert result['status'] == 'success'
+    flask_complete.admin_secret = ''
+    print(f"   OK - Reloads publish whole snapshots, broken artifacts are rejected, requests stay pinned")
+except Exception as e:
+    print(f"   FAIL - Model registry: {e}")
+    import traceback
+    traceback.print_exc()
+    sys.exit(1)
+
+# Test 25: Memory-budgeted model cache
+print("\n25. Testing model cache...")
+try:
+    import shutil
+    import threading
+    from model_cache import ModelCache
+    from model_registry import ModelRegistry, StaleArtifactError
+
+    cache = ModelCache(max_bytes=250, sizeof=lambda model: len(model))
+    for name in 'abc':
+        cache.get(name, lambda: name * 100)
+    assert 'a' not in cache and cache.get('c', None) == 'c' * 100
+    assert cache.stats()['evictions'] == 1 and cache.stats()['bytes'] == 200
+    assert [key for key, _ in cache.footprint()] == ['c', 'b']
+
+    # Concurrent misses on one key share a single load
+    calls = []
+    release = threading.Event()
+    def slow_load():
+        calls.append(1)
+        release.wait()
+        return 'model'
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get('slow', slow_load))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    while cache.stats()['coalesced'] < 7:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert calls == [1] and results == ['model'] * 8
+
+    # Failed loads are not cached
+    def broken():
+        raise IOError('disk')
+    for _ in range(2):
+        try:
+            cache.get('broken', broken)
+            assert False
+        except IOError:
+            pass
+    assert cache.stats()['loads'] == 4 and 'broken' not in cache
+
+    cache_dir = os.path.join(test_dir, 'model-cache')
+    os.mkdir(cache_dir)
+    for filename in ('paddy_pro_model.pkl', 'model.pkl', 'fertilizer.pkl'):
+        shutil.copy(filename, cache_dir)
+    registry = ModelRegistry({1: 'paddy'}, (2020, 2022), directory=cache_dir)
+    assert registry.reload()[0] and registry.cache.stats()['loads'] == 3
+    # Unchanged pickles are not read again; a replaced one is
+    assert registry.reload()[0] and registry.cache.stats()['loads'] == 3
+    os.utime(os.path.join(cache_dir, 'paddy_pro_model.pkl'), ns=(0, 10 ** 18))
+    assert registry.reload()[0] and registry.cache.stats()['loads'] == 4
+    sizes = {filename: size for (filename, _), size in registry.cache.footprint()}
+    assert set(sizes) == {'paddy_pro_model.pkl', 'model.pkl', 'fertilizer.pkl'}
+
+    # Snapshots serve linear models from their table, not from the cache
+    expected = registry.snapshot.linear['production']['paddy'].predict_one(63, 2022, 40)
+    registry.cache.clear()
+    assert registry.snapshot.linear['production']['paddy'].predict_one(63, 2022, 40) == expected
+    assert registry.cache.stats()['loads'] == 4 and registry.stats()['table_bytes'] > 0
+
+    # Trees already resolved by a snapshot are returned without going through the cache
+    fertilizer = registry.snapshot.tree('fertilizer')
+    hits = registry.cache.stats()['hits']
+    assert registry.snapshot.tree('fertilizer') is fertilizer and registry.cache.stats()['hits'] == hits
+    del fertilizer
+
+    # Under a budget that fits only one tree, trees are evicted and come back on demand
+    registry.cache = ModelCache(max_bytes=max(sizes['model.pkl'], sizes['fertilizer.pkl']))
+    assert registry.reload()[0] and registry.cache.stats()['evictions'] >= 1
+    recommendation = registry.snapshot.tree('recommendation')
+    fertilizer = registry.snapshot.tree('fertilizer')
+    assert recommendation is not None and fertilizer is not None
+    assert registry.cache.stats()['bytes'] <= registry.cache.max_bytes
+    assert [entry['artifact'] for entry in registry.stats()['cached_models']] == ['fertilizer.pkl']
+    # An evicted tree is freed once unused, then loaded again
+    loads = registry.cache.stats()['loads']
+    assert registry.snapshot.tree('recommendation') is recommendation
+    del recommendation
+    assert registry.snapshot.tree('recommendation') is not None and registry.cache.stats()['loads'] == loads + 1
+
+    # An evicted tree whose file was replaced since validation is not loaded unvalidated
+    del fertilizer
+    registry.cache.clear()
+    os.utime(os.path.join(cache_dir, 'fertilizer.pkl'), ns=(0, 2 * 10 ** 18))
+    try:
+        registry.snapshot.tree('fertilizer')
+        assert False, 'stale tree was loaded'
+    except StaleArtifactError:
+        pass
+    assert registry.changed() and registry.reload()[0] and registry.snapshot.tree('fertilizer') is not None
+    assert flask_complete.app.test_client().get('/api/cache/stats').get_json()['models']['max_bytes'] > 0
+    print(f"   OK - LRU keeps {registry.cache.max_bytes:,} bytes, 8 concurrent misses made 1 load, "
+          f"evicted trees reload on demand")
+except Exception as e:
+    print(f"   FAIL - Model cache: {e}")
+    import traceback
+    traceback.print_exc()
+    sys.exit(1)
+
+# Test 26: Async serving path with micro-batching
+print("\n26. Testing async micro-batched serving...")
+try:
+    import asyncio
+    import http.client
+    import json
+    import threading
+    from async_serve import AsyncPredictionServer
+    from micro_batcher import MicroBatcher
+
+    # Concurrent submissions under one key share a flush; max_batch_size caps it
+    async def submit_all():
+        batcher = MicroBatcher(lambda key, features: features.sum(axis=1), max_batch_size=4, max_wait=0.01)
+        results = await asyncio.gather(*(batcher.submit('k', (i, 1)) for i in range(10)))
+        return results, batcher.stats()
+    results, stats = asyncio.run(submit_all())
+    assert results == [i + 1 for i in range(10)] and stats['batches'] == 3 and stats['largest_batch'] == 4
+
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    server = AsyncPredictionServer(flask_complete.model_registry, max_batch_size=64, max_wait=0.05)
+    listener = asyncio.run_coroutine_threadsafe(server.start('127.0.0.1', 0), loop).result(10)
+    port = listener.sockets[0].getsockname()[1]
+
+    def post(path, body):
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+        connection.request('POST', path, json.dumps(body), {'Content-Type': 'application/json'})
+        response = connection.getresponse()
+        payload = (response.status, json.loads(response.read()))
+        connection.close()
+        return payload
+
+    requests_ = [('/api/predict/production', {'crop': c, 'district': d, 'area': a})
+                 for c in (1, 2, 3, 4, 5, 9) for d in (55, 63) for a in (10, 250, 1000)]
+    requests_ += [('/api/predict/price', {'crop': c, 'area': 100, 'production': 1500}) for c in (1, 2, 3, 9)]
+    requests_ += [('/api/predict/demand', {'crop': c}) for c in (1, 5, 9)]
+    requests_ += [('/api/predict/production', {'crop': 1, 'district': 63})]
+    answers = [None] * len(requests_)
+    def call(i):
+        answers[i] = post(*requests_[i])
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(len(requests_))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    with app.test_client() as client:
+        for (path, body), (status, answer) in zip(requests_, answers):
+            assert status == 200 and answer == client.post(path, json=body).get_json(), (path, body, answer)
+    stats = server.batcher.stats()
+    # Crop 9 and the request without an area never reach the batcher; demand is a table lookup
+    assert stats['items'] == 33 and stats['batches'] < stats['items'], stats
+    assert post('/api/predict/unknown', {})[0] == 404
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    connection.request('GET', '/api/health')
+    health = json.loads(connection.getresponse().read())
+    assert health['status'] == 'healthy' and health['batching']['items'] == 33
+    listener.close()
+    loop.call_soon_threadsafe(loop.stop)
+    print(f"   OK - {len(requests_)} concurrent requests match the Flask responses, "
+          f"{stats['items']} predictions in {stats['batches']} batches")
+except Exception as e:
+    print(f"   FAIL - Async serving: {e}")
+    import traceback
+    traceback.print_exc()
+    sys.exit(1)
+
+import shutil
+shutil.rmtree(test_dir, ignore_errors=True)
+
 print("\n" + "=" * 60)
 print("OK - All tests passed!")
 print("=" * 60)
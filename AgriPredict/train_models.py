@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+"""
+Training pipeline for every AgriPredict model.
+
+Replaces the per-crop {crop}_pro_model.py, {crop}_pri_model.py and
+{crop}_district_model.py scripts. Each dataset is loaded once (the
+historical ones from the interpolated columnar cache in data_cache.py),
+handed to a process pool once per worker, and the
+crop x model-kind fits are fanned out across all cores. Every pickle is
+written atomically, and models.bundle is rebuilt at the end so serving
+processes pick up the new models on their next start.
+
+    python train_models.py                     # retrain all 17 models
+    python train_models.py --crops paddy arhar --kinds production price
+    python train_models.py --jobs 4 --seed 0   # reproducible train/test splits
+"""
+import argparse
+import os
+import pickle
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from data_cache import DataCache, HISTORICAL_DATASETS
+from linear_models import MODEL_KINDS
+from model_bundle import BUNDLE_FILE, TRAINING_DATA, build_bundle
+from tree_models import TREE_MODELS
+
+TRAINING_CROPS = ('paddy', 'sorghum', 'arhar', 'groundnut', 'sesamum')
+TEST_SIZE = 0.2
+
+# Datasets parsed by the parent process, set once per pool worker
+_datasets = None
+
+
+def load_datasets(directory="."):
+    """Load every training dataset once.
+
+    The historical datasets come from the columnar cache, already
+    interpolated; the classifier datasets are parsed directly.
+    """
+    cache = DataCache(data_dir=directory)
+    return {filename: (cache.frame(filename) if filename in HISTORICAL_DATASETS
+                       else pd.read_csv(os.path.join(directory, filename)))
+            for filename in sorted(set(TRAINING_DATA.values()))}
+
+
+def artifact_name(kind, crop=None):
+    if crop is None:
+        return TREE_MODELS[kind]
+    return f"{crop}_{MODEL_KINDS[kind]}.pkl"
+
+
+def stats_path(directory, kind, crop):
+    """Sufficient statistics kept next to a linear artifact by incremental_training.py"""
+    return os.path.join(directory, artifact_name(kind, crop)[:-len('.pkl')] + '.stats.npz')
+
+
+def training_jobs(crops=TRAINING_CROPS, kinds=None):
+    """(kind, crop) pairs to fit; crop is None for the two tree models"""
+    kinds = list(kinds or [*MODEL_KINDS, *TREE_MODELS])
+    jobs = [(kind, crop) for crop in crops for kind in MODEL_KINDS if kind in kinds]
+    jobs += [(kind, None) for kind in TREE_MODELS if kind in kinds]
+    return jobs
+
+
+def linear_columns(kind, crop):
+    """Feature columns and target column of one crop's linear model"""
+    upper = crop.upper()
+    area = f'{upper} AREA (1000 ha)'
+    production = f'{upper} PRODUCTION (1000 Quintal)'
+    price = f'{upper} HARVEST PRICE (Rs per Quintal)'
+    if kind == 'production':
+        return ['Dist Code', 'Year', area], production
+    if kind == 'price':
+        return ['Year', area, production], price
+    return ['Year'], production
+
+
+def training_data(datasets, kind, crop=None):
+    """Features and target for one model, selected exactly as the old scripts did"""
+    frame = datasets[TRAINING_DATA[kind]]
+    if kind in MODEL_KINDS:
+        features, target = linear_columns(kind, crop)
+        # District models were fit on a one-column target frame
+        return frame[features], frame[[target] if kind == 'district' else target]
+    if kind == 'recommendation':
+        return frame.drop(columns=['CROP']).values, frame['CROP'].values
+    return frame.drop(columns=['Fertilizer Name', 'Soil Type']), frame['Fertilizer Name']
+
+
+def fit_model(kind, crop=None, seed=None, datasets=None):
+    """Fit one model. Price models use every row; the rest hold out TEST_SIZE"""
+    from sklearn.linear_model import LinearRegression
+    from sklearn.model_selection import train_test_split
+    from sklearn.tree import DecisionTreeClassifier
+
+    start = time.perf_counter()
+    X, y = training_data(datasets if datasets is not None else _datasets, kind, crop)
+    if kind != 'price':
+        X, _, y, _ = train_test_split(X, y, test_size=TEST_SIZE, random_state=seed)
+    model = DecisionTreeClassifier(random_state=seed) if kind in TREE_MODELS else LinearRegression()
+    model.fit(X, y)
+    return kind, crop, model, time.perf_counter() - start
+
+
+def _init_worker(datasets):
+    global _datasets
+    _datasets = datasets
+
+
+def _fit_job(job):
+    kind, crop, seed = job
+    return fit_model(kind, crop, seed)
+
+
+def write_artifact(model, path):
+    """Pickle a model to path atomically - readers never see a partial file"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(model, f)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def train(crops=TRAINING_CROPS, kinds=None, jobs=None, seed=None,
+          data_dir=".", output_dir=".", bundle=True):
+    """Retrain the selected models and rebuild the bundle.
+
+    Incremental statistics of retrained models are dropped, so the next
+    incremental refresh starts again from the full history. Returns {artifact filename: fit seconds}.
+    """
+    datasets = load_datasets(data_dir)
+    work = [(kind, crop, seed) for kind, crop in training_jobs(crops, kinds)]
+    jobs = jobs or os.cpu_count() or 1
+
+    if jobs == 1:
+        results = [fit_model(kind, crop, seed, datasets) for kind, crop, seed in work]
+    else:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(work)),
+                                 initializer=_init_worker, initargs=(datasets,)) as pool:
+            results = list(pool.map(_fit_job, work))
+
+    timings = {}
+    for kind, crop, model, seconds in results:
+        filename = artifact_name(kind, crop)
+        write_artifact(model, os.path.join(output_dir, filename))
+        if kind in MODEL_KINDS and os.path.exists(stats_path(output_dir, kind, crop)):
+            os.unlink(stats_path(output_dir, kind, crop))
+        timings[filename] = seconds
+
+    if bundle:
+        build_bundle(TRAINING_CROPS, os.path.join(output_dir, BUNDLE_FILE), data_dir, output_dir)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--crops', nargs='+', default=list(TRAINING_CROPS), choices=TRAINING_CROPS)
+    parser.add_argument('--kinds', nargs='+', default=None, choices=[*MODEL_KINDS, *TREE_MODELS])
+    parser.add_argument('--jobs', type=int, default=None, help='worker processes (default: all cores)')
+    parser.add_argument('--seed', type=int, default=None, help='seed for train/test splits and trees')
+    parser.add_argument('--data-dir', default='.', help='directory with the training CSVs')
+    parser.add_argument('--output-dir', default='.', help='directory to write the artifacts to')
+    parser.add_argument('--no-bundle', action='store_true', help=f'do not rebuild {BUNDLE_FILE}')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    timings = train(args.crops, args.kinds, args.jobs, args.seed,
+                    args.data_dir, args.output_dir, not args.no_bundle)
+    for filename, seconds in timings.items():
+        print(f"  [OK] {filename} ({seconds * 1000:.0f} ms)")
+    bundled = '' if args.no_bundle else f" and rebuilt {BUNDLE_FILE}"
+    print(f"OK - Trained {len(timings)} models{bundled} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
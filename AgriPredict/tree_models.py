@@ -0,0 +1,111 @@
+"""
+Array-backed inference for the DecisionTreeClassifier models.
+
+model.pkl (crop recommendation) and fertilizer.pkl are single decision trees.
+This module exports a fitted tree's children_left/right, feature, threshold
+and per-node class into compact contiguous arrays and walks many samples down
+the tree together, one level at a time, so a whole file of soil-test results
+is classified in a handful of NumPy operations. model_bundle.py stores the
+node arrays so a serving process never has to import sklearn for them.
+"""
+import numpy as np
+
+# Tree artifacts by model name
+TREE_MODELS = {
+    'recommendation': 'model.pkl',
+    'fertilizer': 'fertilizer.pkl'
+}
+
+# Batch input columns for each tree, in model feature order
+TREE_BATCH_FIELDS = {
+    'fertilizer': ('temperature', 'humidity', 'moisture_content', 'crop', 'nitrogen', 'potassium', 'phosphorus'),
+    'recommendation': ('nitrogen', 'phosphorus', 'potassium', 'temperature', 'humidity', 'ph', 'rainfall')
+}
+
+# Fields parsed as floats rather than ints, matching the single-item forms
+FLOAT_FIELDS = {'ph'}
+
+LEAF = -2  # sklearn's TREE_UNDEFINED feature marker for leaves
+
+
+class FlatTree:
+    """A fitted decision tree flattened into contiguous node arrays"""
+
+    __slots__ = ('children_left', 'children_right', 'feature', 'threshold',
+                 'node_class', 'classes', 'feature_names', '__weakref__')
+
+    def __init__(self, children_left, children_right, feature, threshold, node_class, classes,
+                 feature_names=()):
+        self.children_left = np.ascontiguousarray(children_left, dtype=np.int32)
+        self.children_right = np.ascontiguousarray(children_right, dtype=np.int32)
+        self.feature = np.ascontiguousarray(feature, dtype=np.int32)
+        self.threshold = np.ascontiguousarray(threshold, dtype=np.float64)
+        self.node_class = np.ascontiguousarray(node_class, dtype=np.int32)
+        self.classes = np.asarray(classes)
+        self.feature_names = tuple(str(name) for name in feature_names)
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """Flatten a fitted single-output sklearn DecisionTreeClassifier"""
+        tree = model.tree_
+        return cls(tree.children_left,
+                   tree.children_right,
+                   tree.feature,
+                   tree.threshold,
+                   np.argmax(tree.value[:, 0, :], axis=1),
+                   np.asarray(model.classes_).astype(str),
+                   getattr(model, 'feature_names_in_', ()))
+
+    @property
+    def node_count(self):
+        return len(self.feature)
+
+    def apply(self, X):
+        """Return the leaf index reached by every row of X.
+
+        All rows start at the root and step down one level per iteration;
+        rows that reach a leaf drop out of the active set.
+        """
+        # sklearn compares float32 features against float64 thresholds
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        nodes = np.zeros(len(X), dtype=np.int32)
+        active = np.arange(len(X))
+        while active.size:
+            current = nodes[active]
+            feature = self.feature[current]
+            internal = feature != LEAF
+            active, current, feature = active[internal], current[internal], feature[internal]
+            if not active.size:
+                break
+            go_left = X[active, feature] <= self.threshold[current]
+            nodes[active] = np.where(go_left, self.children_left[current], self.children_right[current])
+        return nodes
+
+    def predict(self, X):
+        """Predict class labels for a 2-D batch, like DecisionTreeClassifier.predict"""
+        return self.classes[self.node_class[self.apply(X)]]
+
+    def predict_one(self, *features):
+        """Predict a single row given as positional features, in pure Python"""
+        node = 0
+        while self.feature[node] != LEAF:
+            if float(np.float32(features[self.feature[node]])) <= self.threshold[node]:
+                node = self.children_left[node]
+            else:
+                node = self.children_right[node]
+        return self.classes[self.node_class[node]]
+
+
+def flatten_pickles(directory="."):
+    """Flatten every tree artifact found in directory"""
+    import os
+    import pickle
+
+    trees = {}
+    for name, filename in TREE_MODELS.items():
+        path = os.path.join(directory, filename)
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                trees[name] = FlatTree.from_sklearn(pickle.load(f))
+    return trees
+